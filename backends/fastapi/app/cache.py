@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Annotated, Any
+from uuid import UUID
+
+from fastapi import Depends
+
+from app.config import get_settings
+
+# Key namespaces; every cache key is a tuple starting with one of these.
+POST_KEY = "post"
+POST_PAGE_KEY = "post_page"
+
+CacheKey = tuple[Hashable, ...]
+
+
+class ResponseCache:
+    """Bounded in-process read-through cache with LRU eviction and a TTL.
+
+    Entries expire `ttl_seconds` after they are stored. Once `max_entries` is reached,
+    the least recently used entry is evicted to make room for a new one.
+    When `enabled` is False, every lookup misses and nothing is stored.
+
+    Every invalidation bumps `generation`. Callers that read from the database on a
+    miss should capture `generation` first and pass it to `set`, so a result that raced
+    with a write is dropped instead of being cached as stale.
+
+    The cache is local to each process: writes handled by another process are not seen
+    here until the entry expires, so `ttl_seconds` bounds how stale a read can be.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: OrderedDict[CacheKey, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.generation = 0
+
+    def get(self, key: CacheKey) -> Any | None:
+        """Returns the cached value for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: CacheKey, value: Any, generation: int | None = None) -> None:
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: CacheKey) -> None:
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        """Drops every entry whose key starts with `namespace`."""
+        self.generation += 1
+        for key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[key]
+
+    def invalidate_post(self, post_id: UUID | None = None) -> None:
+        """Drops a single Post (if given) and every page of the Post list.
+
+        Each list page carries its Posts' scores and bodies, so any write to a Post
+        can change any page.
+        """
+        if post_id is not None:
+            self.invalidate((POST_KEY, post_id))
+        self.invalidate_namespace(POST_PAGE_KEY)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+_cache: ResponseCache | None = None
+
+
+def init_cache() -> None:
+    global _cache  # noqa: PLW0603
+
+    settings = get_settings()
+    _cache = ResponseCache(
+        max_entries=settings.cache_max_entries,
+        ttl_seconds=settings.cache_ttl_seconds,
+        enabled=settings.cache_enabled,
+    )
+
+
+def get_cache() -> ResponseCache:
+    if _cache is None:
+        raise RuntimeError("Response cache not initialized")
+    return _cache
+
+
+CacheDep = Annotated[ResponseCache, Depends(get_cache)]
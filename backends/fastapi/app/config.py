@@ -17,6 +17,62 @@ class Settings(BaseSettings):
     db_connection_url: str
     db_min_connections: int = 2
     db_max_connections: int = 10
+    # Connections all worker processes together may open to each database server
+    # (primary and every replica). When set, it replaces `db_max_connections`: each
+    # worker gets an even share (see `app.db.worker_pool_max_size`).
+    db_connection_budget: int | None = None
+
+    # Worker processes started by `python -m app.serve` (see `app.serve`). Each has
+    # its own caches and metrics: /metrics reports the worker that served it.
+    web_workers: int = 1
+    # On SIGTERM, how long in-flight requests get to finish before they are cancelled
+    # and the pools are closed
+    shutdown_grace_seconds: int = 10
+
+    # Optional read replicas for read-only handlers (see `app.db.get_read_pool`).
+    # Given as a JSON list, e.g. DB_REPLICA_URLS='["postgresql://..."]'.
+    db_replica_urls: list[str] = []
+    # How long a replica that failed to connect is skipped for
+    db_replica_retry_seconds: float = 5.0
+    # After a client writes, serve its reads from the primary for this long (0 = off)
+    db_read_your_writes_seconds: float = 0.0
+
+    # In-process read-through cache for Posts (see `app.cache`)
+    cache_enabled: bool = True
+    cache_max_entries: int = 1024
+    cache_ttl_seconds: float = 5.0
+    # Share one query between identical concurrent reads (see `app.singleflight`)
+    singleflight_enabled: bool = True
+
+    # Cache-Control max-age of cacheable reads, which also sets how long the nginx
+    # micro-cache serves them (see `app.responses.cacheable_response`)
+    http_cache_max_age_seconds: int = 1
+
+    # Request, pool and query instrumentation served at /metrics (see `app.metrics`)
+    metrics_enabled: bool = True
+
+    # Write-behind buffering of single votes: acknowledged once buffered, and written
+    # every interval or max entries (see `app.vote_buffer` for what this gives up)
+    votes_write_behind: bool = False
+    votes_flush_interval_seconds: float = 0.05
+    votes_flush_max_entries: int = 500
+    votes_buffer_max_entries: int = 10000
+    # Spread each object's score changes over this many counter rows (1 = off), which
+    # are folded into its vote_score every fold interval (see `app.vote_shards`)
+    votes_score_shards: int = 1
+    votes_fold_interval_seconds: float = 1.0
+    votes_fold_batch_size: int = 1000
+
+    # Live Post events at /posts/{post_id}/events (see `app.events`)
+    events_max_pending: int = 100
+    events_keepalive_seconds: float = 15.0
+
+    # Readiness (see `app.readiness`): /health/ready fails once any threshold is crossed
+    readiness_db_timeout_seconds: float = 1.0
+    readiness_max_pool_utilization: float = 1.0
+    readiness_max_acquire_waiting: int = 20
+    readiness_max_acquire_seconds: float = 0.25
+    readiness_acquire_window_seconds: float = 10.0
 
 
 _settings = None
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import struct
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+# Cursors are opaque to clients: a version byte followed by the sort key of the last
+# item on the previous page, base64url-encoded without padding.
+# Version 1 encodes a (created_at, id) key as microseconds since the epoch plus the
+# 16 bytes of the UUID, so the next page is a single seek on that composite key,
+# with no lookup of the anchor row (which may since have been deleted).
+# Version 2 is for the ranked Post feeds. It adds a byte naming the feed and the
+# item's vote_score, from which (with created_at) the database recomputes the exact
+# rank the item was sorted by.
+# Version 3 is for search results, ranked by a float4 relevance: it encodes the
+# (rank, id) key, the rank as the exact 4-byte float the database computed.
+# Version 4 is for a voter's votes: it encodes the (object_id, object_type) key of
+# the last vote, with one byte naming the type.
+CURSOR_VERSION = 1
+_CURSOR_V1 = struct.Struct(">Bq16s")
+RANKED_CURSOR_VERSION = 2
+_CURSOR_V2 = struct.Struct(">BBiq16s")
+# Feed byte of version 2 cursors; a cursor only works with the feed it came from
+RANKED_FEEDS = {"hot": 1, "top": 2}
+SEARCH_CURSOR_VERSION = 3
+_CURSOR_V3 = struct.Struct(">Bf16s")
+VOTE_CURSOR_VERSION = 4
+_CURSOR_V4 = struct.Struct(">B16sB")
+_OBJECT_TYPES = {"Post": 1, "Comment": 2}
+_OBJECT_TYPE_NAMES = {code: name for name, code in _OBJECT_TYPES.items()}
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def encode_cursor(created_at: datetime.datetime, item_id: UUID) -> str:
+    """Encodes the (created_at, id) sort key of the last item on a page."""
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    raw = _CURSOR_V1.pack(CURSOR_VERSION, micros, item_id.bytes)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, UUID]:
+    """Decodes a cursor from `encode_cursor` back into its (created_at, id) sort key.
+
+    Raises HTTPException with 400 if the cursor is malformed or from an unknown version.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, micros, id_bytes = _CURSOR_V1.unpack(raw)
+        if version != CURSOR_VERSION:
+            raise ValueError(f"Unsupported cursor version {version}")
+        created_at = _EPOCH + micros * _MICROSECOND
+    except (binascii.Error, struct.error, ValueError, OverflowError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        ) from exc
+    return created_at, UUID(bytes=id_bytes)
+
+
+def encode_ranked_cursor(
+    feed: str, vote_score: int, created_at: datetime.datetime, item_id: UUID
+) -> str:
+    """Encodes the sort key of the last item on a page of a ranked feed."""
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    raw = _CURSOR_V2.pack(
+        RANKED_CURSOR_VERSION, RANKED_FEEDS[feed], vote_score, micros, item_id.bytes
+    )
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_ranked_cursor(cursor: str, feed: str) -> tuple[int, datetime.datetime, UUID]:
+    """Decodes a cursor from `encode_ranked_cursor` for `feed`.
+
+    Returns its (vote_score, created_at, id). Raises HTTPException with 400 if the
+    cursor is malformed, from an unknown version, or from a different feed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, feed_code, vote_score, micros, id_bytes = _CURSOR_V2.unpack(raw)
+        if version != RANKED_CURSOR_VERSION:
+            raise ValueError(f"Unsupported cursor version {version}")
+        if feed_code != RANKED_FEEDS[feed]:
+            raise ValueError("Cursor is from a different feed")
+        created_at = _EPOCH + micros * _MICROSECOND
+    except (binascii.Error, struct.error, ValueError, OverflowError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        ) from exc
+    return vote_score, created_at, UUID(bytes=id_bytes)
+
+
+def encode_search_cursor(rank: float, item_id: UUID) -> str:
+    """Encodes the (rank, id) sort key of the last search result on a page."""
+    raw = _CURSOR_V3.pack(SEARCH_CURSOR_VERSION, rank, item_id.bytes)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, UUID]:
+    """Decodes a cursor from `encode_search_cursor` back into its (rank, id) key.
+
+    Raises HTTPException with 400 if the cursor is malformed or from another version.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, rank, id_bytes = _CURSOR_V3.unpack(raw)
+        if version != SEARCH_CURSOR_VERSION:
+            raise ValueError(f"Unsupported cursor version {version}")
+    except (binascii.Error, struct.error, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        ) from exc
+    return rank, UUID(bytes=id_bytes)
+
+
+def encode_vote_cursor(object_id: UUID, object_type: str) -> str:
+    """Encodes the (object_id, object_type) sort key of the last vote on a page."""
+    raw = _CURSOR_V4.pack(
+        VOTE_CURSOR_VERSION, object_id.bytes, _OBJECT_TYPES[object_type]
+    )
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_vote_cursor(cursor: str) -> tuple[UUID, str]:
+    """Decodes a cursor from `encode_vote_cursor` into its (object_id, object_type).
+
+    Raises HTTPException with 400 if the cursor is malformed or from another version.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, id_bytes, type_code = _CURSOR_V4.unpack(raw)
+        if version != VOTE_CURSOR_VERSION:
+            raise ValueError(f"Unsupported cursor version {version}")
+        object_type = _OBJECT_TYPE_NAMES[type_code]
+    except (binascii.Error, struct.error, ValueError, KeyError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        ) from exc
+    return UUID(bytes=id_bytes), object_type
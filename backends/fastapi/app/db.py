@@ -1,33 +1,330 @@
-from typing import Annotated
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import AbstractAsyncContextManager
+from math import ceil
+from typing import TYPE_CHECKING, Annotated, Protocol
 
 import asyncpg
-from fastapi import Depends
+from fastapi import Depends, Request
+
+from app.config import Settings, get_settings
+from app.metrics import Histogram, get_metrics
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+_pool: InstrumentedPool | None = None
+
+# Connections each worker opens outside its pools: the readiness probe's
+# (see `app.readiness`) and the event broker's LISTEN connection (see `app.events`)
+RESERVED_CONNECTIONS = 2
+
+
+# Acquire wait times kept for `InstrumentedPool.recent_acquire_seconds`
+RECENT_ACQUIRE_SAMPLES = 1024
+
+
+class PoolLike(Protocol):
+    """What handlers use of a pool: `async with pool.acquire() as conn`.
+
+    Satisfied by `asyncpg.Pool`, `InstrumentedPool` and `ReplicaSet`.
+    """
+
+    def acquire(
+        self, *, timeout: float | None = None
+    ) -> AbstractAsyncContextManager[asyncpg.Connection]: ...
+
+
+class _TimedAcquire:
+    """Wraps `pool.acquire()`, recording how long it waited for a connection."""
+
+    __slots__ = ("_ctx", "_pool")
+
+    def __init__(self, ctx, pool: InstrumentedPool):
+        self._ctx = ctx
+        self._pool = pool
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        pool = self._pool
+        pool.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await self._ctx.__aenter__()
+        finally:
+            pool.waiting -= 1
+        pool.record_acquire(time.perf_counter() - start)
+        return conn
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._ctx.__aexit__(*exc_info)
+
+
+class InstrumentedPool:
+    """An `asyncpg.Pool` that tracks how long, and how many, requests wait for it.
+
+    `waiting` is the number of `acquire()` calls currently queued for a connection.
+    Recent wait times are kept for readiness checks (see `app.readiness`) and, when
+    given `acquire_histogram`, also recorded for `/metrics`.
+    Everything but `acquire` is passed through to the wrapped pool.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, acquire_histogram: Histogram | None = None):
+        self._pool = pool
+        self._acquire_histogram = acquire_histogram
+        self._recent_acquires: deque[tuple[float, float]] = deque(
+            maxlen=RECENT_ACQUIRE_SAMPLES
+        )
+        self.waiting = 0
+
+    def acquire(self, *, timeout: float | None = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool.acquire(timeout=timeout), self)
+
+    def record_acquire(self, seconds: float) -> None:
+        self._recent_acquires.append((time.monotonic(), seconds))
+        if self._acquire_histogram is not None:
+            self._acquire_histogram.observe(seconds)
+
+    def recent_acquire_seconds(self, window_seconds: float) -> float:
+        """95th percentile wait of the acquires in the last `window_seconds` (or 0)."""
+        since = time.monotonic() - window_seconds
+        waits = sorted(wait for at, wait in self._recent_acquires if at >= since)
+        if not waits:
+            return 0.0
+        return waits[int(0.95 * (len(waits) - 1))]
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool, name)
+
+
+class ReplicaSet:
+    """Read replica pools, used round-robin, with the primary pool as a fallback.
+
+    A replica whose `acquire()` fails to connect is skipped for `retry_seconds`,
+    and its request falls through to the next replica, then to the primary.
+    Only `acquire` is supported: read-only handlers need nothing else.
+    """
+
+    def __init__(
+        self,
+        primary: InstrumentedPool,
+        replicas: list[InstrumentedPool],
+        retry_seconds: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(replicas)
+        self._next = 0
+
+    def candidates(self) -> list[tuple[int | None, InstrumentedPool]]:
+        """Replicas to try in order (by index), then the primary (index None)."""
+        now = time.monotonic()
+        start = self._next
+        self._next = (self._next + 1) % len(self.replicas)
+        order = [(start + n) % len(self.replicas) for n in range(len(self.replicas))]
+        return [
+            (index, self.replicas[index])
+            for index in order
+            if self._down_until[index] <= now
+        ] + [(None, self.primary)]
 
-from app.config import get_settings
+    def mark_down(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_seconds
 
-_pool: asyncpg.Pool | None = None
+    def acquire(self, *, timeout: float | None = None) -> _ReplicaAcquire:
+        return _ReplicaAcquire(self, timeout)
+
+
+# Failures to reach a replica, as opposed to errors in the query itself
+REPLICA_CONNECT_ERRORS = (
+    OSError,
+    TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+)
+
+
+class _ReplicaAcquire:
+    __slots__ = ("_ctx", "_replicas", "_timeout")
+
+    def __init__(self, replicas: ReplicaSet, timeout: float | None):
+        self._replicas = replicas
+        self._timeout = timeout
+        self._ctx: AbstractAsyncContextManager[asyncpg.Connection] | None = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        for index, pool in self._replicas.candidates():
+            ctx = pool.acquire(timeout=self._timeout)
+            try:
+                conn = await ctx.__aenter__()
+            except REPLICA_CONNECT_ERRORS:
+                if index is None:
+                    raise
+                self._replicas.mark_down(index)
+                continue
+            self._ctx = ctx
+            return conn
+        raise AssertionError("unreachable: the primary is always a candidate")
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._ctx is not None:
+            await self._ctx.__aexit__(*exc_info)
+
+
+_read_pool: ReplicaSet | None = None
+
+# Set on successful writes when `db_read_your_writes_seconds` is on
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a while after it writes.
+
+    Every successful write response sets a cookie holding the time until which
+    `get_read_pool` should keep serving that client from the primary, so it sees its
+    own writes even if the replicas lag behind.
+    """
+
+    def __init__(self, app: ASGIApp, window_seconds: float):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:  # noqa: PLR2004
+                until = time.time() + self.window_seconds
+                max_age = ceil(self.window_seconds)
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={max_age};"
+                    " Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client is inside its read-your-writes window."""
+    value = request.cookies.get(READ_PRIMARY_COOKIE)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def worker_pool_max_size(settings: Settings) -> int:
+    """Max size of this worker's pools: the primary's and each replica's.
+
+    Without a `db_connection_budget` this is `db_max_connections`. With one, the
+    budget is split evenly across the `web_workers` processes, less each worker's
+    RESERVED_CONNECTIONS, so that all workers together stay within it however many
+    there are.
+    """
+    if settings.db_connection_budget is None:
+        return settings.db_max_connections
+    share = settings.db_connection_budget // settings.web_workers
+    max_size = share - RESERVED_CONNECTIONS
+    if max_size < 1:
+        raise ValueError(
+            f"db_connection_budget={settings.db_connection_budget} is too small for"
+            f" {settings.web_workers} workers: each needs at least"
+            f" {RESERVED_CONNECTIONS + 1} connections"
+        )
+    return max_size
 
 
 async def init_pool() -> None:
-    global _pool  # noqa: PLW0603
+    global _pool, _read_pool  # noqa: PLW0603
 
     settings = get_settings()
-    _pool = await asyncpg.create_pool(
+    metrics = get_metrics() if settings.metrics_enabled else None
+    acquire_histogram = metrics.pool_acquire if metrics else None
+    max_size = worker_pool_max_size(settings)
+    # Votes go through the primary, so only its sessions spread them over counter
+    # rows (see `app.vote_shards`)
+    server_settings = (
+        {"votes.score_shards": str(settings.votes_score_shards)}
+        if settings.votes_score_shards > 1
+        else None
+    )
+    pool = await asyncpg.create_pool(
         dsn=settings.db_connection_url,
-        min_size=settings.db_min_connections,
-        max_size=settings.db_max_connections,
+        min_size=min(settings.db_min_connections, max_size),
+        max_size=max_size,
+        init=metrics.instrument_connection if metrics else None,
+        server_settings=server_settings,
     )
+    _pool = InstrumentedPool(pool, acquire_histogram)
+
+    replicas = [
+        InstrumentedPool(
+            await asyncpg.create_pool(
+                dsn=url,
+                # Connect lazily, so that a replica that is down at startup is
+                # skipped (see ReplicaSet) instead of failing the whole app
+                min_size=0,
+                max_size=max_size,
+                init=metrics.instrument_connection if metrics else None,
+            ),
+            acquire_histogram,
+        )
+        for url in settings.db_replica_urls
+    ]
+    _read_pool = ReplicaSet(_pool, replicas, settings.db_replica_retry_seconds)
 
 
 async def close_pool() -> None:
-    if _pool:
-        await _pool.close()
+    """Closes the pools once their connections are released.
 
+    Runs at shutdown, after in-flight requests have finished or were cancelled, so
+    this rarely waits; a connection still not released after
+    `shutdown_grace_seconds` (e.g. one stuck in a query) is terminated.
+    """
+    deadline = asyncio.get_running_loop().time() + get_settings().shutdown_grace_seconds
+    pools = [*(_read_pool.replicas if _read_pool else []), *([_pool] if _pool else [])]
+    for pool in pools:
+        try:
+            async with asyncio.timeout_at(deadline):
+                await pool.close()
+        except TimeoutError:
+            pool.terminate()
 
-def get_pool() -> asyncpg.Pool:
+
+def get_pool() -> InstrumentedPool:
     if _pool is None:
         raise RuntimeError("Database pool not initialized")
     return _pool
 
 
-PoolDep = Annotated[asyncpg.Pool, Depends(get_pool)]
+def get_read_pool(request: Request) -> PoolLike:
+    """Pool for read-only handlers: the replicas, if any are configured.
+
+    Falls back to the primary when there are no replicas, and while the client is
+    inside its read-your-writes window (see ReadYourWritesMiddleware).
+    """
+    if _read_pool is None:
+        raise RuntimeError("Database pool not initialized")
+    if not _read_pool.replicas:
+        return _read_pool.primary
+    if get_settings().db_read_your_writes_seconds and wrote_recently(request):
+        return _read_pool.primary
+    return _read_pool
+
+
+PoolDep = Annotated[InstrumentedPool, Depends(get_pool)]
+ReadPoolDep = Annotated[PoolLike, Depends(get_read_pool)]
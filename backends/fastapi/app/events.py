@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Hashable
+from typing import Annotated
+from uuid import UUID
+
+import asyncpg
+from fastapi import Depends
+
+from app.config import Settings, get_settings
+
+# NOTIFY channel fed by the vote and comment triggers (see database_schema/schema.sql)
+CHANNEL = "post_events"
+# Sent to a subscriber in place of the events it could not keep up with,
+# or when the LISTEN connection was lost: the client should refetch and resubscribe
+RESET_EVENT = ("reset", "{}")
+
+
+class Subscription:
+    """One client's bounded queue of pending events for a single Post.
+
+    Events are held by key until the client reads them: a newer vote score for the
+    same object replaces the pending one in place, so a burst of votes costs a slow
+    client one event, not one per vote. If more than `max_pending` distinct events
+    are pending, the client has fallen too far behind; its queue is replaced by a
+    single reset event and the subscription ends.
+    """
+
+    def __init__(self, post_id: UUID, max_pending: int) -> None:
+        self.post_id = post_id
+        self.max_pending = max_pending
+        self.closed = False
+        # Coalescing key -> (event name, JSON data), in arrival order
+        self._pending: dict[Hashable, tuple[str, str]] = {}
+        self._ready = asyncio.Event()
+
+    def put(self, key: Hashable, event: tuple[str, str]) -> None:
+        if self.closed:
+            return
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            self.reset()
+            return
+        self._pending[key] = event
+        self._ready.set()
+
+    def reset(self) -> None:
+        """Drops every pending event and ends the subscription with a reset event."""
+        self._pending = {"reset": RESET_EVENT}
+        self.closed = True
+        self._ready.set()
+
+    async def get(self) -> list[tuple[str, str]]:
+        """Waits for, and returns, every event pending since the last call."""
+        await self._ready.wait()
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return events
+
+
+class EventBroker:
+    """Fans out `post_events` notifications to the subscribers of each Post.
+
+    The whole process shares one LISTEN connection of its own (outside the request
+    pool, which it would otherwise hold a connection of forever), opened when the
+    first client subscribes. Each notification is parsed once and handed to the
+    subscribers of its Post in memory.
+
+    If the LISTEN connection is lost, notifications sent in the meantime are lost
+    with it, so every subscription is reset; clients reconnect and the next
+    subscription opens a new connection.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._conn: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._subscribers: dict[UUID, set[Subscription]] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    async def subscribe(self, post_id: UUID) -> Subscription:
+        await self._listen()
+        subscription = Subscription(post_id, self.settings.events_max_pending)
+        self._subscribers.setdefault(post_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subs = self._subscribers.get(subscription.post_id)
+        if subs is None:
+            return
+        subs.discard(subscription)
+        if not subs:
+            del self._subscribers[subscription.post_id]
+
+    async def _listen(self) -> None:
+        async with self._lock:
+            if self._conn is not None and not self._conn.is_closed():
+                return
+            conn = await asyncpg.connect(self.settings.db_connection_url)
+            conn.add_termination_listener(self._on_terminated)
+            await conn.add_listener(CHANNEL, self._on_notification)
+            self._conn = conn
+
+    def _on_notification(
+        self, conn: asyncpg.Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        self.dispatch(payload)
+
+    def _on_terminated(self, conn: asyncpg.Connection) -> None:
+        if conn is self._conn:
+            self._conn = None
+        self.reset_all()
+
+    def dispatch(self, payload: str) -> None:
+        """Hands one notification to the subscribers of its Post."""
+        event = json.loads(payload)
+        subs = self._subscribers.get(UUID(event["post_id"]))
+        if not subs:
+            return
+        if event["type"] == "vote":
+            key = ("vote", event["object_id"])
+        else:
+            key = (event["type"], event.get("comment_id"))
+        # The payload is already JSON, and is sent to clients unchanged
+        for subscription in list(subs):
+            subscription.put(key, (event["type"], payload))
+
+    def reset_all(self) -> None:
+        for subs in self._subscribers.values():
+            for subscription in subs:
+                subscription.reset()
+        self._subscribers.clear()
+
+    async def close(self) -> None:
+        self.reset_all()
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            await conn.close()
+
+
+_broker: EventBroker | None = None
+
+
+def init_events() -> None:
+    global _broker  # noqa: PLW0603
+
+    _broker = EventBroker(get_settings())
+
+
+async def close_events() -> None:
+    if _broker:
+        await _broker.close()
+
+
+def get_event_broker() -> EventBroker:
+    if _broker is None:
+        raise RuntimeError("Event broker not initialized")
+    return _broker
+
+
+EventBrokerDep = Annotated[EventBroker, Depends(get_event_broker)]
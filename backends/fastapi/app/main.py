@@ -2,18 +2,40 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.db import close_pool, init_pool
+from app.cache import init_cache
+from app.config import get_settings
+from app.db import ReadYourWritesMiddleware, close_pool, init_pool
+from app.events import close_events, init_events
+from app.metrics import MetricsMiddleware, get_metrics, init_metrics
+from app.readiness import close_readiness, init_readiness
 from app.routers import ALL_ROUTERS
+from app.singleflight import init_singleflight
+from app.vote_buffer import close_vote_buffer, init_vote_buffer
+from app.vote_shards import close_vote_shard_folder, init_vote_shard_folder
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_pool()
+    init_cache()
+    init_singleflight()
+    init_readiness()
+    init_events()
+    init_vote_buffer()
+    init_vote_shard_folder()
     yield
+    # Runs once in-flight requests have drained, or were cut at the grace period
+    # (see `app.serve`); then no request holds a pool connection
+    await close_vote_buffer()
+    await close_vote_shard_folder()
+    await close_events()
+    await close_readiness()
     await close_pool()
 
 
 def get_app():
+    # Created with the app rather than in `lifespan`, since the middleware needs it
+    init_metrics()
     app = FastAPI(
         title="FastAPI Reddit-like Backend",
         version="0.1.0",
@@ -25,4 +47,13 @@ def get_app():
     for router in ALL_ROUTERS:
         app.include_router(router)
 
+    settings = get_settings()
+    if settings.db_replica_urls and settings.db_read_your_writes_seconds > 0:
+        app.add_middleware(
+            ReadYourWritesMiddleware,
+            window_seconds=settings.db_read_your_writes_seconds,
+        )
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware, metrics=get_metrics())
+
     return app
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Annotated
+
+from fastapi import Depends
+
+if TYPE_CHECKING:
+    import asyncpg
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+    from app.db import InstrumentedPool
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+UNMATCHED_ROUTE = "<unmatched>"
+# Distinct SQL statements tracked before the rest are grouped under "other"
+MAX_STATEMENT_LABELS = 500
+MAX_STATEMENT_LENGTH = 200
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Histogram(_Metric):
+    """Cumulative histogram; `observe` is a bisect and two additions."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: non-cumulative counts per bucket (the last one is +Inf), sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_labels(self.labelnames, labels)} {total[0]}"
+            )
+            lines.append(
+                f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+            )
+        return lines
+
+
+class Metrics:
+    """Process-wide registry of the app's metrics, rendered for Prometheus.
+
+    HTTP metrics are recorded by `MetricsMiddleware`, pool acquire waits by
+    `app.db.InstrumentedPool`, query durations by the asyncpg query logger
+    that `instrument_connection` adds to every pooled connection, and coalesced
+    reads by `app.singleflight.SingleFlight`.
+    """
+
+    def __init__(self) -> None:
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "Time to handle a request, by route.",
+            ("method", "route"),
+        )
+        self.requests = Counter(
+            "http_requests_total",
+            "Requests handled, by route and response status.",
+            ("method", "route", "status"),
+        )
+        self.requests_in_flight = Gauge(
+            "http_requests_in_flight",
+            "Requests currently being handled, by route.",
+            ("method", "route"),
+        )
+        self.pool_size = Gauge("db_pool_size", "Open connections in the pool.")
+        self.pool_idle = Gauge(
+            "db_pool_idle_connections", "Idle connections in the pool."
+        )
+        self.pool_max_size = Gauge("db_pool_max_size", "Maximum size of the pool.")
+        self.pool_acquire = Histogram(
+            "db_pool_acquire_seconds", "Time spent waiting in pool.acquire()."
+        )
+        self.query_duration = Histogram(
+            "db_query_duration_seconds",
+            "Time to execute a SQL statement, by statement.",
+            ("statement",),
+        )
+        self.query_errors = Counter(
+            "db_query_errors_total",
+            "SQL statements that raised an error, by statement.",
+            ("statement",),
+        )
+        self.singleflight_leaders = Counter(
+            "singleflight_leaders_total",
+            "Read queries started for possibly coalesced requests, by key namespace.",
+            ("key",),
+        )
+        self.singleflight_collapsed = Counter(
+            "singleflight_collapsed_total",
+            "Requests that shared another request's in-flight read, by namespace.",
+            ("key",),
+        )
+        self._statements: dict[str, str] = {}
+        # Scopes of the requests being handled right now, by id
+        self.in_flight: dict[int, Scope] = {}
+
+    def _statement_label(self, query: str) -> str:
+        label = self._statements.get(query)
+        if label is None:
+            if len(self._statements) >= MAX_STATEMENT_LABELS:
+                return "other"
+            label = " ".join(query.split())[:MAX_STATEMENT_LENGTH]
+            self._statements[query] = label
+        return label
+
+    def observe_query(self, record: asyncpg.connection.LoggedQuery) -> None:
+        """asyncpg query logger callback."""
+        statement = self._statement_label(record.query)
+        self.query_duration.observe(record.elapsed, statement)
+        if record.exception is not None:
+            self.query_errors.inc(statement)
+
+    async def instrument_connection(self, conn: asyncpg.Connection) -> None:
+        """Pool `init` hook: log the duration of every query on `conn`."""
+        conn.add_query_logger(self.observe_query)
+
+    def render(self, pool: InstrumentedPool | None = None) -> str:
+        self.requests_in_flight.clear()
+        for scope in list(self.in_flight.values()):
+            self.requests_in_flight.inc(scope["method"], _route(scope))
+        if pool is not None:
+            self.pool_size.set(value=pool.get_size())
+            self.pool_idle.set(value=pool.get_idle_size())
+            self.pool_max_size.set(value=pool.get_max_size())
+        lines = []
+        for metric in (
+            self.request_duration,
+            self.requests,
+            self.requests_in_flight,
+            self.pool_size,
+            self.pool_idle,
+            self.pool_max_size,
+            self.pool_acquire,
+            self.query_duration,
+            self.query_errors,
+            self.singleflight_leaders,
+            self.singleflight_collapsed,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _route(scope: Scope) -> str:
+    # FastAPI stores the matched route in the (shared) scope once it has routed
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records the latency, status and in-flight count of every HTTP request.
+
+    A plain ASGI middleware, rather than `BaseHTTPMiddleware`, so that it adds no
+    extra task or body streaming to each request. Requests are labelled with the
+    path template of the route they match (e.g. `/posts/{post_id}`), never the
+    raw path, to keep the number of series bounded.
+
+    The route is only known once the app has routed the request, so in-flight
+    requests are tracked by scope and counted per route when metrics are rendered.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        key = id(scope)
+        metrics.in_flight[key] = scope
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            del metrics.in_flight[key]
+            method, route = scope["method"], _route(scope)
+            metrics.request_duration.observe(elapsed, method, route)
+            metrics.requests.inc(method, route, str(status))
+
+
+_metrics: Metrics | None = None
+
+
+def init_metrics() -> None:
+    global _metrics  # noqa: PLW0603
+
+    _metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    if _metrics is None:
+        raise RuntimeError("Metrics not initialized")
+    return _metrics
+
+
+MetricsDep = Annotated[Metrics, Depends(get_metrics)]
@@ -1,18 +1,53 @@
 from __future__ import annotations
 
-from .comments import CommentCreate, CommentResponse, CommentTreeResponse, CommentUpdate
-from .posts import PostCreate, PostListResponse, PostResponse, PostUpdate
-from .votes import VoteRequest, VoteResponse
+from .batch import MAX_BATCH_IDS, BatchIds
+from .comments import (
+    CommentBatchResponse,
+    CommentCreate,
+    CommentResponse,
+    CommentTreeResponse,
+    CommentUpdate,
+)
+from .posts import (
+    PostBatchResponse,
+    PostCreate,
+    PostListResponse,
+    PostResponse,
+    PostSort,
+    PostUpdate,
+)
+from .search import SearchResponse, SearchResult
+from .votes import (
+    UserVote,
+    UserVoteListResponse,
+    VoteBatchItem,
+    VoteBatchRequest,
+    VoteBatchResponse,
+    VoteRequest,
+    VoteResponse,
+)
 
 __all__ = [
+    "MAX_BATCH_IDS",
+    "BatchIds",
+    "CommentBatchResponse",
     "CommentCreate",
     "CommentResponse",
     "CommentTreeResponse",
     "CommentUpdate",
+    "PostBatchResponse",
     "PostCreate",
     "PostListResponse",
     "PostResponse",
+    "PostSort",
     "PostUpdate",
+    "SearchResponse",
+    "SearchResult",
+    "UserVote",
+    "UserVoteListResponse",
+    "VoteBatchItem",
+    "VoteBatchRequest",
+    "VoteBatchResponse",
     "VoteRequest",
     "VoteResponse",
 ]
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Annotated, Any
+from uuid import UUID
+
+from pydantic import BeforeValidator, Field
+
+# Keeps a request for the most ids (as ~37 bytes each) within nginx's 16k header buffers
+MAX_BATCH_IDS = 250
+
+
+def _split_commas(value: Any) -> Any:
+    if isinstance(value, str):
+        value = [value]
+    if isinstance(value, list):
+        return [part for item in value for part in str(item).split(",") if part]
+    return value
+
+
+# Ids to look up in one request, as `?ids=a,b,c` and/or `?ids=a&ids=b`
+BatchIds = Annotated[
+    list[UUID],
+    BeforeValidator(_split_commas),
+    Field(min_length=1, max_length=MAX_BATCH_IDS),
+]
@@ -30,4 +30,9 @@ class CommentResponse(BaseModel):
 
 class CommentTreeResponse(BaseModel):
     items: list[CommentResponse]
-    next_cursor: UUID | None
+    next_cursor: str | None
+
+
+class CommentBatchResponse(BaseModel):
+    # In the order requested, with null for every id that was not found
+    items: list[CommentResponse | None]
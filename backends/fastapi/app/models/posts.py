@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel
 
+# Orders of the Post list: oldest first, newest first, hottest, highest scored
+PostSort = Literal["old", "new", "hot", "top"]
+
 
 class PostCreate(BaseModel):
     title: str | None = None
@@ -25,8 +29,16 @@ class PostResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     vote_score: int
+    # Comments at every depth, and when the newest one was posted
+    comment_count: int
+    last_comment_at: datetime | None
 
 
 class PostListResponse(BaseModel):
     items: list[PostResponse]
-    next_cursor: UUID | None
+    next_cursor: str | None
+
+
+class PostBatchResponse(BaseModel):
+    # In the order requested, with null for every id that was not found
+    items: list[PostResponse | None]
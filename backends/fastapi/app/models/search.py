@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    object_type: Literal["Post", "Comment"]
+    id: UUID
+    # The Post itself, or the Post the Comment belongs to
+    post_id: UUID
+    # Only set for Posts
+    title: str | None
+    author: str
+    created_at: datetime
+    rank: float
+    # Excerpts of the body around the matches, which are wrapped in <mark></mark>
+    snippet: str
+
+
+class SearchResponse(BaseModel):
+    items: list[SearchResult]
+    next_cursor: str | None
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+from typing import Literal
 from uuid import UUID
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
+
+MAX_VOTE_BATCH_SIZE = 500
 
 
 class VoteRequest(BaseModel):
@@ -21,3 +24,27 @@ class VoteResponse(BaseModel):
     object_id: UUID
     object_type: str
     vote_score: int
+
+
+class VoteBatchItem(VoteRequest):
+    object_type: Literal["Post", "Comment"]
+    object_id: UUID
+
+
+class VoteBatchRequest(BaseModel):
+    votes: list[VoteBatchItem] = Field(min_length=1, max_length=MAX_VOTE_BATCH_SIZE)
+
+
+class VoteBatchResponse(BaseModel):
+    items: list[VoteResponse]
+
+
+class UserVote(BaseModel):
+    object_type: Literal["Post", "Comment"]
+    object_id: UUID
+    value: int
+
+
+class UserVoteListResponse(BaseModel):
+    items: list[UserVote]
+    next_cursor: str | None
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Annotated, Any
+
+import asyncpg
+from fastapi import Depends
+
+from app.config import Settings, get_settings
+
+if TYPE_CHECKING:
+    from app.db import InstrumentedPool
+
+
+class ReadinessProbe:
+    """Decides whether this instance should receive traffic.
+
+    The database is pinged over a connection of the probe's own, kept open between
+    checks, so that a probe still gets an answer when the request pool is exhausted,
+    and does not add to that exhaustion. The whole ping (including any reconnect)
+    is bounded by `readiness_db_timeout_seconds`.
+
+    The instance is unready when the ping fails, or when the request pool crosses any
+    of the saturation thresholds in `Settings`:
+    - `readiness_max_pool_utilization`: share of the pool's max size in use
+      (the default of 1.0 never trips on its own, since a busy pool is normal)
+    - `readiness_max_acquire_waiting`: requests queued for a connection
+    - `readiness_max_acquire_seconds`: 95th percentile acquire wait over the last
+      `readiness_acquire_window_seconds`
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._conn: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    async def ping(self) -> float:
+        """Runs `SELECT 1` on the probe's own connection; returns its latency (s)."""
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.settings.readiness_db_timeout_seconds):
+                async with self._lock:
+                    if self._conn is None or self._conn.is_closed():
+                        self._conn = await asyncpg.connect(
+                            self.settings.db_connection_url
+                        )
+                    await self._conn.fetchval("SELECT 1")
+        except BaseException:
+            # The connection may be stuck mid-query; start over on the next check
+            await self.close()
+            raise
+        return time.perf_counter() - start
+
+    async def check(self, pool: InstrumentedPool) -> dict[str, Any]:
+        settings = self.settings
+        reasons = []
+
+        database: dict[str, Any] = {"ok": True}
+        try:
+            database["latency_ms"] = round(await self.ping() * 1000, 3)
+        except (
+            OSError,
+            TimeoutError,
+            asyncpg.PostgresError,
+            asyncpg.InterfaceError,
+        ) as exc:
+            database = {"ok": False, "error": type(exc).__name__}
+            reasons.append("database unreachable")
+
+        max_size = pool.get_max_size()
+        in_use = pool.get_size() - pool.get_idle_size()
+        utilization = in_use / max_size if max_size else 0.0
+        waiting = pool.waiting
+        acquire_seconds = pool.recent_acquire_seconds(
+            settings.readiness_acquire_window_seconds
+        )
+        if utilization > settings.readiness_max_pool_utilization:
+            reasons.append("pool utilization above threshold")
+        if waiting > settings.readiness_max_acquire_waiting:
+            reasons.append("too many requests waiting for a connection")
+        if acquire_seconds > settings.readiness_max_acquire_seconds:
+            reasons.append("pool acquire latency above threshold")
+
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "database": database,
+            "pool": {
+                "size": pool.get_size(),
+                "in_use": in_use,
+                "max_size": max_size,
+                "utilization": round(utilization, 3),
+                "waiting": waiting,
+                "acquire_p95_ms": round(acquire_seconds * 1000, 3),
+            },
+        }
+
+    async def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            conn.terminate()
+
+
+_probe: ReadinessProbe | None = None
+
+
+def init_readiness() -> None:
+    global _probe  # noqa: PLW0603
+
+    _probe = ReadinessProbe(get_settings())
+
+
+async def close_readiness() -> None:
+    if _probe:
+        await _probe.close()
+
+
+def get_readiness_probe() -> ReadinessProbe:
+    if _probe is None:
+        raise RuntimeError("Readiness probe not initialized")
+    return _probe
+
+
+ReadinessDep = Annotated[ReadinessProbe, Depends(get_readiness_probe)]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import datetime
+import hashlib
+from typing import Any
+
+import asyncpg
+import pydantic_core
+from fastapi import Request, Response, status
+
+from app.config import get_settings
+
+
+def _record_fallback(value: Any) -> Any:
+    if isinstance(value, asyncpg.Record):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _unwrap_records(value: Any) -> Any:
+    """`value` with the Records in its dicts and lists turned into dicts.
+
+    The serializer has no native support for Records, and calling back into Python
+    for each one costs it more than building its dict here.
+    """
+    if isinstance(value, asyncpg.Record):
+        return dict(value.items())
+    if isinstance(value, dict):
+        return {key: _unwrap_records(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unwrap_records(item) for item in value]
+    return value
+
+
+def dump_json(content: Any) -> bytes:
+    """Serializes `content`, including any asyncpg Records inside it, to JSON bytes.
+
+    Uses the same Rust serializer as pydantic, so UUIDs and datetimes come out exactly
+    as they would from a response model, but without building or validating any models.
+    Callers must select exactly the columns of the documented response model.
+    """
+    return pydantic_core.to_json(_unwrap_records(content), fallback=_record_fallback)
+
+
+class JSONBytesResponse(Response):
+    """A response whose body has already been serialized with `dump_json`.
+
+    Returning a Response from a handler bypasses FastAPI's validation and serialization
+    of `response_model`, while the route's `response_model` still documents the schema.
+    """
+
+    media_type = "application/json"
+
+
+def body_etag(body: bytes) -> str:
+    """A strong ETag for a serialized body: changes whenever any byte of it does.
+
+    The body has to be built before its ETag is known, so a 304 for it saves only
+    the bytes sent, not the query; `version_etag` saves both.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def version_etag(
+    updated_at: datetime.datetime, *counters: int | datetime.datetime | None
+) -> str:
+    """A strong ETag for a single Post or Comment, without serializing it.
+
+    Every edit moves `updated_at`; pass every column that changes without an edit
+    (`vote_score`, and a Post's comment counters) as `counters`, so that together
+    they identify one version of the resource's representation.
+    """
+    parts = [
+        f"{value.timestamp():.6f}" if isinstance(value, datetime.datetime) else value
+        for value in (updated_at, *counters)
+    ]
+    return '"' + "-".join(map(str, parts)) + '"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _cache_headers(etag: str) -> dict[str, str]:
+    max_age = get_settings().http_cache_max_age_seconds
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """An empty 304 response if the client already has `etag`, else None.
+
+    Check this before serializing the body, when `etag` is known without it.
+    """
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag)
+        )
+    return None
+
+
+def cacheable_response(body: bytes, etag: str) -> JSONBytesResponse:
+    """A response for `body` with its ETag and a short public `Cache-Control` lifetime.
+
+    Browsers and the nginx micro-cache (see nginx/nginx.conf) serve it for that long,
+    then revalidate it with If-None-Match.
+    """
+    return JSONBytesResponse(body, headers=_cache_headers(etag))
@@ -1,11 +1,21 @@
+from .comments import batch_router as comment_batch_router
 from .comments import router as comments_router
+from .events import router as events_router
 from .health import router as health_router
+from .metrics import router as metrics_router
 from .posts import router as posts_router
+from .search import router as search_router
+from .users import router as users_router
 from .votes import router as votes_router
 
 ALL_ROUTERS = [
     health_router,
     posts_router,
     comments_router,
+    comment_batch_router,
     votes_router,
+    search_router,
+    users_router,
+    events_router,
+    metrics_router,
 ]
@@ -1,34 +1,58 @@
 from __future__ import annotations
 
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status
+import asyncpg
+from fastapi import APIRouter, HTTPException, Query, Request, status
 
-from app.db import PoolDep
+from app.cache import CacheDep
+from app.cursors import decode_cursor, encode_cursor
+from app.db import PoolDep, ReadPoolDep
 from app.models import (
+    BatchIds,
+    CommentBatchResponse,
     CommentCreate,
     CommentResponse,
     CommentTreeResponse,
     CommentUpdate,
 )
+from app.responses import (
+    body_etag,
+    cacheable_response,
+    dump_json,
+    not_modified,
+    version_etag,
+)
+from app.singleflight import (
+    COMMENT_BATCH_KEY,
+    COMMENT_KEY,
+    COMMENT_TREE_KEY,
+    REPLIES_KEY,
+    SingleFlightDep,
+)
 
 router = APIRouter(
     prefix="/posts/{post_id}/comments",
     tags=["comments"],
 )
+# Comments by id alone, across Posts
+batch_router = APIRouter(prefix="/comments", tags=["comments"])
 
 DEFAULT_MAX_DEPTH = 2
 DEFAULT_COMMENTS_PAGE_SIZE = 10
+PARENT_COMMENT_FK = "comments_parent_comment_id_fkey"
 
 
-@router.get("", response_model=CommentTreeResponse)
-async def list_comments(
-    pool: PoolDep,
+async def _load_comment_tree(
+    pool,
     post_id: UUID,
-    cursor: UUID | None = None,
-    max_depth: int = DEFAULT_MAX_DEPTH,
-    replies_per_page: int = DEFAULT_COMMENTS_PAGE_SIZE,
+    cursor: str | None,
+    *,
+    max_depth: int,
+    replies_per_page: int,
 ):
+    cursor_created_at, cursor_id = decode_cursor(cursor) if cursor else (None, None)
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
@@ -43,74 +67,198 @@ async def list_comments(
                 vote_score,
                 depth
             FROM get_comment_tree(
-                p_post_id   := $1,
-                p_max_depth := $2,
-                p_page_size := $3,
-                p_cursor_id := $4
+                p_post_id           := $1,
+                p_max_depth         := $2,
+                p_page_size         := $3,
+                p_cursor_created_at := $4,
+                p_cursor_id         := $5
             )
             """,
             post_id,
             max_depth,
             replies_per_page,
-            cursor,
+            cursor_created_at,
+            cursor_id,
         )
     top_level = [r for r in rows if r["depth"] == 0]
-    next_cursor = top_level[-1]["id"] if len(top_level) == replies_per_page else None
-    items = [CommentResponse(**dict(r)) for r in rows]
-    return CommentTreeResponse(items=items, next_cursor=next_cursor)
+    next_cursor = (
+        encode_cursor(top_level[-1]["created_at"], top_level[-1]["id"])
+        if len(top_level) == replies_per_page
+        else None
+    )
+    body = dump_json({"items": rows, "next_cursor": next_cursor})
+    return body, body_etag(body)
+
+
+# Comment reads go through single-flight (see `app.singleflight`), so that identical
+# concurrent requests share one query and one serialized body.
+# Trees and batches have no version of their own to check first: edits and votes
+# on any comment in them change the body, and bumping a per-thread version on each
+# would put every comment vote on its Post's row lock. So their ETags digest the
+# body, and a 304 for them saves bandwidth, not the tree query.
+@router.get("", response_model=CommentTreeResponse)
+async def list_comments(
+    request: Request,
+    pool: ReadPoolDep,
+    flights: SingleFlightDep,
+    post_id: UUID,
+    *,
+    cursor: str | None = None,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    replies_per_page: int = DEFAULT_COMMENTS_PAGE_SIZE,
+):
+    body, etag = await flights.do(
+        (COMMENT_TREE_KEY, post_id, cursor, max_depth, replies_per_page, pool),
+        lambda: _load_comment_tree(
+            pool,
+            post_id,
+            cursor,
+            max_depth=max_depth,
+            replies_per_page=replies_per_page,
+        ),
+    )
+    return not_modified(request, etag) or cacheable_response(body, etag)
 
 
 @router.post("", response_model=CommentResponse, status_code=201)
 async def create_comment(
     pool: PoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     post_id: UUID,
     payload: CommentCreate,
 ):
-    async with pool.acquire() as conn:
-        exists = await conn.fetchval("SELECT 1 FROM posts WHERE id = $1", post_id)
-        if not exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Post not found",
+    try:
+        async with pool.acquire() as conn:
+            # Checking the Post and a reply's parent (which must belong to the same
+            # Post) inline keeps this to a single statement that always returns a
+            # row; a Post deleted in the meantime still trips the FK.
+            row = await conn.fetchrow(
+                """
+                WITH post AS (
+                    SELECT EXISTS (SELECT 1 FROM posts WHERE id = $1) AS found
+                ),
+                inserted AS (
+                    INSERT INTO comments
+                    (post_id, parent_comment_id, author, body)
+                    SELECT $1::uuid, $2::uuid, $3, $4
+                    FROM post
+                    WHERE post.found AND ($2::uuid IS NULL OR EXISTS (
+                        SELECT 1 FROM comments
+                        WHERE id = $2
+                        AND post_id = $1
+                    ))
+                    RETURNING
+                        id,
+                        post_id,
+                        parent_comment_id,
+                        author,
+                        body,
+                        created_at,
+                        updated_at,
+                        vote_score,
+                        depth
+                )
+                SELECT post.found AS post_found, inserted.*
+                FROM post
+                LEFT JOIN inserted ON TRUE
+                """,
+                post_id,
+                payload.parent_comment_id,
+                payload.author,
+                payload.body,
             )
+            if not row["post_found"]:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Post not found",
+                )
+            if row["id"] is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Parent comment not found",
+                )
+            # The author's auto-upvote is scored by AFTER triggers, which
+            # RETURNING runs too early to see
+            vote_score = await conn.fetchval(
+                """
+                SELECT vote_score + pending_vote_delta('Comment', id)
+                FROM comments WHERE id = $1
+                """,
+                row["id"],
+            )
+    except asyncpg.ForeignKeyViolationError as exc:
+        # asyncpg sets the error's fields at runtime, from the server's message
+        if getattr(exc, "constraint_name", None) == PARENT_COMMENT_FK:
+            detail = "Parent comment not found"
+        else:
+            detail = "Post not found"
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=detail,
+        ) from exc
+    # The Post's comment_count and last_comment_at just changed
+    cache.invalidate_post(post_id)
+    flights.forget_post(post_id)
+    flights.forget_comments(post_id)
+    comment = dict(row)
+    del comment["post_found"]
+    # None only if the Comment was deleted in between
+    if vote_score is not None:
+        comment["vote_score"] = vote_score
+    return CommentResponse(**comment)
+
+
+async def _load_comment(pool, post_id: UUID, comment_id: UUID):
+    """The Comment's body and ETag, or None if it is not on this Post."""
+    async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            INSERT INTO comments
-            (post_id, parent_comment_id, author, body)
-            VALUES
-            ($1, $2, $3, $4)
-            RETURNING *
+            SELECT
+                id,
+                post_id,
+                parent_comment_id,
+                author,
+                body,
+                created_at,
+                updated_at,
+                vote_score + pending_vote_delta('Comment', id) AS vote_score,
+                depth
+            FROM comments
+            WHERE id = $1 AND post_id = $2
             """,
+            comment_id,
             post_id,
-            payload.parent_comment_id,
-            payload.author,
-            payload.body,
         )
-    return CommentResponse(**dict(row))
+    if not row:
+        return None
+    return dump_json(row), version_etag(row["updated_at"], row["vote_score"])
 
 
 @router.get("/{comment_id}", response_model=CommentResponse)
 async def get_comment(
-    pool: PoolDep,
+    request: Request,
+    pool: ReadPoolDep,
+    flights: SingleFlightDep,
     post_id: UUID,
     comment_id: UUID,
 ):
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM comments WHERE id = $1 AND post_id = $2",
-            comment_id,
-            post_id,
-        )
-    if not row:
+    loaded = await flights.do(
+        (COMMENT_KEY, post_id, comment_id, pool),
+        lambda: _load_comment(pool, post_id, comment_id),
+    )
+    if loaded is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found"
         )
-    return CommentResponse(**dict(row))
+    body, etag = loaded
+    return not_modified(request, etag) or cacheable_response(body, etag)
 
 
 @router.patch("/{comment_id}", response_model=CommentResponse)
 async def update_comment(
     pool: PoolDep,
+    flights: SingleFlightDep,
     post_id: UUID,
     comment_id: UUID,
     payload: CommentUpdate,
@@ -130,12 +278,22 @@ async def update_comment(
             UPDATE comments
             SET {set_clauses}
             WHERE id = $1 AND post_id = $2
-            RETURNING *
+            RETURNING
+                id,
+                post_id,
+                parent_comment_id,
+                author,
+                body,
+                created_at,
+                updated_at,
+                vote_score + pending_vote_delta('Comment', id) AS vote_score,
+                depth
             """,
             comment_id,
             post_id,
             *values,
         )
+    flights.forget_comments(post_id)
     if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found"
@@ -146,6 +304,8 @@ async def update_comment(
 @router.delete("/{comment_id}", status_code=204)
 async def delete_comment(
     pool: PoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     post_id: UUID,
     comment_id: UUID,
 ):
@@ -159,17 +319,23 @@ async def delete_comment(
             comment_id,
             post_id,
         )
+    # The Post's comment_count dropped by the size of the deleted subtree
+    cache.invalidate_post(post_id)
+    flights.forget_post(post_id)
+    flights.forget_comments(post_id)
 
 
-@router.get("/{comment_id}/replies", response_model=CommentTreeResponse)
-async def list_replies(
-    pool: PoolDep,
+async def _load_reply_tree(
+    pool,
     post_id: UUID,
     comment_id: UUID,
-    cursor: UUID | None = None,
-    max_depth: int = DEFAULT_MAX_DEPTH,
-    replies_per_page: int = DEFAULT_COMMENTS_PAGE_SIZE,
+    cursor: str | None,
+    *,
+    max_depth: int,
+    replies_per_page: int,
 ):
+    """The reply tree's body and ETag, or None if the Comment is not on this Post."""
+    cursor_created_at, cursor_id = decode_cursor(cursor) if cursor else (None, None)
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
@@ -184,40 +350,112 @@ async def list_replies(
                 vote_score,
                 depth
             FROM get_reply_tree(
-                p_post_id    := $1,
-                p_comment_id := $2,
-                p_max_depth  := $3,
-                p_page_size  := $4,
-                p_cursor_id  := $5
+                p_post_id           := $1,
+                p_comment_id        := $2,
+                p_max_depth         := $3,
+                p_page_size         := $4,
+                p_cursor_created_at := $5,
+                p_cursor_id         := $6
             )
             """,
             post_id,
             comment_id,
             max_depth,
             replies_per_page,
-            cursor,
+            cursor_created_at,
+            cursor_id,
         )
-        if not rows:
-            # Distinguish "comment not found" from "comment has no replies"
-            exists = await conn.fetchval(
-                """
-                SELECT 1
-                FROM comments
-                WHERE id = $1
-                AND post_id = $2
-                """,
-                comment_id,
-                post_id,
-            )
-            if not exists:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Comment not found",
-                )
-            return CommentTreeResponse(items=[], next_cursor=None)
+        # Distinguish "comment not found" from "comment has no replies"
+        if not rows and not await conn.fetchval(
+            """
+            SELECT 1
+            FROM comments
+            WHERE id = $1
+            AND post_id = $2
+            """,
+            comment_id,
+            post_id,
+        ):
+            return None
     direct_replies = [r for r in rows if r["depth"] == 1]
     next_cursor = (
-        direct_replies[-1]["id"] if len(direct_replies) == replies_per_page else None
+        encode_cursor(direct_replies[-1]["created_at"], direct_replies[-1]["id"])
+        if len(direct_replies) == replies_per_page
+        else None
+    )
+    body = dump_json({"items": rows, "next_cursor": next_cursor})
+    return body, body_etag(body)
+
+
+@router.get("/{comment_id}/replies", response_model=CommentTreeResponse)
+async def list_replies(
+    request: Request,
+    pool: ReadPoolDep,
+    flights: SingleFlightDep,
+    post_id: UUID,
+    comment_id: UUID,
+    *,
+    cursor: str | None = None,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    replies_per_page: int = DEFAULT_COMMENTS_PAGE_SIZE,
+):
+    loaded = await flights.do(
+        (REPLIES_KEY, post_id, comment_id, cursor, max_depth, replies_per_page, pool),
+        lambda: _load_reply_tree(
+            pool,
+            post_id,
+            comment_id,
+            cursor,
+            max_depth=max_depth,
+            replies_per_page=replies_per_page,
+        ),
+    )
+    if loaded is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found"
+        )
+    body, etag = loaded
+    return not_modified(request, etag) or cacheable_response(body, etag)
+
+
+async def _load_comments_by_ids(pool, ids: list[UUID]):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT
+                id,
+                post_id,
+                parent_comment_id,
+                author,
+                body,
+                created_at,
+                updated_at,
+                vote_score + pending_vote_delta('Comment', id) AS vote_score,
+                depth
+            FROM comments
+            WHERE id = ANY($1::uuid[])
+            """,
+            ids,
+        )
+    by_id = {row["id"]: row for row in rows}
+    body = dump_json({"items": [by_id.get(comment_id) for comment_id in ids]})
+    return body, body_etag(body)
+
+
+@batch_router.get("", response_model=CommentBatchResponse)
+async def get_comments_by_ids(
+    request: Request,
+    pool: ReadPoolDep,
+    flights: SingleFlightDep,
+    ids: Annotated[BatchIds, Query()],
+):
+    """Comments by id, whichever Posts they belong to.
+
+    `ids` takes up to MAX_BATCH_IDS comma-separated (or repeated) ids, fetched
+    in one query; `items` follows their order, with null for ids not found.
+    """
+    body, etag = await flights.do(
+        (COMMENT_BATCH_KEY, tuple(ids), pool),
+        lambda: _load_comments_by_ids(pool, ids),
     )
-    items = [CommentResponse(**dict(r)) for r in rows]
-    return CommentTreeResponse(items=items, next_cursor=next_cursor)
+    return not_modified(request, etag) or cacheable_response(body, etag)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+from uuid import UUID
+
+import asyncpg
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.db import ReadPoolDep
+from app.events import EventBrokerDep, Subscription
+
+router = APIRouter(prefix="/posts", tags=["events"])
+
+# How long an EventSource waits before reconnecting after the stream ends (ms)
+RETRY_MILLISECONDS = 3000
+
+
+async def _stream(subscription: Subscription, keepalive_seconds: float):
+    yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+    while True:
+        try:
+            async with asyncio.timeout(keepalive_seconds):
+                events = await subscription.get()
+        except TimeoutError:
+            # Comments are ignored by clients, but keep proxies from timing out
+            yield b": keepalive\n\n"
+            continue
+        yield "".join(
+            f"event: {name}\ndata: {data}\n\n" for name, data in events
+        ).encode()
+        if subscription.closed:
+            return
+
+
+@router.get("/{post_id}/events")
+async def stream_post_events(
+    pool: ReadPoolDep,
+    broker: EventBrokerDep,
+    post_id: UUID,
+):
+    """Server-Sent Events stream of a Post's vote scores and new comments.
+
+    Emits `vote` events (the new `vote_score` of the Post or one of its Comments;
+    bursts of votes are coalesced into the latest score) and `comment` events
+    (a new Comment's ids, author and depth). A `reset` event means events were
+    dropped; the client should refetch the Post and subscribe again.
+    """
+    async with pool.acquire() as conn:
+        exists = await conn.fetchval("SELECT 1 FROM posts WHERE id = $1", post_id)
+    if not exists:
+        raise HTTPException(status_code=404, detail="Post not found")
+    try:
+        subscription = await broker.subscribe(post_id)
+    except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Event stream unavailable",
+        ) from exc
+
+    async def stream():
+        try:
+            async for chunk in _stream(
+                subscription, broker.settings.events_keepalive_seconds
+            ):
+                yield chunk
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Tell nginx not to buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
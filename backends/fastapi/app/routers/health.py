@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, status
+
+from app.cache import CacheDep
+from app.db import PoolDep
+from app.readiness import ReadinessDep
 
 router = APIRouter(
     prefix="/health",
@@ -11,3 +15,29 @@ router = APIRouter(
 @router.get("")
 def health_check():
     return {"message": "ok"}
+
+
+@router.get("/live")
+def liveness():
+    """Liveness: the process is up and serving requests. Never touches the database."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness(pool: PoolDep, probe: ReadinessDep):
+    """Readiness: the database answers and the pool is not saturated.
+
+    Responds 503 with the same report when not ready, so load balancers drain
+    this instance until it recovers.
+    """
+    report = await probe.check(pool)
+    if not report["ready"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=report
+        )
+    return report
+
+
+@router.get("/cache")
+def cache_stats(cache: CacheDep):
+    return cache.stats()
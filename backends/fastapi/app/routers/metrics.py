@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.db import PoolDep
+from app.metrics import CONTENT_TYPE, MetricsDep
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@router.get("", response_class=PlainTextResponse)
+def metrics(pool: PoolDep, metrics: MetricsDep):
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(pool), media_type=CONTENT_TYPE)
@@ -1,74 +1,434 @@
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from app.db import PoolDep
-from app.models import PostCreate, PostListResponse, PostResponse, PostUpdate
+from app.cache import POST_KEY, POST_PAGE_KEY, CacheDep
+from app.cursors import (
+    RANKED_FEEDS,
+    decode_cursor,
+    decode_ranked_cursor,
+    encode_cursor,
+    encode_ranked_cursor,
+)
+from app.db import PoolDep, ReadPoolDep, ReplicaSet, wrote_recently
+from app.models import (
+    BatchIds,
+    PostBatchResponse,
+    PostCreate,
+    PostListResponse,
+    PostResponse,
+    PostSort,
+    PostUpdate,
+)
+from app.responses import (
+    body_etag,
+    cacheable_response,
+    dump_json,
+    not_modified,
+    version_etag,
+)
+from app.singleflight import POST_BATCH_KEY, SingleFlightDep
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
 PAGE_SIZE = 25
+# Comments fetched per round trip of an export's cursor, and written per chunk
+EXPORT_BATCH_SIZE = 500
 
 
-@router.get("", response_model=PostListResponse)
-async def list_posts(
-    pool: PoolDep,
-    cursor: UUID | None = None,
-):
+# Each sort order is a keyset seek on an index (see database_schema/migrations), so
+# a page costs the same however deep it is. Columns match PostResponse exactly,
+# since rows are serialized as-is.
+
+
+async def _fetch_old(conn, cursor: str | None) -> list:
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        return await conn.fetch(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE (created_at, id) > ($1, $2)
+            ORDER BY created_at ASC, id ASC
+            LIMIT $3
+            """,
+            created_at,
+            post_id,
+            PAGE_SIZE,
+        )
+    return await conn.fetch(
+        """
+        SELECT
+            id, title, body, author, created_at, updated_at, vote_score,
+            comment_count, last_comment_at
+        FROM posts
+        ORDER BY created_at ASC, id ASC
+        LIMIT $1
+        """,
+        PAGE_SIZE,
+    )
+
+
+async def _fetch_new(conn, cursor: str | None) -> list:
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        return await conn.fetch(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE (created_at, id) < ($1, $2)
+            ORDER BY created_at DESC, id DESC
+            LIMIT $3
+            """,
+            created_at,
+            post_id,
+            PAGE_SIZE,
+        )
+    return await conn.fetch(
+        """
+        SELECT
+            id, title, body, author, created_at, updated_at, vote_score,
+            comment_count, last_comment_at
+        FROM posts
+        ORDER BY created_at DESC, id DESC
+        LIMIT $1
+        """,
+        PAGE_SIZE,
+    )
+
+
+async def _fetch_hot(conn, cursor: str | None) -> list:
+    if cursor:
+        vote_score, created_at, post_id = decode_ranked_cursor(cursor, "hot")
+        # post_hot_rank() recomputes the exact rank the cursor's Post was sorted by
+        return await conn.fetch(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE (hot_rank, id) < (post_hot_rank($1, $2), $3)
+            ORDER BY hot_rank DESC, id DESC
+            LIMIT $4
+            """,
+            vote_score,
+            created_at,
+            post_id,
+            PAGE_SIZE,
+        )
+    return await conn.fetch(
+        """
+        SELECT
+            id, title, body, author, created_at, updated_at, vote_score,
+            comment_count, last_comment_at
+        FROM posts
+        ORDER BY hot_rank DESC, id DESC
+        LIMIT $1
+        """,
+        PAGE_SIZE,
+    )
+
+
+async def _fetch_top(conn, cursor: str | None) -> list:
+    if cursor:
+        vote_score, _, post_id = decode_ranked_cursor(cursor, "top")
+        return await conn.fetch(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE (vote_score, id) < ($1, $2)
+            ORDER BY vote_score DESC, id DESC
+            LIMIT $3
+            """,
+            vote_score,
+            post_id,
+            PAGE_SIZE,
+        )
+    return await conn.fetch(
+        """
+        SELECT
+            id, title, body, author, created_at, updated_at, vote_score,
+            comment_count, last_comment_at
+        FROM posts
+        ORDER BY vote_score DESC, id DESC
+        LIMIT $1
+        """,
+        PAGE_SIZE,
+    )
+
+
+_FETCH_PAGE = {
+    "old": _fetch_old,
+    "new": _fetch_new,
+    "hot": _fetch_hot,
+    "top": _fetch_top,
+}
+
+
+async def _load_page(pool, cache, sort: PostSort, cursor: str | None, *, fill: bool):
+    generation = cache.generation
     async with pool.acquire() as conn:
-        if cursor:
-            rows = await conn.fetch(
-                """
-                SELECT * FROM posts
-                WHERE (created_at, id) > (
-                    SELECT created_at, id FROM posts WHERE id = $1
-                )
-                ORDER BY created_at ASC, id ASC
-                LIMIT $2
-                """,
-                cursor,
-                PAGE_SIZE,
+        rows = await _FETCH_PAGE[sort](conn, cursor)
+    next_cursor = None
+    if len(rows) == PAGE_SIZE:
+        last = rows[-1]
+        if sort in RANKED_FEEDS:
+            next_cursor = encode_ranked_cursor(
+                sort, last["vote_score"], last["created_at"], last["id"]
             )
         else:
-            rows = await conn.fetch(
-                "SELECT * FROM posts ORDER BY created_at ASC, id ASC LIMIT $1",
-                PAGE_SIZE,
-            )
-    items = [PostResponse(**dict(r)) for r in rows]
-    next_cursor = items[-1].id if len(items) == PAGE_SIZE else None
-    return PostListResponse(items=items, next_cursor=next_cursor)
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+    body = dump_json({"items": rows, "next_cursor": next_cursor})
+    loaded = (body, body_etag(body))
+    if fill:
+        cache.set((POST_PAGE_KEY, sort, cursor), loaded, generation)
+    return loaded
+
+
+async def _load_posts_by_ids(pool, ids: list[UUID]):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at,
+                vote_score + pending_vote_delta('Post', id) AS vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE id = ANY($1::uuid[])
+            """,
+            ids,
+        )
+    by_id = {row["id"]: row for row in rows}
+    body = dump_json({"items": [by_id.get(post_id) for post_id in ids]})
+    return body, body_etag(body)
+
+
+# Post reads check the cache first, then go through single-flight (`app.singleflight`),
+# so that concurrent misses for the same key share one query and one serialized body.
+# Clients inside their read-your-writes window skip the cache, since their write may
+# have gone to another process.
+def _fills_cache(pool) -> bool:
+    """Whether a read from `pool` may be cached: only one from the primary.
+
+    A lagging replica could return a result older than a write that has already
+    invalidated the entry, which would then stay cached until it expires.
+    """
+    return not isinstance(pool, ReplicaSet)
+
+
+@router.get("", response_model=PostListResponse | PostBatchResponse)
+async def list_posts(
+    request: Request,
+    pool: ReadPoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
+    *,
+    cursor: str | None = None,
+    sort: PostSort = "old",
+    ids: Annotated[BatchIds | None, Query()] = None,
+):
+    """A page of Posts in `sort` order, or with `ids`, those Posts by id.
+
+    `ids` takes up to MAX_BATCH_IDS comma-separated (or repeated) ids, fetched
+    in one query; `items` follows their order, with null for ids not found.
+    """
+    if ids is not None:
+        body, etag = await flights.do(
+            (POST_BATCH_KEY, tuple(ids), pool),
+            lambda: _load_posts_by_ids(pool, ids),
+        )
+    elif (
+        not wrote_recently(request)
+        and (cached := cache.get((POST_PAGE_KEY, sort, cursor))) is not None
+    ):
+        body, etag = cached
+    else:
+        body, etag = await flights.do(
+            (POST_PAGE_KEY, sort, cursor, pool),
+            lambda: _load_page(pool, cache, sort, cursor, fill=_fills_cache(pool)),
+        )
+    return not_modified(request, etag) or cacheable_response(body, etag)
 
 
 @router.post("", response_model=PostResponse, status_code=201)
 async def create_post(
     pool: PoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     payload: PostCreate,
 ):
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
-            "INSERT INTO posts (title, body, author) VALUES ($1, $2, $3) RETURNING *",
+            """
+            INSERT INTO posts (title, body, author) VALUES ($1, $2, $3)
+            RETURNING
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            """,
             payload.title,
             payload.body,
             payload.author,
         )
-    return PostResponse(**dict(row))
+        # The author's auto-upvote is scored by AFTER triggers, which RETURNING
+        # runs too early to see
+        vote_score = await conn.fetchval(
+            """
+            SELECT vote_score + pending_vote_delta('Post', id)
+            FROM posts WHERE id = $1
+            """,
+            row["id"],
+        )
+    cache.invalidate_post()
+    flights.forget_post()
+    post = dict(row)
+    # None only if the Post was deleted in between
+    if vote_score is not None:
+        post["vote_score"] = vote_score
+    return PostResponse(**post)
+
+
+async def _load_post(pool, cache, post_id: UUID, *, fill: bool):
+    """The Post's body and ETag, or None if it does not exist."""
+    generation = cache.generation
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at,
+                vote_score + pending_vote_delta('Post', id) AS vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE id = $1
+            """,
+            post_id,
+        )
+    if not row:
+        return None
+    etag = version_etag(
+        row["updated_at"],
+        row["vote_score"],
+        row["comment_count"],
+        row["last_comment_at"],
+    )
+    loaded = (dump_json(row), etag)
+    if fill:
+        cache.set((POST_KEY, post_id), loaded, generation)
+    return loaded
 
 
 @router.get("/{post_id}", response_model=PostResponse)
 async def get_post(
-    pool: PoolDep,
+    request: Request,
+    pool: ReadPoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     post_id: UUID,
 ):
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT * FROM posts WHERE id = $1", post_id)
-    if not row:
+    loaded = None if wrote_recently(request) else cache.get((POST_KEY, post_id))
+    if loaded is None:
+        loaded = await flights.do(
+            (POST_KEY, post_id, pool),
+            lambda: _load_post(pool, cache, post_id, fill=_fills_cache(pool)),
+        )
+    if loaded is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return PostResponse(**dict(row))
+    body, etag = loaded
+    return not_modified(request, etag) or cacheable_response(body, etag)
+
+
+async def _export_thread(pool, post_id: UUID) -> AsyncGenerator[bytes]:
+    """NDJSON lines of a Post and every one of its Comments, in tree order.
+
+    Yields nothing at all if the Post does not exist. Comments are read through a
+    server-side cursor, one batch at a time, inside a read-only REPEATABLE READ
+    transaction, so the export is one consistent snapshot of the thread and memory
+    use does not depend on its size.
+    """
+    async with (
+        pool.acquire() as conn,
+        conn.transaction(isolation="repeatable_read", readonly=True),
+    ):
+        post = await conn.fetchrow(
+            """
+            SELECT
+                id, title, body, author, created_at, updated_at, vote_score,
+                comment_count, last_comment_at
+            FROM posts
+            WHERE id = $1
+            """,
+            post_id,
+        )
+        if post is None:
+            return
+        yield dump_json({"type": "post", **post}) + b"\n"
+
+        lines = []
+        async for row in conn.cursor(
+            """
+            SELECT
+                id,
+                post_id,
+                parent_comment_id,
+                author,
+                body,
+                created_at,
+                updated_at,
+                vote_score,
+                depth
+            FROM comments
+            WHERE post_id = $1
+            ORDER BY path
+            """,
+            post_id,
+            prefetch=EXPORT_BATCH_SIZE,
+        ):
+            lines.append(dump_json({"type": "comment", **row}))
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+
+@router.get("/{post_id}/export")
+async def export_post(pool: ReadPoolDep, post_id: UUID):
+    """The whole thread of a Post as NDJSON, streamed.
+
+    The first line is the Post; every other line is one of its Comments, in
+    depth-first tree order (each reply after its parent, siblings oldest first).
+    Each line has a `type` of either "post" or "comment".
+    """
+    lines = _export_thread(pool, post_id)
+    first = await anext(lines, None)
+    if first is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    async def stream() -> AsyncIterator[bytes]:
+        try:
+            yield first
+            async for chunk in lines:
+                yield chunk
+        finally:
+            # Release the connection right away if the client disconnects
+            await lines.aclose()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 @router.patch("/{post_id}", response_model=PostResponse)
 async def update_post(
     pool: PoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     post_id: UUID,
     payload: PostUpdate,
 ):
@@ -80,10 +440,18 @@ async def update_post(
     values = list(updates.values())
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
-            f"UPDATE posts SET {set_clauses} WHERE id = $1 RETURNING *",
+            f"""
+            UPDATE posts SET {set_clauses} WHERE id = $1
+            RETURNING
+                id, title, body, author, created_at, updated_at,
+                vote_score + pending_vote_delta('Post', id) AS vote_score,
+                comment_count, last_comment_at
+            """,
             post_id,
             *values,
         )
+    cache.invalidate_post(post_id)
+    flights.forget_post(post_id)
     if not row:
         raise HTTPException(status_code=404, detail="Post not found")
     return PostResponse(**dict(row))
@@ -92,7 +460,12 @@ async def update_post(
 @router.delete("/{post_id}", status_code=204)
 async def delete_post(
     pool: PoolDep,
+    cache: CacheDep,
+    flights: SingleFlightDep,
     post_id: UUID,
 ):
     async with pool.acquire() as conn:
         _ = await conn.execute("DELETE FROM posts WHERE id = $1", post_id)
+    cache.invalidate_post(post_id)
+    flights.forget_post(post_id)
+    flights.forget_comments(post_id)
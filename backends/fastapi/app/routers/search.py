@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Query
+
+from app.cursors import decode_search_cursor, encode_search_cursor
+from app.db import ReadPoolDep
+from app.models import SearchResponse
+from app.responses import JSONBytesResponse, dump_json
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+PAGE_SIZE = 20
+MAX_QUERY_LENGTH = 256
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    pool: ReadPoolDep,
+    q: Annotated[str, Query(min_length=1, max_length=MAX_QUERY_LENGTH)],
+    object_type: Literal["Post", "Comment"] | None = None,
+    author: str | None = None,
+    cursor: str | None = None,
+):
+    """Posts and Comments matching `q`, most relevant first.
+
+    `q` takes web search syntax: words are all required, "quoted phrases" match
+    as phrases, `or` between words matches either, and `-word` excludes a word.
+    Matching runs on the GIN-indexed `search_vector` columns, and snippets are
+    only built for the rows on the returned page.
+    """
+    cursor_rank, cursor_id = decode_search_cursor(cursor) if cursor else (None, None)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH hits AS (
+                SELECT
+                    'Post' AS object_type,
+                    p.id,
+                    p.id AS post_id,
+                    p.author,
+                    p.created_at,
+                    ts_rank(p.search_vector, websearch_to_tsquery('english', $1))
+                        AS rank
+                FROM posts p
+                WHERE p.search_vector @@ websearch_to_tsquery('english', $1)
+                AND $2::text IS DISTINCT FROM 'Comment'
+                AND ($3::text IS NULL OR p.author = $3)
+                UNION ALL
+                SELECT
+                    'Comment',
+                    c.id,
+                    c.post_id,
+                    c.author,
+                    c.created_at,
+                    ts_rank(c.search_vector, websearch_to_tsquery('english', $1))
+                FROM comments c
+                WHERE c.search_vector @@ websearch_to_tsquery('english', $1)
+                AND $2::text IS DISTINCT FROM 'Post'
+                AND ($3::text IS NULL OR c.author = $3)
+            ),
+            page AS (
+                SELECT *
+                FROM hits
+                WHERE $4::real IS NULL OR (rank, id) < ($4::real, $5::uuid)
+                ORDER BY rank DESC, id DESC
+                LIMIT $6
+            )
+            SELECT
+                page.object_type,
+                page.id,
+                page.post_id,
+                p.title,
+                page.author,
+                page.created_at,
+                page.rank,
+                ts_headline(
+                    'english',
+                    COALESCE(p.body, c.body),
+                    websearch_to_tsquery('english', $1),
+                    'StartSel=<mark>, StopSel=</mark>, MaxFragments=2'
+                ) AS snippet
+            FROM page
+            LEFT JOIN posts p ON page.object_type = 'Post' AND p.id = page.id
+            LEFT JOIN comments c ON page.object_type = 'Comment' AND c.id = page.id
+            ORDER BY page.rank DESC, page.id DESC
+            """,
+            q,
+            object_type,
+            author,
+            cursor_rank,
+            cursor_id,
+            PAGE_SIZE,
+        )
+    next_cursor = (
+        encode_search_cursor(rows[-1]["rank"], rows[-1]["id"])
+        if len(rows) == PAGE_SIZE
+        else None
+    )
+    return JSONBytesResponse(dump_json({"items": rows, "next_cursor": next_cursor}))
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from app.cursors import decode_vote_cursor, encode_vote_cursor
+from app.db import ReadPoolDep
+from app.models import UserVoteListResponse
+from app.responses import JSONBytesResponse, dump_json
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+PAGE_SIZE = 50
+
+
+@router.get("/{username}/votes", response_model=UserVoteListResponse)
+async def list_user_votes(
+    pool: ReadPoolDep,
+    username: str,
+    cursor: str | None = None,
+):
+    """The votes cast by `username`, on the newest Posts and Comments first.
+
+    Votes do not record when they were cast, so they are listed by the id of their
+    object (a UUIDv7, in creation order). Each page is a keyset seek on the covering
+    `votes_voter_object_idx` in every partition of `votes`, merged in order.
+    A username that never voted has no votes, rather than a 404.
+    """
+    async with pool.acquire() as conn:
+        if cursor:
+            object_id, object_type = decode_vote_cursor(cursor)
+            rows = await conn.fetch(
+                """
+                SELECT object_type, object_id, vote_value AS value
+                FROM votes
+                WHERE voter = $1
+                AND (object_id, object_type) < ($2, $3)
+                ORDER BY object_id DESC, object_type DESC
+                LIMIT $4
+                """,
+                username,
+                object_id,
+                object_type,
+                PAGE_SIZE,
+            )
+        else:
+            rows = await conn.fetch(
+                """
+                SELECT object_type, object_id, vote_value AS value
+                FROM votes
+                WHERE voter = $1
+                ORDER BY object_id DESC, object_type DESC
+                LIMIT $2
+                """,
+                username,
+                PAGE_SIZE,
+            )
+    next_cursor = (
+        encode_vote_cursor(rows[-1]["object_id"], rows[-1]["object_type"])
+        if len(rows) == PAGE_SIZE
+        else None
+    )
+    return JSONBytesResponse(dump_json({"items": rows, "next_cursor": next_cursor}))
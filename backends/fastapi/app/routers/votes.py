@@ -5,127 +5,146 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
+from app.cache import CacheDep
 from app.db import PoolDep
-from app.models import VoteRequest, VoteResponse
+from app.models import (
+    VoteBatchRequest,
+    VoteBatchResponse,
+    VoteRequest,
+    VoteResponse,
+)
+from app.singleflight import SingleFlightDep
+from app.vote_buffer import FLUSH_ERRORS, VoteBufferDep
 
 router = APIRouter(tags=["votes"])
 
 if typing.TYPE_CHECKING:
-    import asyncpg
+    from app.cache import ResponseCache
+    from app.db import PoolLike
+    from app.singleflight import SingleFlight
+    from app.vote_buffer import VoteBuffer
 
 
 class VoteService:
-    """Service layer for applying votes, shared between endpoints."""
+    """Service layer for applying votes, shared between endpoints.
 
-    def __init__(self, pool: asyncpg.Pool) -> None:
-        self.pool = pool
-
-    def _get_table_for_object_type(self, object_type: str) -> str:
-        # TODO move this to some more generic service layer for all object types,
-        # which would be needed if some new table were added with more polymorphic keys.
-        if object_type.lower() in {"post", "posts"}:
-            return "posts"
-        if object_type.lower() in {"comment", "comments"}:
-            return "comments"
-        raise ValueError(f"Unknown object_type '{object_type}'")
+    With an enabled `buffer`, single votes are written behind (see `VoteBuffer`).
+    """
 
-    async def _validate_post_exists(
+    def __init__(
         self,
-        post_id: UUID,
+        pool: PoolLike,
+        cache: ResponseCache | None = None,
+        buffer: VoteBuffer | None = None,
+        flights: SingleFlight | None = None,
+    ) -> None:
+        self.pool = pool
+        self.cache = cache
+        self.buffer = buffer
+        self.flights = flights
+
+    def _invalidate_cached(
+        self, object_type: str, object_id: UUID, post_id: UUID | None = None
     ) -> None:
-        """Checks in the database whether the given Post exists.
+        """Drops any cached copy or in-flight read of an object whose score changed.
 
-        Raises HTTPException with 404 if not.
-        Otherwise, returns None.
+        A Comment's reads are keyed by its Post, so without `post_id` those of every
+        Post are forgotten.
         """
-        exists = await self.pool.fetchval(
-            """
-            SELECT 1 FROM posts
-            WHERE id = $1
-            """,
-            post_id,
-        )
-        if not exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Post not found",
-            )
+        if self.cache is not None and object_type == "Post":
+            self.cache.invalidate_post(object_id)
+        if self.flights is None:
+            return
+        if object_type == "Post":
+            self.flights.forget_post(object_id)
+        else:
+            self.flights.forget_comments(post_id)
 
-    async def _validate_comment_exists(
+    async def _apply_vote(
         self,
-        post_id: UUID,
-        comment_id: UUID,
-    ) -> None:
-        """Checks database whether this Comment exists and is a child of the given Post.
+        object_id: UUID,
+        object_type: str,
+        payload: VoteRequest,
+        post_id: UUID | None = None,
+    ) -> VoteResponse:
+        """Applies `payload` vote to the `object_type` object with ID `object_id`.
+
+        Validation, the vote write, and reading back the new score all happen in the
+        `cast_vote` stored function, so this costs one statement on one connection.
+        Pass `post_id` when voting on a Comment to also require it belongs to that Post.
 
-        Raises HTTPException with 404 if not. Otherwise, returns None.
+        Raises HTTPException with 404 if the object does not exist.
         """
-        exists = await self.pool.fetchval(
-            """
-            SELECT 1 FROM comments
-            WHERE post_id = $1
-            AND id = $2
-            """,
-            post_id,
-            comment_id,
-        )
-        if not exists:
+        if self.buffer is not None and self.buffer.enabled:
+            return await self._buffer_vote(
+                self.buffer, object_id, object_type, payload, post_id=post_id
+            )
+        async with self.pool.acquire() as conn:
+            score = await conn.fetchval(
+                "SELECT cast_vote($1, $2, $3, $4, $5)",
+                payload.username,
+                object_type,
+                object_id,
+                payload.value,
+                post_id,
+            )
+        if score is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Comment not found",
+                detail=f"{object_type} not found",
             )
+        self._invalidate_cached(object_type, object_id, post_id)
+        return VoteResponse(
+            object_id=object_id,
+            object_type=object_type,
+            vote_score=score,
+        )
 
-    async def _apply_vote(
+    async def _buffer_vote(
         self,
+        buffer: VoteBuffer,
         object_id: UUID,
         object_type: str,
         payload: VoteRequest,
+        *,
+        post_id: UUID | None,
     ) -> VoteResponse:
-        """Applies `payload` vote to the `object_type` object with ID `object_id`.
+        """Validates the target, then leaves the vote to the write-behind buffer.
 
-        Note we expect another call has validated that the object, its parents, and all
-        connections between them
-        already exist in the database.
+        The check is a primary key read, which never waits for the row lock that
+        concurrent score updates hold. The score returned is the one last written
+        (with any pending counters, see `app.vote_shards`), without the buffered
+        votes.
+
+        Raises HTTPException with 404 if the object does not exist, or 503 if the
+        buffer is full and the flush to make room fails.
         """
-        object_table = self._get_table_for_object_type(object_type)
         async with self.pool.acquire() as conn:
-            if payload.value == 0:
-                await conn.execute(
-                    """
-                    DELETE FROM votes
-                    WHERE voter = $1
-                    AND object_id = $2
-                    AND object_type = $3
-                    """,
-                    payload.username,
-                    object_id,
-                    object_type,
-                )
-            else:
-                await conn.execute(
-                    """
-                    INSERT INTO votes
-                    (voter, object_id, object_type, vote_value)
-                    VALUES
-                    ($1, $2, $3, $4)
-                    ON CONFLICT (object_id, object_type, voter)
-                    DO UPDATE SET vote_value = EXCLUDED.vote_value
-                    """,
-                    payload.username,
-                    object_id,
-                    object_type,
-                    payload.value,
-                )
-
-            # Grab the updated score of the object we voted on
             score = await conn.fetchval(
-                f"SELECT vote_score FROM {object_table} WHERE id = $1", object_id
+                """
+                SELECT vote_score + pending_vote_delta('Post', id) FROM posts
+                WHERE $2 = 'Post' AND id = $1
+                UNION ALL
+                SELECT vote_score + pending_vote_delta('Comment', id) FROM comments
+                WHERE $2 = 'Comment' AND id = $1
+                AND ($3::uuid IS NULL OR post_id = $3)
+                """,
+                object_id,
+                object_type,
+                post_id,
             )
-            if score is None:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"{object_type} not found",
-                )
+        if score is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{object_type} not found",
+            )
+        try:
+            await buffer.add(object_id, object_type, payload.username, payload.value)
+        except FLUSH_ERRORS as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Vote buffer is full",
+            ) from exc
         return VoteResponse(
             object_id=object_id,
             object_type=object_type,
@@ -137,7 +156,6 @@ class VoteService:
         post_id: UUID,
         payload: VoteRequest,
     ):
-        await self._validate_post_exists(post_id=post_id)
         return await self._apply_vote(
             object_id=post_id,
             object_type="Post",
@@ -150,19 +168,136 @@ class VoteService:
         comment_id: UUID,
         payload: VoteRequest,
     ):
-        await self._validate_comment_exists(post_id=post_id, comment_id=comment_id)
         return await self._apply_vote(
             object_id=comment_id,
             object_type="Comment",
             payload=payload,
+            post_id=post_id,
         )
 
+    async def vote_batch(
+        self,
+        payload: VoteBatchRequest,
+    ) -> VoteBatchResponse:
+        """Applies every vote in `payload` in a single transaction.
+
+        Repeated votes from the same user on the same object are collapsed so that
+        the last one wins, which matches replaying them one request at a time.
+        All targets are validated up front with one query: if any are missing,
+        raises HTTPException with 404 and nothing is written.
+        Otherwise, every upsert and delete is applied by one set-based statement,
+        and the new scores of all touched objects are returned in request order.
+        """
+        latest: dict[tuple[str, UUID, str], int] = {}
+        for vote in payload.votes:
+            latest[(vote.object_type, vote.object_id, vote.username)] = vote.value
+        # Dicts preserve first-insertion order, so targets come back in request order
+        targets = list(dict.fromkeys((t, i) for t, i, _ in latest))
+        target_types = [t for t, _ in targets]
+        target_ids = [i for _, i in targets]
+
+        # Apply writes in a stable order so concurrent batches that touch the same
+        # objects take their row locks in the same order, rather than deadlocking.
+        entries = sorted(latest.items())
+
+        async with self.pool.acquire() as conn, conn.transaction():
+            missing = await conn.fetch(
+                """
+                SELECT t.object_type, t.object_id
+                FROM unnest($1::text[], $2::uuid[]) AS t(object_type, object_id)
+                WHERE NOT CASE t.object_type
+                    WHEN 'Post' THEN EXISTS (
+                        SELECT 1 FROM posts p WHERE p.id = t.object_id
+                    )
+                    WHEN 'Comment' THEN EXISTS (
+                        SELECT 1 FROM comments c WHERE c.id = t.object_id
+                    )
+                    ELSE FALSE
+                END
+                """,
+                target_types,
+                target_ids,
+            )
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=[
+                        {
+                            "object_type": r["object_type"],
+                            "object_id": str(r["object_id"]),
+                            "msg": f"{r['object_type']} not found",
+                        }
+                        for r in missing
+                    ],
+                )
+
+            await conn.execute(
+                """
+                WITH batch AS (
+                    SELECT *
+                    FROM unnest($1::text[], $2::uuid[], $3::text[], $4::smallint[])
+                        AS t(object_type, object_id, voter, vote_value)
+                ),
+                removed AS (
+                    DELETE FROM votes v
+                    USING batch b
+                    WHERE b.vote_value = 0
+                    AND v.object_id = b.object_id
+                    AND v.object_type = b.object_type
+                    AND v.voter = b.voter
+                )
+                INSERT INTO votes
+                (voter, object_id, object_type, vote_value)
+                SELECT voter, object_id, object_type, vote_value
+                FROM batch
+                WHERE vote_value <> 0
+                ORDER BY object_type, object_id, voter
+                ON CONFLICT (object_id, object_type, voter)
+                DO UPDATE SET vote_value = EXCLUDED.vote_value
+                WHERE votes.vote_value <> EXCLUDED.vote_value
+                """,
+                [object_type for (object_type, _, _), _ in entries],
+                [object_id for (_, object_id, _), _ in entries],
+                [voter for (_, _, voter), _ in entries],
+                [value for _, value in entries],
+            )
+
+            # Scores are read in a separate statement so the trigger updates
+            # from the write above are visible.
+            rows = await conn.fetch(
+                """
+                SELECT
+                    t.object_type,
+                    t.object_id,
+                    COALESCE(p.vote_score, c.vote_score)
+                        + pending_vote_delta(t.object_type, t.object_id) AS vote_score
+                FROM unnest($1::text[], $2::uuid[])
+                    WITH ORDINALITY AS t(object_type, object_id, ord)
+                LEFT JOIN posts p
+                    ON t.object_type = 'Post' AND p.id = t.object_id
+                LEFT JOIN comments c
+                    ON t.object_type = 'Comment' AND c.id = t.object_id
+                ORDER BY t.ord
+                """,
+                target_types,
+                target_ids,
+            )
+        for object_type, object_id in targets:
+            self._invalidate_cached(object_type, object_id)
+        return VoteBatchResponse(items=[VoteResponse(**dict(r)) for r in rows])
+
 
 class VoteServiceWithDepInjections(VoteService):
     """Subclass of the service layer that includes FastAPI dependency injections."""
 
-    def __init__(self, pool: PoolDep):
-        super().__init__(pool=pool)
+    def __init__(
+        self,
+        pool: PoolDep,
+        cache: CacheDep,
+        buffer: VoteBufferDep,
+        flights: SingleFlightDep,
+    ):
+        super().__init__(pool=pool, cache=cache, buffer=buffer, flights=flights)
 
 
 VoterServiceDep = typing.Annotated[VoteService, Depends(VoteServiceWithDepInjections)]
@@ -192,3 +327,11 @@ async def vote_on_comment(
         comment_id=comment_id,
         payload=payload,
     )
+
+
+@router.post("/votes/batch", response_model=VoteBatchResponse)
+async def vote_batch(
+    service: VoterServiceDep,
+    payload: VoteBatchRequest,
+):
+    return await service.vote_batch(payload=payload)
@@ -0,0 +1,43 @@
+"""Production entry point: `python -m app.serve [uvicorn options]`.
+
+Runs `app.main:get_app` under uvicorn with `web_workers` worker processes, so one
+container can use several cores. Each worker sizes its pools from its share of
+`db_connection_budget` (see `app.db.worker_pool_max_size`), so scaling the worker
+count needs no retuning of the pool size.
+
+On SIGTERM the workers stop accepting connections, give in-flight requests up to
+`shutdown_grace_seconds` to finish, then run the app's `lifespan` shutdown, which
+closes the event streams and the pools. Live event streams never finish on their
+own, so they are cut at the deadline; their clients reconnect elsewhere.
+
+Other uvicorn options can be given on the command line or as `UVICORN_*`
+environment variables (e.g. `UVICORN_HOST`, `UVICORN_PORT`).
+"""
+
+from __future__ import annotations
+
+import sys
+
+import uvicorn
+
+from app.config import get_settings
+
+
+def main() -> None:
+    settings = get_settings()
+    uvicorn.main.main(
+        args=[
+            "app.main:get_app",
+            "--factory",
+            "--workers",
+            str(settings.web_workers),
+            "--timeout-graceful-shutdown",
+            str(settings.shutdown_grace_seconds),
+            *sys.argv[1:],
+        ],
+        prog_name="python -m app.serve",
+    )
+
+
+if __name__ == "__main__":
+    main()
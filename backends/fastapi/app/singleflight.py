@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TYPE_CHECKING, Annotated, TypeVar
+
+from fastapi import Depends
+
+from app.cache import POST_KEY, POST_PAGE_KEY
+from app.config import get_settings
+from app.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from app.metrics import Metrics
+
+T = TypeVar("T")
+
+# Key namespaces for reads that ResponseCache does not cover (it uses POST_KEY and
+# POST_PAGE_KEY for the Post reads); every flight key is a tuple starting with one.
+POST_BATCH_KEY = "post_batch"
+COMMENT_KEY = "comment"
+COMMENT_TREE_KEY = "comment_tree"
+REPLIES_KEY = "replies"
+COMMENT_BATCH_KEY = "comment_batch"
+
+
+class SingleFlight:
+    """Coalesces identical concurrent reads into one in-flight call.
+
+    The first caller of `do` for a key (the leader) starts `fn`; every caller with
+    the same key that arrives before it finishes (a follower) awaits that same call
+    and gets the same result, or the same exception, without acquiring a connection
+    of its own. So a burst of identical reads holds one pool connection, not one per
+    request. Nothing is kept once the call finishes: this is not a cache.
+    But a follower does get the result of a read that began before its own request,
+    so it may miss a write that committed in between by another client. Write
+    handlers `forget` the reads they affect, so that a client reading after its own
+    write starts a new call rather than joining one begun before it.
+
+    `fn` runs in its own task, so a leader whose client disconnects does not cancel
+    the call for its followers.
+
+    Keys must identify everything the result depends on, including the pool read
+    from, so that a client reading its own writes from the primary never joins a
+    call made on a replica. When `enabled` is False, every call runs on its own.
+    """
+
+    def __init__(self, enabled: bool = True, metrics: Metrics | None = None) -> None:
+        self.enabled = enabled
+        self.metrics = metrics
+        self._calls: dict[tuple, asyncio.Task] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: tuple, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await fn()
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+            if self.metrics is not None:
+                self.metrics.singleflight_leaders.inc(key[0])
+        else:
+            self.collapsed += 1
+            if self.metrics is not None:
+                self.metrics.singleflight_collapsed.inc(key[0])
+        return await asyncio.shield(task)
+
+    def forget(self, namespace: str, *parts: Hashable) -> None:
+        """Detaches in-flight calls whose key starts with `namespace` and `parts`.
+
+        Later callers start a new call; callers already waiting get the old one.
+        """
+        prefix = (namespace, *parts)
+        for key in [k for k in self._calls if k[: len(prefix)] == prefix]:
+            del self._calls[key]
+
+    def forget_post(self, post_id: UUID | None = None) -> None:
+        """Forgets reads of a single Post (if given) and of every Post list or batch."""
+        if post_id is not None:
+            self.forget(POST_KEY, post_id)
+        self.forget(POST_PAGE_KEY)
+        self.forget(POST_BATCH_KEY)
+
+    def forget_comments(self, post_id: UUID | None = None) -> None:
+        """Forgets reads of a Post's Comments (of every Post's, if not given)."""
+        parts = () if post_id is None else (post_id,)
+        for namespace in (COMMENT_KEY, COMMENT_TREE_KEY, REPLIES_KEY):
+            self.forget(namespace, *parts)
+        self.forget(COMMENT_BATCH_KEY)
+
+    def _finish(self, key: tuple, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Every awaiter may have been cancelled; don't warn about an unread error
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+_flights: SingleFlight | None = None
+
+
+def init_singleflight() -> None:
+    global _flights  # noqa: PLW0603
+
+    _flights = SingleFlight(
+        enabled=get_settings().singleflight_enabled, metrics=get_metrics()
+    )
+
+
+def get_singleflight() -> SingleFlight:
+    if _flights is None:
+        raise RuntimeError("Single-flight not initialized")
+    return _flights
+
+
+SingleFlightDep = Annotated[SingleFlight, Depends(get_singleflight)]
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING, Annotated
+from uuid import UUID
+
+import asyncpg
+from fastapi import Depends
+
+from app.cache import get_cache
+from app.config import Settings, get_settings
+from app.db import get_pool
+from app.singleflight import get_singleflight
+
+if TYPE_CHECKING:
+    from app.cache import ResponseCache
+    from app.db import PoolLike
+    from app.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# (object_id, object_type, voter)
+VoteKey = tuple[UUID, str, str]
+
+# Errors a flush can fail with and be retried after, as opposed to bugs
+FLUSH_ERRORS = (OSError, TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+
+class VoteBuffer:
+    """Write-behind buffer for single votes (`votes_write_behind` in Settings).
+
+    A vote is acknowledged once it is in the buffer, keyed by (object_id,
+    object_type, voter): a later vote by the same voter on the same object replaces
+    one not yet flushed, as if both had been written in order. The buffer is flushed
+    every `votes_flush_interval_seconds`, or as soon as it holds
+    `votes_flush_max_entries` votes, by one statement that upserts and deletes all of
+    them; the vote triggers then update each object's score once, by the net change.
+    So a burst of votes on one Post costs a row update per flush, instead of one
+    per vote, each queued behind the last for the row lock.
+
+    Durability trade-offs, compared to writing each vote in its own transaction:
+    - Votes are acknowledged before they are written. If the process dies without
+      shutting down (crash, SIGKILL, OOM kill), the votes still in its buffer, up to
+      one flush interval's worth, are lost. Shutdown (SIGTERM) flushes the buffer.
+    - The `vote_score` returned for a vote is the score last written, without the
+      votes still buffered (this one included). Reads catch up after the next flush.
+    - A failed flush (e.g. the database is unreachable) keeps its votes for the next
+      one, behind newer votes for the same keys. Votes are absolute values, not
+      increments, so writing one twice is harmless.
+    - At `votes_buffer_max_entries` the buffer is full, and new voters wait for a
+      flush to make room, or get its error if it fails.
+    - Votes on an object deleted before the flush are dropped.
+    - Each worker process has its own buffer, so the flushes of several workers
+      still take turns on a hot object's row, once per flush each.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        pool: PoolLike,
+        cache: ResponseCache | None = None,
+        flights: SingleFlight | None = None,
+    ) -> None:
+        self.settings = settings
+        self.enabled = settings.votes_write_behind
+        self.pool = pool
+        self.cache = cache
+        self.flights = flights
+        self._pending: dict[VoteKey, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(
+        self, object_id: UUID, object_type: str, voter: str, value: int
+    ) -> None:
+        """Buffers a vote (0 retracts); raises if it had to flush and that failed."""
+        key = (object_id, object_type, voter)
+        while (
+            key not in self._pending
+            and len(self._pending) >= self.settings.votes_buffer_max_entries
+        ):
+            await self.flush()
+        self._pending[key] = value
+        if len(self._pending) >= self.settings.votes_flush_max_entries:
+            self._full.set()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(self.settings.votes_flush_interval_seconds):
+                    await self._full.wait()
+            self._full.clear()
+            # Nothing may end this task: votes would pile up unflushed until shutdown
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush %d buffered votes", len(self))
+
+    async def flush(self) -> None:
+        """Writes every buffered vote, one flush at a time."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await self._write(batch)
+            except BaseException:
+                self.flush_errors += 1
+                self._pending = {**batch, **self._pending}
+                raise
+        self.flushed += len(batch)
+        post_ids = {i for i, t, _ in batch if t == "Post"}
+        if self.cache is not None:
+            for object_id in post_ids:
+                self.cache.invalidate_post(object_id)
+        if self.flights is not None:
+            for object_id in post_ids:
+                self.flights.forget_post(object_id)
+            # Buffered votes don't know their Comment's Post
+            if any(t == "Comment" for _, t, _ in batch):
+                self.flights.forget_comments()
+
+    async def _write(self, batch: dict[VoteKey, int]) -> None:
+        # In one order, like vote batches, so that concurrent flushes lock alike
+        entries = sorted(batch.items(), key=lambda e: (e[0][1], e[0][0], e[0][2]))
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                WITH batch AS (
+                    SELECT t.*
+                    FROM unnest($1::text[], $2::uuid[], $3::text[], $4::smallint[])
+                        AS t(object_type, object_id, voter, vote_value)
+                    -- Objects deleted since their votes were buffered
+                    WHERE CASE t.object_type
+                        WHEN 'Post' THEN EXISTS (
+                            SELECT 1 FROM posts p WHERE p.id = t.object_id
+                        )
+                        WHEN 'Comment' THEN EXISTS (
+                            SELECT 1 FROM comments c WHERE c.id = t.object_id
+                        )
+                        ELSE FALSE
+                    END
+                ),
+                removed AS (
+                    DELETE FROM votes v
+                    USING batch b
+                    WHERE b.vote_value = 0
+                    AND v.object_id = b.object_id
+                    AND v.object_type = b.object_type
+                    AND v.voter = b.voter
+                )
+                INSERT INTO votes
+                (voter, object_id, object_type, vote_value)
+                SELECT voter, object_id, object_type, vote_value
+                FROM batch
+                WHERE vote_value <> 0
+                ORDER BY object_type, object_id, voter
+                ON CONFLICT (object_id, object_type, voter)
+                DO UPDATE SET vote_value = EXCLUDED.vote_value
+                WHERE votes.vote_value <> EXCLUDED.vote_value
+                """,
+                [object_type for (_, object_type, _), _ in entries],
+                [object_id for (object_id, _, _), _ in entries],
+                [voter for (_, _, voter), _ in entries],
+                [value for _, value in entries],
+            )
+
+    async def close(self) -> None:
+        """Stops the periodic flush, then flushes whatever is left."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        try:
+            await self.flush()
+        except FLUSH_ERRORS:
+            logger.exception("Lost %d buffered votes at shutdown", len(self))
+
+
+_buffer: VoteBuffer | None = None
+
+
+def init_vote_buffer() -> None:
+    global _buffer  # noqa: PLW0603
+
+    _buffer = VoteBuffer(get_settings(), get_pool(), get_cache(), get_singleflight())
+
+
+async def close_vote_buffer() -> None:
+    if _buffer:
+        await _buffer.close()
+
+
+def get_vote_buffer() -> VoteBuffer:
+    if _buffer is None:
+        raise RuntimeError("Vote buffer not initialized")
+    return _buffer
+
+
+VoteBufferDep = Annotated[VoteBuffer, Depends(get_vote_buffer)]
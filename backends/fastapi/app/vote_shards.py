@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING
+
+from app.config import Settings, get_settings
+from app.db import get_pool
+from app.vote_buffer import FLUSH_ERRORS
+
+if TYPE_CHECKING:
+    from app.db import PoolLike
+
+logger = logging.getLogger(__name__)
+
+
+class VoteShardFolder:
+    """Folds sharded vote counters into `vote_score` (`votes_score_shards` > 1).
+
+    With sharding on, the primary pool's sessions add each score change to one of
+    `votes_score_shards` counter rows of the object, instead of to its row (see
+    "Sharded counters" in database_schema/SPEC.md), so that concurrent votes on one
+    popular Post no longer queue up for its row lock. Single-object reads add the
+    pending counters, but lists ordered by score only see `vote_score`, so this
+    folds them in every `votes_fold_interval_seconds`: one row update per object
+    per fold, however many votes it got in between.
+
+    Every worker process runs its own folder; concurrent folds skip each other's
+    counter rows, so they share the work rather than wait for each other.
+    """
+
+    def __init__(self, settings: Settings, pool: PoolLike) -> None:
+        self.settings = settings
+        self.enabled = settings.votes_score_shards > 1
+        self.pool = pool
+        self._folder: asyncio.Task | None = None
+        self.folded = 0
+
+    def start(self) -> None:
+        if self.enabled and self._folder is None:
+            self._folder = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.votes_fold_interval_seconds)
+            try:
+                await self.fold()
+            except FLUSH_ERRORS:
+                logger.exception("Failed to fold vote counters")
+
+    async def fold(self) -> int:
+        """Folds every pending counter, a batch at a time; returns how many."""
+        batch_size = self.settings.votes_fold_batch_size
+        total = 0
+        async with self.pool.acquire() as conn:
+            while True:
+                folded = await conn.fetchval(
+                    "SELECT fold_vote_score_shards($1)", batch_size
+                )
+                total += folded
+                if folded < batch_size:
+                    break
+        self.folded += total
+        return total
+
+    async def close(self) -> None:
+        """Stops the periodic fold, then folds whatever is pending."""
+        if self._folder is None:
+            return
+        self._folder.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._folder
+        self._folder = None
+        try:
+            await self.fold()
+        except FLUSH_ERRORS:
+            logger.exception("Failed to fold vote counters at shutdown")
+
+
+_folder: VoteShardFolder | None = None
+
+
+def init_vote_shard_folder() -> None:
+    global _folder  # noqa: PLW0603
+
+    _folder = VoteShardFolder(get_settings(), get_pool())
+    _folder.start()
+
+
+async def close_vote_shard_folder() -> None:
+    if _folder:
+        await _folder.close()
@@ -0,0 +1,217 @@
+"""Prepares a THROWAWAY database for the load benchmarks.
+
+Applies the shared schema and migrations, wipes any existing rows, and seeds a
+fixed-shape dataset, so results from different runs (and commits) are comparable:
+
+- `FEED_POSTS` posts, each with a couple of top comments and replies
+- one "deep" post whose thread is `DEEP_THREAD_DEPTH` levels deep
+- one "hot" post that takes every vote in the vote storm workload
+- one "burst" post that takes every comment in the comment burst workload
+
+Ids are uuidv7 and differ between runs; everything else is fixed.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+from dataclasses import dataclass, field
+from uuid import UUID
+
+import asyncpg
+
+SCHEMA_DIR = pathlib.Path(__file__).parents[3] / "database_schema"
+
+# Fixed so seeded timestamps (and therefore page contents) never depend on the clock
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+
+FEED_POSTS = 2_000
+COMMENTS_PER_FEED_POST = 3
+REPLIES_PER_FEED_COMMENT = 2
+DEEP_THREAD_TOP_COMMENTS = 10
+DEEP_THREAD_BRANCHING = 2
+DEEP_THREAD_DEPTH = 8
+HOT_POST_COMMENTS = 50
+HOT_POST_VOTERS = 1_000
+
+
+@dataclass
+class Dataset:
+    """Ids of the seeded rows that the workloads target."""
+
+    deep_post_id: UUID
+    deep_comment_ids: list[UUID]
+    hot_post_id: UUID
+    hot_comment_ids: list[UUID]
+    burst_post_id: UUID
+    burst_comment_ids: list[UUID] = field(default_factory=list)
+
+
+def split_sql_statements(sql: str) -> list[str]:
+    """Splits a SQL script into statements on `;` line endings, outside `$$` bodies.
+
+    Needed for migrations, whose CREATE INDEX CONCURRENTLY statements cannot run
+    in the implicit transaction of a multi-statement query.
+    """
+    statements = []
+    current: list[str] = []
+    in_body = False
+    for line in sql.splitlines():
+        if line.strip().startswith("--") and not in_body:
+            continue
+        current.append(line)
+        if line.count("$$") % 2:
+            in_body = not in_body
+        if not in_body and line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip())
+            current = []
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+async def apply_schema(conn: asyncpg.Connection) -> None:
+    """Applies `schema.sql`, then every migration (each is idempotent)."""
+    await conn.execute((SCHEMA_DIR / "schema.sql").read_text())
+    await apply_migrations(conn)
+
+
+async def apply_migrations(conn: asyncpg.Connection) -> None:
+    for migration in sorted((SCHEMA_DIR / "migrations").glob("*.sql")):
+        for statement in split_sql_statements(migration.read_text()):
+            await conn.execute(statement)
+        await conn.execute(
+            """
+            INSERT INTO schema_migrations (version) VALUES ($1)
+            ON CONFLICT DO NOTHING
+            """,
+            migration.stem,
+        )
+
+
+async def _insert_post(conn: asyncpg.Connection, title: str, offset: int) -> UUID:
+    return await conn.fetchval(
+        """
+        INSERT INTO posts (title, body, author, created_at)
+        VALUES ($1, 'Benchmark post', 'bench', $2)
+        RETURNING id
+        """,
+        title,
+        EPOCH + datetime.timedelta(minutes=offset),
+    )
+
+
+async def _insert_thread(
+    conn: asyncpg.Connection,
+    post_id: UUID,
+    top_comments: int,
+    branching: int,
+    depth: int,
+) -> list[UUID]:
+    """Seeds a full tree under `post_id`, level by level."""
+    await conn.execute(
+        """
+        INSERT INTO comments (post_id, author, body, created_at)
+        SELECT $1, 'commenter_' || n, 'Top comment ' || n,
+            $3::timestamptz + n * INTERVAL '1 second'
+        FROM generate_series(1, $2) AS n
+        """,
+        post_id,
+        top_comments,
+        EPOCH,
+    )
+    for level in range(depth):
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, parent_comment_id, author, body, created_at)
+            SELECT c.post_id, c.id, 'replier_' || n, 'Reply ' || n,
+                c.created_at + n * INTERVAL '1 second'
+            FROM comments c, generate_series(1, $3) AS n
+            WHERE c.post_id = $1 AND c.depth = $2
+            """,
+            post_id,
+            level,
+            branching,
+        )
+    rows = await conn.fetch(
+        "SELECT id FROM comments WHERE post_id = $1 ORDER BY path", post_id
+    )
+    return [r["id"] for r in rows]
+
+
+async def seed(conn: asyncpg.Connection) -> Dataset:
+    """Replaces every row in the database with the benchmark dataset."""
+    async with conn.transaction():
+        await conn.execute("TRUNCATE vote_score_shards, votes, comments, posts")
+        await conn.execute(
+            """
+            INSERT INTO posts (title, body, author, created_at)
+            SELECT
+                'Post ' || n,
+                'Body of post ' || n,
+                'author_' || (n % 500),
+                $2::timestamptz + n * INTERVAL '1 minute'
+            FROM generate_series(1, $1) AS n
+            """,
+            FEED_POSTS,
+            EPOCH,
+        )
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, author, body, created_at)
+            SELECT p.id, 'commenter_' || n, 'Top comment ' || n,
+                p.created_at + n * INTERVAL '1 second'
+            FROM posts p, generate_series(1, $1) AS n
+            """,
+            COMMENTS_PER_FEED_POST,
+        )
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, parent_comment_id, author, body, created_at)
+            SELECT c.post_id, c.id, 'replier_' || n, 'Reply ' || n,
+                c.created_at + n * INTERVAL '1 second'
+            FROM comments c, generate_series(1, $1) AS n
+            WHERE c.depth = 0
+            """,
+            REPLIES_PER_FEED_COMMENT,
+        )
+        deep_post_id = await _insert_post(conn, "Deep thread", -3)
+        deep_comment_ids = await _insert_thread(
+            conn,
+            deep_post_id,
+            DEEP_THREAD_TOP_COMMENTS,
+            DEEP_THREAD_BRANCHING,
+            DEEP_THREAD_DEPTH,
+        )
+        hot_post_id = await _insert_post(conn, "Hot post", -2)
+        hot_comment_ids = await _insert_thread(
+            conn, hot_post_id, HOT_POST_COMMENTS, 0, 0
+        )
+        await conn.execute(
+            """
+            INSERT INTO votes (voter, object_id, object_type, vote_value)
+            SELECT 'voter_' || n, $1, 'Post', 1
+            FROM generate_series(1, $2) AS n
+            """,
+            hot_post_id,
+            HOT_POST_VOTERS,
+        )
+        burst_post_id = await _insert_post(conn, "Comment burst", -1)
+    await conn.execute("ANALYZE posts, comments, votes")
+
+    return Dataset(
+        deep_post_id=deep_post_id,
+        deep_comment_ids=deep_comment_ids,
+        hot_post_id=hot_post_id,
+        hot_comment_ids=hot_comment_ids,
+        burst_post_id=burst_post_id,
+    )
+
+
+async def prepare(database_url: str) -> Dataset:
+    conn = await asyncpg.connect(database_url)
+    try:
+        await apply_schema(conn)
+        return await seed(conn)
+    finally:
+        await conn.close()
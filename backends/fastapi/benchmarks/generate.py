@@ -0,0 +1,453 @@
+"""Bulk synthetic dataset generator for scale testing.
+
+Loads posts, comment trees and votes into a THROWAWAY database with binary `COPY`,
+from several processes at once. Every shape is drawn from a heavy-tailed (Pareto)
+distribution, so most posts are quiet while a few have huge threads and vote counts:
+
+- top comments per post
+- replies per comment, thinning out with depth (`--fanout-decay`), up to `--max-depth`
+- votes per post and per comment, from distinct users, `--upvote-ratio` of them +1
+
+By default the load bypasses the triggers on `posts`, `comments` and `votes`
+(`ALTER TABLE ... DISABLE TRIGGER USER`; foreign keys are still checked). The
+generator then does their work itself: it computes each comment's `depth` and `path`,
+writes each author's auto-upvote, and recomputes every score in bulk with
+`reconcile_vote_scores()` after the load (and every post's comment count with
+`reconcile_comment_counts`, once the indexes exist). Pass `--with-triggers` to load
+through the triggers instead, row by row, the way the API writes data.
+
+Secondary indexes (the tracked migrations) are created after the load, which is much
+faster than maintaining them row by row on a fresh database.
+
+The output is deterministic for a given `--seed` and set of parameters. The defaults
+load about 10M rows in total (`--dry-run` prints exact counts without a database):
+
+    uv run python -m benchmarks.generate --database-url postgresql://...
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from random import Random
+from uuid import UUID
+
+import asyncpg
+
+from benchmarks.dataset import SCHEMA_DIR, apply_migrations
+
+# Newest post timestamp; fixed so that the output never depends on the clock
+END = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+UNIX_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+
+TRIGGER_TABLES = ("posts", "comments", "votes")
+POST_COLUMNS = ("id", "title", "body", "author", "created_at", "updated_at")
+COMMENT_COLUMNS = (
+    "id",
+    "post_id",
+    "parent_comment_id",
+    "author",
+    "body",
+    "created_at",
+    "updated_at",
+)
+VOTE_COLUMNS = ("voter", "object_id", "object_type", "vote_value")
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis "
+    "nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+    "Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu "
+    "fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident, sunt in "
+    "culpa qui officia deserunt mollit anim id est laborum. "
+) * 4
+
+
+@dataclass(frozen=True)
+class Shape:
+    """Parameters of the generated dataset (see `--help` for each one)."""
+
+    posts: int
+    users: int
+    days: int
+    top_comments_scale: float
+    top_comments_alpha: float
+    fanout_scale: float
+    fanout_alpha: float
+    fanout_decay: float
+    max_depth: int
+    max_comments_per_post: int
+    votes_scale: float
+    votes_alpha: float
+    max_votes: int
+    upvote_ratio: float
+    seed: int
+    with_triggers: bool
+
+
+@dataclass
+class Chunk:
+    """Rows for one batch of posts; comments are grouped by depth, parents first."""
+
+    posts: list[tuple]
+    comment_levels: list[list[tuple]]
+    votes: list[tuple]
+
+    def counts(self) -> dict[str, int]:
+        return {
+            "posts": len(self.posts),
+            "comments": sum(map(len, self.comment_levels)),
+            "votes": len(self.votes),
+        }
+
+
+def _heavy_tail(rng: Random, scale: float, alpha: float, cap: int) -> int:
+    """A Pareto draw shifted to start at 0, with mean `scale / (alpha - 1)`."""
+    return min(cap, int(scale * (rng.paretovariate(alpha) - 1)))
+
+
+def _uuid7(rng: Random, micros: int) -> UUID:
+    """A version 7 UUID for the given time, with its random bits drawn from `rng`."""
+    return UUID(
+        int=(micros // 1000) << 80
+        | 0x7 << 76
+        | rng.getrandbits(12) << 64
+        | 0b10 << 62
+        | rng.getrandbits(62)
+    )
+
+
+def _path_segment(micros: int, item_id: UUID) -> bytes:
+    """Same bytes as `comment_path_segment()` in schema.sql."""
+    return struct.pack(">q16s", micros, item_id.bytes)
+
+
+class ChunkGenerator:
+    """Generates the rows of one chunk of posts, deterministically from its index."""
+
+    def __init__(self, shape: Shape, chunk_index: int, first_post: int, posts: int):
+        self.shape = shape
+        self.rng = Random(f"{shape.seed}-{chunk_index}")  # noqa: S311
+        self.first_post = first_post
+        self.post_count = posts
+        self.start_micros = int(
+            (END - datetime.timedelta(days=shape.days) - UNIX_EPOCH).total_seconds()
+            * 1_000_000
+        )
+        self.step_micros = shape.days * 86_400_000_000 // max(1, shape.posts)
+
+    def _user(self) -> str:
+        # Activity is heavy-tailed too: low user numbers write most of the content
+        return f"user_{_heavy_tail(self.rng, 50, 1.2, self.shape.users - 1)}"
+
+    def _body(self) -> str:
+        return LOREM[: self.rng.randint(20, 600)]
+
+    def _votes(self, object_type: str, object_id: UUID, author: str) -> list[tuple]:
+        shape = self.shape
+        count = _heavy_tail(
+            self.rng, shape.votes_scale, shape.votes_alpha, shape.max_votes
+        )
+        voters = {
+            f"user_{n}"
+            for n in self.rng.sample(range(shape.users), min(count, shape.users))
+        }
+        voters.discard(author)
+        votes = [
+            (
+                voter,
+                object_id,
+                object_type,
+                1 if self.rng.random() < shape.upvote_ratio else -1,
+            )
+            for voter in sorted(voters)
+        ]
+        if not shape.with_triggers:
+            # Stands in for trg_auto_upvote_post / trg_auto_upvote_comment
+            votes.append((author, object_id, object_type, 1))
+        return votes
+
+    def generate(self) -> Chunk:
+        shape = self.shape
+        rng = self.rng
+        chunk = Chunk(
+            posts=[], comment_levels=[[] for _ in range(shape.max_depth + 1)], votes=[]
+        )
+        for n in range(self.first_post, self.first_post + self.post_count):
+            micros = (
+                self.start_micros
+                + n * self.step_micros
+                + rng.randrange(self.step_micros)
+            )
+            post_id = _uuid7(rng, micros)
+            created_at = UNIX_EPOCH + datetime.timedelta(microseconds=micros)
+            author = self._user()
+            chunk.posts.append(
+                (post_id, f"Post {n}", self._body(), author, created_at, created_at)
+            )
+            chunk.votes.extend(self._votes("Post", post_id, author))
+
+            budget = shape.max_comments_per_post
+            # (parent id, parent path, parent micros) of the previous level
+            parents = [(None, b"", micros)]
+            for depth in range(shape.max_depth + 1):
+                children = []
+                scale = (
+                    shape.top_comments_scale
+                    if depth == 0
+                    else (shape.fanout_scale * shape.fanout_decay ** (depth - 1))
+                )
+                alpha = shape.top_comments_alpha if depth == 0 else shape.fanout_alpha
+                for parent_id, parent_path, parent_micros in parents:
+                    replies = _heavy_tail(rng, scale, alpha, budget)
+                    budget -= replies
+                    for _ in range(replies):
+                        comment_micros = parent_micros + rng.randrange(
+                            1, 86_400_000_000
+                        )
+                        comment_id = _uuid7(rng, comment_micros)
+                        path = parent_path + _path_segment(comment_micros, comment_id)
+                        created = UNIX_EPOCH + datetime.timedelta(
+                            microseconds=comment_micros
+                        )
+                        comment_author = self._user()
+                        row = (
+                            comment_id,
+                            post_id,
+                            parent_id,
+                            comment_author,
+                            self._body(),
+                            created,
+                            created,
+                        )
+                        if not shape.with_triggers:
+                            # Stands in for trg_set_comment_path
+                            row += (depth, path)
+                        chunk.comment_levels[depth].append(row)
+                        chunk.votes.extend(
+                            self._votes("Comment", comment_id, comment_author)
+                        )
+                        children.append((comment_id, path, comment_micros))
+                parents = children
+                if not parents or budget <= 0:
+                    break
+        return chunk
+
+
+async def _copy_chunk(database_url: str, chunk: Chunk, with_triggers: bool) -> None:
+    comment_columns = (
+        COMMENT_COLUMNS if with_triggers else (*COMMENT_COLUMNS, "depth", "path")
+    )
+    conn = await asyncpg.connect(database_url)
+    try:
+        async with conn.transaction():
+            await conn.copy_records_to_table(
+                "posts", records=chunk.posts, columns=POST_COLUMNS
+            )
+            # One COPY per level, so that every parent exists before its replies
+            for level in chunk.comment_levels:
+                if level:
+                    await conn.copy_records_to_table(
+                        "comments", records=level, columns=comment_columns
+                    )
+            await conn.copy_records_to_table(
+                "votes", records=chunk.votes, columns=VOTE_COLUMNS
+            )
+    finally:
+        await conn.close()
+
+
+def load_chunk(
+    database_url: str | None,
+    shape: Shape,
+    chunk_index: int,
+    first_post: int,
+    posts: int,
+) -> dict[str, int]:
+    """Generates one chunk and COPYs it in (skipped without a `database_url`).
+
+    Runs in a worker process, so that generating rows is spread across CPUs.
+    """
+    chunk = ChunkGenerator(shape, chunk_index, first_post, posts).generate()
+    if database_url:
+        asyncio.run(_copy_chunk(database_url, chunk, shape.with_triggers))
+    return chunk.counts()
+
+
+async def _set_triggers(database_url: str, enabled: bool) -> None:
+    conn = await asyncpg.connect(database_url)
+    try:
+        for table in TRIGGER_TABLES:
+            action = "ENABLE" if enabled else "DISABLE"
+            await conn.execute(f"ALTER TABLE {table} {action} TRIGGER USER")
+    finally:
+        await conn.close()
+
+
+async def _before_load(database_url: str, append: bool) -> None:
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute((SCHEMA_DIR / "schema.sql").read_text())
+        if not append:
+            await conn.execute("TRUNCATE vote_score_shards, votes, comments, posts")
+    finally:
+        await conn.close()
+
+
+async def _after_load(database_url: str, reconcile: bool) -> None:
+    conn = await asyncpg.connect(database_url)
+    try:
+        if reconcile:
+            started = time.perf_counter()
+            fixed = await conn.fetchval("SELECT reconcile_vote_scores()")
+            _log(f"reconciled {fixed} scores in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        await apply_migrations(conn)
+        await conn.execute("ANALYZE posts, comments, votes")
+        _log(f"indexed and analyzed in {time.perf_counter() - started:.1f}s")
+        if reconcile:
+            # After indexing, so that each batch counts comments through an index
+            started = time.perf_counter()
+            fixed = await conn.fetchval("CALL reconcile_comment_counts(5000)")
+            _log(
+                f"reconciled {fixed} comment counts"
+                f" in {time.perf_counter() - started:.1f}s"
+            )
+    finally:
+        await conn.close()
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def generate(
+    database_url: str | None, shape: Shape, chunk_posts: int, jobs: int, append: bool
+) -> dict[str, int]:
+    if database_url:
+        asyncio.run(_before_load(database_url, append))
+        if not shape.with_triggers:
+            asyncio.run(_set_triggers(database_url, enabled=False))
+
+    totals = {"posts": 0, "comments": 0, "votes": 0}
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    load_chunk,
+                    database_url,
+                    shape,
+                    index,
+                    first_post,
+                    min(chunk_posts, shape.posts - first_post),
+                )
+                for index, first_post in enumerate(range(0, shape.posts, chunk_posts))
+            ]
+            for done, future in enumerate(futures, start=1):
+                for table, count in future.result().items():
+                    totals[table] += count
+                if done % max(1, len(futures) // 20) == 0 or done == len(futures):
+                    _log(
+                        f"{done}/{len(futures)} chunks, {sum(totals.values())} rows,"
+                        f" {time.perf_counter() - started:.1f}s"
+                    )
+    finally:
+        if database_url and not shape.with_triggers:
+            asyncio.run(_set_triggers(database_url, enabled=True))
+
+    if database_url:
+        asyncio.run(_after_load(database_url, reconcile=not shape.with_triggers))
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--database-url",
+        default=os.environ.get("BENCH_DATABASE_URL"),
+        help="THROWAWAY database; existing rows are deleted unless --append",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="generate rows and count them only"
+    )
+    parser.add_argument("--append", action="store_true", help="keep existing rows")
+    parser.add_argument(
+        "--with-triggers",
+        action="store_true",
+        help="load through the triggers instead of bypassing them",
+    )
+    parser.add_argument("--posts", type=int, default=85_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365, help="time span of posts")
+    parser.add_argument("--top-comments-scale", type=float, default=4.0)
+    parser.add_argument("--top-comments-alpha", type=float, default=1.5)
+    parser.add_argument("--fanout-scale", type=float, default=1.2)
+    parser.add_argument("--fanout-alpha", type=float, default=2.0)
+    parser.add_argument(
+        "--fanout-decay",
+        type=float,
+        default=0.8,
+        help="reply fan-out is multiplied by this at each level",
+    )
+    parser.add_argument("--max-depth", type=int, default=30)
+    parser.add_argument("--max-comments-per-post", type=int, default=20_000)
+    parser.add_argument("--votes-scale", type=float, default=2.0)
+    parser.add_argument("--votes-alpha", type=float, default=1.5)
+    parser.add_argument("--max-votes", type=int, default=50_000)
+    parser.add_argument("--upvote-ratio", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-posts", type=int, default=500, help="posts per COPY")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not args.database_url and not args.dry_run:
+        parser.error("--database-url or BENCH_DATABASE_URL is required")
+
+    shape = Shape(
+        posts=args.posts,
+        users=args.users,
+        days=args.days,
+        top_comments_scale=args.top_comments_scale,
+        top_comments_alpha=args.top_comments_alpha,
+        fanout_scale=args.fanout_scale,
+        fanout_alpha=args.fanout_alpha,
+        fanout_decay=args.fanout_decay,
+        max_depth=args.max_depth,
+        max_comments_per_post=args.max_comments_per_post,
+        votes_scale=args.votes_scale,
+        votes_alpha=args.votes_alpha,
+        max_votes=args.max_votes,
+        upvote_ratio=args.upvote_ratio,
+        seed=args.seed,
+        with_triggers=args.with_triggers,
+    )
+    started = time.perf_counter()
+    totals = generate(
+        None if args.dry_run else args.database_url,
+        shape,
+        args.chunk_posts,
+        args.jobs,
+        args.append,
+    )
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    print(
+        f"{totals['posts']} posts, {totals['comments']} comments,"
+        f" {totals['votes']} votes: {rows} rows in {elapsed:.1f}s"
+        f" ({rows / elapsed:.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
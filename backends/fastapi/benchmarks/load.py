@@ -0,0 +1,567 @@
+"""HTTP load benchmark for every route of the API.
+
+Seeds a THROWAWAY Postgres database (see `benchmarks.dataset`; all rows in it are
+replaced), starts the app against it with `python -m app.serve`, then runs each
+workload for a fixed time with a fixed number of concurrent clients:
+
+- `feed`: read-heavy browsing. Pages through `/posts`, opens posts and their comments.
+- `thread`: deep thread reading. Full trees, reply subtrees and single comments.
+- `vote_storm`: many voters on one hot post and its comments, plus vote batches.
+- `comment_burst`: many new comments and replies on one post.
+- `crud`: the remaining write routes (create, update, delete) and health checks.
+
+Throughput and latency percentiles are reported per route and written as JSON with
+sorted keys, so results from two commits can be diffed or compared:
+
+    uv run python -m benchmarks.load run --database-url postgresql://... -o new.json
+    uv run python -m benchmarks.load compare old.json new.json
+
+`scaling` runs the workloads once per server worker count, from 1 to `--max-workers`
+(default: every core), within one `--connection-budget`, and reports the speedup:
+
+    uv run python -m benchmarks.load scaling --database-url postgresql://... \\
+        --connection-budget 90 -o scaling.json
+
+`shards` runs the `vote_storm` workload (or those given) with 1, 2, 4, ... up to
+`--max-shards` vote counter rows per object (`VOTES_SCORE_SHARDS`), and reports
+how throughput scales as votes on the hot post stop queueing for its row lock:
+
+    uv run python -m benchmarks.load shards --database-url postgresql://... \\
+        --max-shards 32 --concurrency 64 -o shards.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import pathlib
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from benchmarks.dataset import Dataset, prepare
+
+APP_DIR = pathlib.Path(__file__).parents[1]
+STARTUP_TIMEOUT_SECONDS = 30.0
+
+
+class Recorder:
+    """Collects request latencies per route while `recording` is set."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.recording = False
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(
+        self, method: str, route: str, url: str, expect: int = 200, **kwargs
+    ) -> httpx.Response | None:
+        """Sends one request; `route` is the path template it is reported under."""
+        key = f"{method} {route}"
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies[key].append(elapsed)
+            if response is None or response.status_code != expect:
+                self.errors[key] += 1
+        if response is None or response.status_code != expect:
+            return None
+        return response
+
+
+Workload = Callable[[Recorder, Dataset, random.Random], Awaitable[None]]
+
+
+async def feed(rec: Recorder, data: Dataset, rng: random.Random) -> None:
+    cursor = None
+    for _ in range(rng.randint(1, 4)):
+        params = {"cursor": cursor} if cursor else {}
+        response = await rec.request("GET", "/posts", "/posts", params=params)
+        if response is None:
+            return
+        page = response.json()
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    if not page["items"]:
+        return
+    post_id = rng.choice(page["items"])["id"]
+    await rec.request("GET", "/posts/{post_id}", f"/posts/{post_id}")
+    await rec.request("GET", "/posts/{post_id}/comments", f"/posts/{post_id}/comments")
+
+
+async def thread(rec: Recorder, data: Dataset, rng: random.Random) -> None:
+    post_id = data.deep_post_id
+    await rec.request(
+        "GET",
+        "/posts/{post_id}/comments",
+        f"/posts/{post_id}/comments",
+        params={"max_depth": 10, "replies_per_page": 10},
+    )
+    comment_id = rng.choice(data.deep_comment_ids)
+    await rec.request(
+        "GET",
+        "/posts/{post_id}/comments/{comment_id}/replies",
+        f"/posts/{post_id}/comments/{comment_id}/replies",
+        params={"max_depth": 5},
+    )
+    await rec.request(
+        "GET",
+        "/posts/{post_id}/comments/{comment_id}",
+        f"/posts/{post_id}/comments/{comment_id}",
+    )
+
+
+async def vote_storm(rec: Recorder, data: Dataset, rng: random.Random) -> None:
+    post_id = data.hot_post_id
+    username = f"storm_{rng.randrange(10_000)}"
+    roll = rng.random()
+    if roll < 0.7:  # noqa: PLR2004
+        await rec.request(
+            "POST",
+            "/posts/{post_id}/vote",
+            f"/posts/{post_id}/vote",
+            json={"username": username, "value": rng.choice((-1, 0, 1))},
+        )
+    elif roll < 0.95:  # noqa: PLR2004
+        comment_id = rng.choice(data.hot_comment_ids)
+        await rec.request(
+            "POST",
+            "/posts/{post_id}/comments/{comment_id}/vote",
+            f"/posts/{post_id}/comments/{comment_id}/vote",
+            json={"username": username, "value": rng.choice((-1, 0, 1))},
+        )
+    else:
+        votes = [
+            {
+                "object_type": "Comment",
+                "object_id": str(comment_id),
+                "username": username,
+                "value": rng.choice((-1, 0, 1)),
+            }
+            for comment_id in rng.sample(data.hot_comment_ids, 20)
+        ]
+        await rec.request("POST", "/votes/batch", "/votes/batch", json={"votes": votes})
+
+
+async def comment_burst(rec: Recorder, data: Dataset, rng: random.Random) -> None:
+    post_id = data.burst_post_id
+    parent_id = None
+    if data.burst_comment_ids and rng.random() < 0.7:  # noqa: PLR2004
+        parent_id = str(rng.choice(data.burst_comment_ids))
+    response = await rec.request(
+        "POST",
+        "/posts/{post_id}/comments",
+        f"/posts/{post_id}/comments",
+        expect=201,
+        json={
+            "author": f"burst_{rng.randrange(1_000)}",
+            "body": "Burst comment",
+            "parent_comment_id": parent_id,
+        },
+    )
+    if response is not None:
+        data.burst_comment_ids.append(response.json()["id"])
+
+
+async def crud(rec: Recorder, data: Dataset, rng: random.Random) -> None:
+    await rec.request("GET", "/health", "/health")
+    response = await rec.request(
+        "POST",
+        "/posts",
+        "/posts",
+        expect=201,
+        json={"title": "CRUD post", "body": "Created", "author": "crud"},
+    )
+    if response is None:
+        return
+    post_id = response.json()["id"]
+    await rec.request(
+        "PATCH", "/posts/{post_id}", f"/posts/{post_id}", json={"body": "Updated"}
+    )
+    response = await rec.request(
+        "POST",
+        "/posts/{post_id}/comments",
+        f"/posts/{post_id}/comments",
+        expect=201,
+        json={"author": "crud", "body": "Created"},
+    )
+    if response is not None:
+        comment_id = response.json()["id"]
+        await rec.request(
+            "PATCH",
+            "/posts/{post_id}/comments/{comment_id}",
+            f"/posts/{post_id}/comments/{comment_id}",
+            json={"body": "Updated"},
+        )
+        await rec.request(
+            "DELETE",
+            "/posts/{post_id}/comments/{comment_id}",
+            f"/posts/{post_id}/comments/{comment_id}",
+            expect=204,
+        )
+    await rec.request("DELETE", "/posts/{post_id}", f"/posts/{post_id}", expect=204)
+    await rec.request("GET", "/health/cache", "/health/cache")
+
+
+WORKLOADS: dict[str, Workload] = {
+    "feed": feed,
+    "thread": thread,
+    "vote_storm": vote_storm,
+    "comment_burst": comment_burst,
+    "crud": crud,
+}
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(rec: Recorder, duration: float) -> dict:
+    routes = {}
+    for key, latencies in sorted(rec.latencies.items()):
+        values = sorted(latencies)
+        routes[key] = {
+            "requests": len(values),
+            "errors": rec.errors.get(key, 0),
+            "throughput_rps": round(len(values) / duration, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(_percentile(values, 50) * 1000, 3),
+            "p95_ms": round(_percentile(values, 95) * 1000, 3),
+            "p99_ms": round(_percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "duration_s": round(duration, 3),
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": round(total / duration, 2),
+        "routes": routes,
+    }
+
+
+async def run_workload(
+    base_url: str,
+    *,
+    workload: Workload,
+    data: Dataset,
+    concurrency: int,
+    warmup: float,
+    duration: float,
+    seed: int,
+) -> dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        rec = Recorder(client)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stop_at = start + warmup + duration
+
+        async def worker(worker_id: int) -> None:
+            rng = random.Random(seed * 1_000 + worker_id)  # noqa: S311
+            while loop.time() < stop_at:
+                await workload(rec, data, rng)
+
+        async def start_recording() -> None:
+            await asyncio.sleep(warmup)
+            rec.recording = True
+
+        await asyncio.gather(start_recording(), *map(worker, range(concurrency)))
+        return summarize(rec, loop.time() - start - warmup)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_app(
+    database_url: str,
+    workers: int,
+    connection_budget: int | None = None,
+    vote_score_shards: int = 1,
+):
+    """Runs `python -m app.serve` in a subprocess, yielding its base URL."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_CONNECTION_URL": database_url,
+        "WEB_WORKERS": str(workers),
+        "VOTES_SCORE_SHARDS": str(vote_score_shards),
+    }
+    if connection_budget is not None:
+        env["DB_CONNECTION_BUDGET"] = str(connection_budget)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "app.serve",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--no-access-log",
+            "--log-level",
+            "warning",
+        ],
+        cwd=APP_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("the server exited during startup")
+            with contextlib.suppress(httpx.HTTPError):
+                if httpx.get(f"{base_url}/health").status_code == 200:  # noqa: PLR2004
+                    break
+            if time.monotonic() > deadline:
+                raise RuntimeError("the server did not become healthy in time")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _git_revision() -> dict:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=APP_DIR, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain")),
+    }
+
+
+def _meta(args: argparse.Namespace) -> dict:
+    return {
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "seed": args.seed,
+        "server_workers": args.workers,
+        "connection_budget": args.connection_budget,
+        "vote_score_shards": args.vote_score_shards,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = {"meta": _meta(args), "workloads": {}}
+    for name in args.workloads:
+        # Every workload starts from the same freshly seeded data and a fresh server,
+        # so nothing (cached pages, pooled connections) carries over between them
+        data = asyncio.run(prepare(args.database_url))
+        print(f"Running {name} ...", file=sys.stderr)
+        with serve_app(
+            args.database_url,
+            args.workers,
+            args.connection_budget,
+            args.vote_score_shards,
+        ) as base_url:
+            results["workloads"][name] = asyncio.run(
+                run_workload(
+                    base_url,
+                    workload=WORKLOADS[name],
+                    data=data,
+                    concurrency=args.concurrency,
+                    warmup=args.warmup,
+                    duration=args.duration,
+                    seed=args.seed,
+                )
+            )
+    return results
+
+
+def scaling(args: argparse.Namespace) -> dict:
+    """Runs the workloads with 1 to `max_workers` server workers.
+
+    The connection budget stays the same throughout, as it would for a given
+    Postgres, so each run shows what more workers gain once it is shared out.
+    """
+    results = {"meta": {**_meta(args), "server_workers": None}, "workers": {}}
+    for workers in range(1, args.max_workers + 1):
+        print(f"--- {workers} worker(s)", file=sys.stderr)
+        args.workers = workers
+        results["workers"][str(workers)] = run(args)["workloads"]
+    return results
+
+
+def shards(args: argparse.Namespace) -> dict:
+    """Runs the workloads with 1, 2, 4, ... up to `max_shards` vote counter rows."""
+    results = {"meta": {**_meta(args), "vote_score_shards": None}, "shards": {}}
+    count = 1
+    while count <= args.max_shards:
+        print(f"--- {count} shard(s)", file=sys.stderr)
+        args.vote_score_shards = count
+        results["shards"][str(count)] = run(args)["workloads"]
+        count *= 2
+    return results
+
+
+def print_sweep(runs: dict, label: str) -> None:
+    """Prints the throughput of each run of a sweep, and its speedup over the first."""
+    print(f"{'workload':<16} {label:>7} {'req/s':>9} {'speedup':>8} {'err':>5}")
+    first = next(iter(runs.values()))
+    for name in first:
+        baseline = first[name]["throughput_rps"]
+        for value, workloads in runs.items():
+            workload = workloads[name]
+            speedup = workload["throughput_rps"] / baseline if baseline else 0.0
+            print(
+                f"{name:<16} {value:>7} {workload['throughput_rps']:>9}"
+                f" {speedup:>7.2f}x {workload['errors']:>5}"
+            )
+
+
+def print_results(results: dict) -> None:
+    header = f"{'route':<52} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+    for name, workload in results["workloads"].items():
+        print(
+            f"\n{name}: {workload['throughput_rps']} req/s, {workload['errors']} errors"
+        )
+        print(header)
+        for route, r in workload["routes"].items():
+            print(
+                f"{route:<52} {r['throughput_rps']:>9.1f} {r['p50_ms']:>8.2f}"
+                f" {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>5}"
+            )
+
+
+def compare(old: dict, new: dict) -> None:
+    """Prints per-route changes in throughput and latency between two result files."""
+    old_commit, new_commit = old["meta"]["git"]["commit"], new["meta"]["git"]["commit"]
+    print(f"old: {old_commit[:12]}  new: {new_commit[:12]}")
+    print(f"{'workload / route':<64} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+
+    def change(key: str, before: dict, after: dict) -> str:
+        if not before.get(key):
+            return "n/a"
+        return f"{(after[key] - before[key]) / before[key]:+.0%}"
+
+    for name, workload in new["workloads"].items():
+        old_routes = old["workloads"].get(name, {}).get("routes", {})
+        for route, after in workload["routes"].items():
+            before = old_routes.get(route, {})
+            print(
+                f"{name + ' ' + route:<64}"
+                + "".join(
+                    f" {change(key, before, after):>8}"
+                    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+                )
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed the database and run workloads")
+    run_parser.add_argument(
+        "--database-url",
+        default=os.environ.get("BENCH_DATABASE_URL"),
+        help="THROWAWAY database; all rows are replaced (default: $BENCH_DATABASE_URL)",
+    )
+    run_parser.add_argument(
+        "--workload",
+        dest="workloads",
+        action="append",
+        choices=list(WORKLOADS),
+        help="workload to run, may be repeated (default: all)",
+    )
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    run_parser.add_argument("--warmup", type=float, default=3.0, help="seconds")
+    run_parser.add_argument("--workers", type=int, default=1, help="server workers")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--connection-budget",
+        type=int,
+        help="DB_CONNECTION_BUDGET of the server (default: its own setting)",
+    )
+    run_parser.add_argument(
+        "--vote-score-shards",
+        type=int,
+        default=1,
+        help="VOTES_SCORE_SHARDS of the server (default: 1, no sharding)",
+    )
+    run_parser.add_argument("-o", "--output", type=pathlib.Path)
+
+    scaling_parser = commands.add_parser(
+        "scaling",
+        parents=[run_parser],
+        add_help=False,
+        help="run the workloads with 1 to --max-workers server workers",
+    )
+    scaling_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    shards_parser = commands.add_parser(
+        "shards",
+        parents=[run_parser],
+        add_help=False,
+        help="run vote_storm with 1, 2, 4, ... up to --max-shards vote counter rows",
+    )
+    shards_parser.add_argument("--max-shards", type=int, default=16)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old", type=pathlib.Path)
+    compare_parser.add_argument("new", type=pathlib.Path)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(json.loads(args.old.read_text()), json.loads(args.new.read_text()))
+        return
+
+    if not args.database_url:
+        parser.error("--database-url or BENCH_DATABASE_URL is required")
+    if args.command == "shards":
+        args.workloads = args.workloads or ["vote_storm"]
+    args.workloads = args.workloads or list(WORKLOADS)
+    if args.command == "scaling":
+        results = scaling(args)
+        print_sweep(results["workers"], "workers")
+    elif args.command == "shards":
+        results = shards(args)
+        print_sweep(results["shards"], "shards")
+    else:
+        results = run(args)
+        print_results(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
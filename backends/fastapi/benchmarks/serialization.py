@@ -0,0 +1,181 @@
+"""Micro-benchmark: model-based vs. direct serialization of list responses.
+
+Compares, for the payloads of `list_posts`, `list_comments` and `list_replies`:
+
+- `models`: what those handlers used to do. Build a pydantic model per row, then let
+  FastAPI re-validate the result against `response_model` and serialize it to JSON.
+- `direct`: what they do now. Serialize the asyncpg Records straight to JSON bytes
+  with `app.responses.dump_json`.
+
+Rows are synthetic asyncpg Records, so no database is needed (with an asyncpg that
+lacks the private constructor for them, plain dicts stand in, which `dump_json`
+serializes natively, so `direct` will look a little faster than it is):
+
+    uv run python -m benchmarks.serialization [--repeat N] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import importlib
+import json
+import timeit
+
+import uuid7
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models import (
+    CommentResponse,
+    CommentTreeResponse,
+    PostListResponse,
+    PostResponse,
+)
+from app.responses import dump_json
+
+_create_record = getattr(
+    importlib.import_module("asyncpg.protocol.protocol"), "_create_record", None
+)
+
+NOW = datetime.datetime(2025, 2, 24, 12, 0, 0, 123456, tzinfo=datetime.UTC)
+
+
+def _record(values: dict):
+    if _create_record is None:
+        return values
+    return _create_record(
+        {key: i for i, key in enumerate(values)}, tuple(values.values())
+    )
+
+
+def _post_rows(count: int) -> list:
+    return [
+        _record(
+            {
+                "id": uuid7.create(),
+                "title": f"Post {n}",
+                "body": "Lorem ipsum dolor sit amet " * 10,
+                "author": f"author_{n}",
+                "created_at": NOW,
+                "updated_at": NOW,
+                "vote_score": n,
+                "comment_count": n,
+                "last_comment_at": NOW,
+            }
+        )
+        for n in range(count)
+    ]
+
+
+def _comment_rows(max_depth: int, per_parent: int, limit: int) -> list:
+    """A tree `max_depth` deep with `per_parent` replies per comment, up to `limit`."""
+    post_id = uuid7.create()
+    rows = []
+    parents = [None]
+    for depth in range(max_depth + 1):
+        next_parents = []
+        for parent in parents:
+            for n in range(per_parent):
+                if len(rows) >= limit:
+                    return rows
+                comment_id = uuid7.create()
+                rows.append(
+                    _record(
+                        {
+                            "id": comment_id,
+                            "post_id": post_id,
+                            "parent_comment_id": parent,
+                            "author": f"commenter_{n}",
+                            "body": "Lorem ipsum dolor sit amet " * 5,
+                            "created_at": NOW,
+                            "updated_at": NOW,
+                            "vote_score": n,
+                            "depth": depth,
+                        }
+                    )
+                )
+                next_parents.append(comment_id)
+        parents = next_parents
+    return rows
+
+
+def _models_path(response_model, item_model, rows) -> bytes:
+    # Roughly FastAPI's handling of a returned model: validate it against the
+    # response_model, dump it to JSON-compatible Python, then json.dumps that.
+    result = response_model(
+        items=[item_model(**dict(r)) for r in rows], next_cursor=None
+    )
+    adapter = TypeAdapter(response_model)
+    validated = adapter.validate_python(result, from_attributes=True)
+    content = jsonable_encoder(adapter.dump_python(validated, mode="json"))
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def _direct_path(rows) -> bytes:
+    return dump_json({"items": rows, "next_cursor": None})
+
+
+SCENARIOS = {
+    "list_posts (25 posts)": (PostListResponse, PostResponse, _post_rows(25)),
+    "list_comments (default page, 30 comments)": (
+        CommentTreeResponse,
+        CommentResponse,
+        _comment_rows(max_depth=2, per_parent=10, limit=30),
+    ),
+    "list_comments (10 levels, 500 comments)": (
+        CommentTreeResponse,
+        CommentResponse,
+        _comment_rows(max_depth=10, per_parent=3, limit=500),
+    ),
+    "list_replies (10 levels, 300 comments)": (
+        CommentTreeResponse,
+        CommentResponse,
+        _comment_rows(max_depth=10, per_parent=2, limit=300),
+    ),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name, (response_model, item_model, rows) in SCENARIOS.items():
+        models_s = min(
+            timeit.repeat(
+                lambda rm=response_model, im=item_model, r=rows: _models_path(
+                    rm, im, r
+                ),
+                number=args.repeat,
+                repeat=5,
+            )
+        )
+        direct_s = min(
+            timeit.repeat(lambda r=rows: _direct_path(r), number=args.repeat, repeat=5)
+        )
+        results.append(
+            {
+                "scenario": name,
+                "rows": len(rows),
+                "models_us": models_s / args.repeat * 1e6,
+                "direct_us": direct_s / args.repeat * 1e6,
+                "speedup": models_s / direct_s,
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<45} {'rows':>5} {'models µs':>11} {'direct µs':>11} {'x':>6}")
+    for r in results:
+        print(
+            f"{r['scenario']:<45} {r['rows']:>5} {r['models_us']:>11.1f}"
+            f" {r['direct_us']:>11.1f} {r['speedup']:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
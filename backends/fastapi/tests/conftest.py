@@ -6,8 +6,13 @@ from unittest.mock import AsyncMock, MagicMock
 import pytest
 from fastapi.testclient import TestClient
 
+from app.cache import ResponseCache
 from app.config import Settings, get_settings
+from app.events import EventBroker
 from app.main import get_app
+from app.readiness import ReadinessProbe
+from app.singleflight import SingleFlight
+from app.vote_buffer import VoteBuffer
 
 
 @pytest.fixture
@@ -26,7 +31,13 @@ def settings() -> Generator[Settings]:
 
 @pytest.fixture
 def mock_conn() -> AsyncMock:
-    return AsyncMock()
+    conn = AsyncMock()
+    # `conn.transaction()` is a plain call returning an async context manager
+    tx = AsyncMock()
+    tx.__aenter__.return_value = None
+    tx.__aexit__.return_value = None
+    conn.transaction = MagicMock(return_value=tx)
+    return conn
 
 
 @pytest.fixture
@@ -40,11 +51,64 @@ def mock_pool(mock_conn: AsyncMock) -> MagicMock:
 
 
 @pytest.fixture
-def test_client(settings, mock_pool: MagicMock) -> Generator[TestClient]:
-    from app.db import get_pool
+def cache(settings: Settings) -> ResponseCache:
+    # A fresh cache per test, so cached responses never leak between tests
+    return ResponseCache(
+        max_entries=settings.cache_max_entries,
+        ttl_seconds=settings.cache_ttl_seconds,
+        enabled=settings.cache_enabled,
+    )
+
+
+@pytest.fixture
+def readiness_probe(settings: Settings) -> ReadinessProbe:
+    return ReadinessProbe(settings)
+
+
+@pytest.fixture
+def event_broker(settings: Settings) -> EventBroker:
+    return EventBroker(settings)
+
+
+@pytest.fixture
+def flights() -> SingleFlight:
+    return SingleFlight()
+
+
+@pytest.fixture
+def vote_buffer(
+    settings: Settings, mock_pool: MagicMock, cache: ResponseCache
+) -> VoteBuffer:
+    # Disabled unless a test turns it on
+    return VoteBuffer(settings, mock_pool, cache)
+
+
+@pytest.fixture
+def test_client(
+    settings,
+    *,
+    mock_pool: MagicMock,
+    cache: ResponseCache,
+    readiness_probe: ReadinessProbe,
+    event_broker: EventBroker,
+    flights: SingleFlight,
+    vote_buffer: VoteBuffer,
+) -> Generator[TestClient]:
+    from app.cache import get_cache
+    from app.db import get_pool, get_read_pool
+    from app.events import get_event_broker
+    from app.readiness import get_readiness_probe
+    from app.singleflight import get_singleflight
+    from app.vote_buffer import get_vote_buffer
 
     app = get_app()
     app.dependency_overrides[get_pool] = lambda: mock_pool
+    app.dependency_overrides[get_read_pool] = lambda: mock_pool
+    app.dependency_overrides[get_cache] = lambda: cache
+    app.dependency_overrides[get_readiness_probe] = lambda: readiness_probe
+    app.dependency_overrides[get_event_broker] = lambda: event_broker
+    app.dependency_overrides[get_singleflight] = lambda: flights
+    app.dependency_overrides[get_vote_buffer] = lambda: vote_buffer
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
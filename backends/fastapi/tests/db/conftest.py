@@ -0,0 +1,82 @@
+"""Fixtures for tests that run against a live Postgres.
+
+These tests only run when `TEST_DATABASE_URL` points at a throwaway database:
+the shared schema and migrations are applied there, and it is seeded with enough
+data for the planner to behave as it would at scale. Otherwise they are skipped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+
+import asyncpg
+import pytest
+
+from benchmarks.dataset import apply_schema
+
+SEED_POSTS = 5_000
+TOP_COMMENTS_PER_POST = 3
+REPLIES_PER_COMMENT = 2
+EXTRA_VOTES_PER_POST = 5
+
+
+async def _prepare_database(database_url: str) -> None:
+    conn = await asyncpg.connect(database_url)
+    try:
+        await apply_schema(conn)
+
+        if await conn.fetchval("SELECT count(*) FROM posts") >= SEED_POSTS:
+            return
+        async with conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO posts (title, body, author, created_at)
+                SELECT
+                    'Post ' || n,
+                    'Body of post ' || n,
+                    'author_' || (n % 500),
+                    NOW() - n * INTERVAL '1 minute'
+                FROM generate_series(1, $1) AS n
+                """,
+                SEED_POSTS,
+            )
+            await conn.execute(
+                """
+                INSERT INTO comments (post_id, author, body, created_at)
+                SELECT p.id, 'commenter_' || n, 'Top comment ' || n,
+                    p.created_at + n * INTERVAL '1 second'
+                FROM posts p, generate_series(1, $1) AS n
+                """,
+                TOP_COMMENTS_PER_POST,
+            )
+            await conn.execute(
+                """
+                INSERT INTO comments (post_id, parent_comment_id, author, body, created_at)
+                SELECT c.post_id, c.id, 'replier_' || n, 'Reply ' || n,
+                    c.created_at + n * INTERVAL '1 second'
+                FROM comments c, generate_series(1, $1) AS n
+                WHERE c.depth = 0
+                """,
+                REPLIES_PER_COMMENT,
+            )
+            await conn.execute(
+                """
+                INSERT INTO votes (voter, object_id, object_type, vote_value)
+                SELECT 'voter_' || n, p.id, 'Post', 1
+                FROM posts p, generate_series(1, $1) AS n
+                """,
+                EXTRA_VOTES_PER_POST,
+            )
+        await conn.execute("ANALYZE posts, comments, votes")
+    finally:
+        await conn.close()
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set; skipping live database tests")
+    asyncio.run(_prepare_database(url))
+    return url
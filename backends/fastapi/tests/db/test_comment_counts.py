@@ -0,0 +1,95 @@
+"""`posts.comment_count` and `last_comment_at` follow inserts and cascade deletes."""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+
+
+async def _insert_comment(conn: asyncpg.Connection, post_id, parent_id=None):
+    return await conn.fetchval(
+        """
+        INSERT INTO comments (post_id, parent_comment_id, author, body)
+        VALUES ($1, $2, 'counter', 'Counted') RETURNING id
+        """,
+        post_id,
+        parent_id,
+    )
+
+
+async def _counts(conn: asyncpg.Connection, post_id) -> tuple[int, object]:
+    row = await conn.fetchrow(
+        "SELECT comment_count, last_comment_at FROM posts WHERE id = $1", post_id
+    )
+    return row["comment_count"], row["last_comment_at"]
+
+
+async def _with_post(database_url: str, check) -> None:
+    conn = await asyncpg.connect(database_url)
+    post_id = await conn.fetchval(
+        "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+    )
+    try:
+        await check(conn, post_id)
+    finally:
+        await conn.execute("DELETE FROM posts WHERE id = $1", post_id)
+        await conn.close()
+
+
+def test_counts_follow_inserts_and_subtree_deletes(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        top = await _insert_comment(conn, post_id)
+        reply = await _insert_comment(conn, post_id, top)
+        await _insert_comment(conn, post_id, reply)
+        other = await _insert_comment(conn, post_id)
+        newest = await conn.fetchval(
+            "SELECT created_at FROM comments WHERE id = $1", other
+        )
+
+        assert await _counts(conn, post_id) == (4, newest)
+
+        # Deleting `top` cascades to its reply and the reply's reply
+        await conn.execute("DELETE FROM comments WHERE id = $1", top)
+
+        assert (await _counts(conn, post_id))[0] == 1
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_bulk_insert_counts_each_post_once(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, author, body)
+            SELECT $1, 'counter', 'Bulk ' || n FROM generate_series(1, 50) AS n
+            """,
+            post_id,
+        )
+
+        assert (await _counts(conn, post_id))[0] == 50
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_reconcile_fixes_drift(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await _insert_comment(conn, post_id)
+        await _insert_comment(conn, post_id)
+        expected = await _counts(conn, post_id)
+        await conn.execute(
+            """
+            UPDATE posts SET comment_count = 99, last_comment_at = NULL
+            WHERE id = $1
+            """,
+            post_id,
+        )
+
+        fixed = await conn.fetchval("CALL reconcile_comment_counts(7)")
+
+        assert fixed >= 1
+        assert await _counts(conn, post_id) == expected
+        # Nothing left to fix
+        assert await conn.fetchval("CALL reconcile_comment_counts()") == 0
+
+    asyncio.run(_with_post(database_url, check))
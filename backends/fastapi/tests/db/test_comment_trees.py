@@ -0,0 +1,221 @@
+"""Comment trees read by path match the original recursive CTE over parent links.
+
+`REFERENCE_TREE` is that CTE: a page of siblings under `$2` (or the Post itself),
+then the first `$5` children of every comment read, level by level, until `$7`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+import pytest
+
+REFERENCE_TREE = """
+    WITH RECURSIVE tree AS (
+        (
+            SELECT c.id, c.parent_comment_id, c.created_at, $6::INTEGER AS depth
+            FROM comments c
+            WHERE c.post_id = $1
+                AND c.parent_comment_id IS NOT DISTINCT FROM $2
+                AND ($4::UUID IS NULL OR (c.created_at, c.id) > ($3, $4))
+            ORDER BY c.created_at, c.id
+            LIMIT $5
+        )
+
+        UNION ALL
+
+        SELECT c.id, c.parent_comment_id, c.created_at, t.depth + 1
+        FROM tree t
+        JOIN LATERAL (
+            SELECT *
+            FROM comments c
+            WHERE c.parent_comment_id = t.id
+            ORDER BY c.created_at, c.id
+            LIMIT $5
+        ) c ON TRUE
+        WHERE t.depth < $7
+    )
+    SELECT id, parent_comment_id, depth
+    FROM tree
+    ORDER BY depth, created_at, id
+"""
+
+# Children of every comment at each level: 4 top comments, 4 replies each, ...
+CHILDREN_PER_LEVEL = [4, 4, 4, 1]
+
+
+async def _insert_thread(conn: asyncpg.Connection) -> asyncpg.Record:
+    post_id = await conn.fetchval(
+        "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+    )
+    await conn.execute(
+        """
+        INSERT INTO comments (post_id, author, body, created_at)
+        SELECT $1, 'tree', 'Top ' || n, NOW() + n * INTERVAL '1 second'
+        FROM generate_series(1, $2) AS n
+        """,
+        post_id,
+        CHILDREN_PER_LEVEL[0],
+    )
+    for depth, children in enumerate(CHILDREN_PER_LEVEL[1:]):
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, parent_comment_id, author, body, created_at)
+            SELECT c.post_id, c.id, 'tree', 'Reply ' || n,
+                c.created_at + n * INTERVAL '1 millisecond'
+            FROM comments c, generate_series(1, $3) AS n
+            WHERE c.post_id = $1 AND c.depth = $2
+            """,
+            post_id,
+            depth,
+            children,
+        )
+    return await conn.fetchrow(
+        """
+        SELECT post_id, id, created_at FROM comments
+        WHERE post_id = $1 AND depth = 0
+        ORDER BY path
+        """,
+        post_id,
+    )
+
+
+async def _tree(conn: asyncpg.Connection, query: str, *args) -> list[tuple]:
+    rows = await conn.fetch(query, *args)
+    return [(r["id"], r["parent_comment_id"], r["depth"]) for r in rows]
+
+
+def _with_thread(database_url: str, check) -> None:
+    async def run() -> None:
+        conn = await asyncpg.connect(database_url)
+        first = await _insert_thread(conn)
+        try:
+            await check(conn, first)
+        finally:
+            await conn.execute("DELETE FROM posts WHERE id = $1", first["post_id"])
+            await conn.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize(("max_depth", "page_size"), [(0, 10), (2, 2), (3, 3), (5, 1)])
+def test_comment_tree_matches_reference(database_url: str, max_depth, page_size):
+    async def check(conn: asyncpg.Connection, first: asyncpg.Record) -> None:
+        post_id = first["post_id"]
+        tree = await _tree(
+            conn,
+            "SELECT * FROM get_comment_tree($1, $2, $3)",
+            post_id,
+            max_depth,
+            page_size,
+        )
+
+        assert tree
+        assert tree == await _tree(
+            conn, REFERENCE_TREE, post_id, None, None, None, page_size, 0, max_depth
+        )
+
+    _with_thread(database_url, check)
+
+
+def test_comment_tree_cursor_survives_deleted_anchor(database_url: str):
+    async def check(conn: asyncpg.Connection, first: asyncpg.Record) -> None:
+        post_id, anchor, anchor_at = first["post_id"], first["id"], first["created_at"]
+        await conn.execute("DELETE FROM comments WHERE id = $1", anchor)
+
+        tree = await _tree(
+            conn,
+            "SELECT * FROM get_comment_tree($1, 2, 2, $2, $3)",
+            post_id,
+            anchor_at,
+            anchor,
+        )
+
+        assert tree
+        assert anchor not in {comment_id for comment_id, _, _ in tree}
+        assert tree == await _tree(
+            conn, REFERENCE_TREE, post_id, None, anchor_at, anchor, 2, 0, 2
+        )
+
+    _with_thread(database_url, check)
+
+
+@pytest.mark.parametrize("max_depth", [0, 1, 2])
+def test_reply_tree_matches_reference(database_url: str, max_depth):
+    async def check(conn: asyncpg.Connection, first: asyncpg.Record) -> None:
+        post_id, target = first["post_id"], first["id"]
+        tree = await _tree(
+            conn,
+            "SELECT * FROM get_reply_tree($1, $2, $3, 3)",
+            post_id,
+            target,
+            max_depth,
+        )
+
+        assert tree
+        # Only direct replies, unless max_depth reaches below them
+        assert all(depth == 1 for _, _, depth in tree) == (max_depth <= 1)
+        assert tree == await _tree(
+            conn, REFERENCE_TREE, post_id, target, None, None, 3, 1, max_depth
+        )
+
+    _with_thread(database_url, check)
+
+
+def test_reply_tree_cursor(database_url: str):
+    async def check(conn: asyncpg.Connection, first: asyncpg.Record) -> None:
+        post_id, target = first["post_id"], first["id"]
+        direct = await conn.fetch(
+            """
+            SELECT id, created_at FROM comments
+            WHERE parent_comment_id = $1
+            ORDER BY created_at, id
+            """,
+            target,
+        )
+        cursor_id, cursor_at = direct[0]["id"], direct[0]["created_at"]
+
+        tree = await _tree(
+            conn,
+            "SELECT * FROM get_reply_tree($1, $2, 1, 2, $3, $4)",
+            post_id,
+            target,
+            cursor_at,
+            cursor_id,
+        )
+
+        assert tree == await _tree(
+            conn, REFERENCE_TREE, post_id, target, cursor_at, cursor_id, 2, 1, 1
+        )
+
+    _with_thread(database_url, check)
+
+
+def test_backfill_recomputes_depth_and_path(database_url: str):
+    async def check(conn: asyncpg.Connection, first: asyncpg.Record) -> None:
+        post_id = first["post_id"]
+        query = "SELECT id, depth, path FROM comments WHERE post_id = $1 ORDER BY id"
+        expected = await conn.fetch(query, post_id)
+
+        # Never keep the altered schema
+        tr = conn.transaction()
+        await tr.start()
+        try:
+            await conn.execute(
+                """
+                ALTER TABLE comments ALTER COLUMN depth DROP NOT NULL;
+                ALTER TABLE comments ALTER COLUMN path DROP NOT NULL;
+                """
+            )
+            await conn.execute(
+                "UPDATE comments SET depth = NULL, path = NULL WHERE post_id = $1",
+                post_id,
+            )
+
+            assert await conn.fetchval("SELECT backfill_comment_paths()") > 0
+            assert await conn.fetch(query, post_id) == expected
+        finally:
+            await tr.rollback()
+
+    _with_thread(database_url, check)
@@ -0,0 +1,101 @@
+"""The vote and comment triggers announce changes on the `post_events` channel."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import asyncpg
+
+from app.events import CHANNEL
+
+
+async def _notifications(
+    database_url: str, statements: list[str]
+) -> tuple[str, list[dict]]:
+    """Creates a Post, then runs `statements` on it in one committed transaction.
+
+    Returns the Post's id, and every notification LISTEN received meanwhile.
+    """
+    listener = await asyncpg.connect(database_url)
+    writer = await asyncpg.connect(database_url)
+    received: list[dict] = []
+    try:
+        await listener.add_listener(
+            CHANNEL, lambda *args: received.append(json.loads(args[3]))
+        )
+        post_id = await writer.fetchval(
+            "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+        )
+        async with writer.transaction():
+            for statement in statements:
+                await writer.execute(statement.format(post_id=post_id))
+        # Notifications arrive asynchronously after the commit
+        await asyncio.sleep(0.2)
+        await writer.execute("DELETE FROM posts WHERE id = $1", post_id)
+    finally:
+        await listener.close()
+        await writer.close()
+    return str(post_id), received
+
+
+def test_vote_notifies_new_score(database_url: str):
+    post_id, received = asyncio.run(
+        _notifications(
+            database_url,
+            ["SELECT cast_vote('listener', 'Post', '{post_id}', -1)"],
+        )
+    )
+
+    votes = [event for event in received if event["type"] == "vote"]
+    assert votes[-1]["post_id"] == post_id
+    assert votes[-1]["object_type"] == "Post"
+    # +1 from the author's automatic upvote, -1 from ours
+    assert votes[-1]["vote_score"] == 0
+
+
+def test_comment_notifies_its_post(database_url: str):
+    post_id, received = asyncio.run(
+        _notifications(
+            database_url,
+            [
+                "INSERT INTO comments (post_id, author, body)"
+                " VALUES ('{post_id}', 'commenter', 'hi')"
+            ],
+        )
+    )
+
+    comments = [event for event in received if event["type"] == "comment"]
+    assert len(comments) == 1
+    assert comments[0]["post_id"] == post_id
+    assert comments[0]["depth"] == 0
+    assert comments[0]["author"] == "commenter"
+    # The author's automatic upvote on the comment is announced to the same Post
+    assert any(
+        event["type"] == "vote"
+        and event["object_type"] == "Comment"
+        and event["post_id"] == post_id
+        for event in received
+    )
+
+
+def test_rolled_back_writes_are_not_announced(database_url: str):
+    async def run() -> list[str]:
+        listener = await asyncpg.connect(database_url)
+        writer = await asyncpg.connect(database_url)
+        received: list[str] = []
+        try:
+            await listener.add_listener(CHANNEL, lambda *args: received.append(args[3]))
+            tr = writer.transaction()
+            await tr.start()
+            await writer.execute(
+                "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a')"
+            )
+            await tr.rollback()
+            await asyncio.sleep(0.2)
+        finally:
+            await listener.close()
+            await writer.close()
+        return received
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,173 @@
+"""Plan regression tests: no hot query may sequentially scan a large table.
+
+Every static SQL statement passed to `fetch`/`fetchrow`/`fetchval`/`execute`, or
+opened as a `cursor`, in `app/routers/` is explained as a generic plan (no parameter values needed).
+Statements built with f-strings (the PATCH endpoints) are skipped;
+they only ever update a single row by primary key.
+
+Stored functions hide their queries from a plain EXPLAIN, so those are executed
+instead, with `auto_explain` logging the plan of every nested statement back to us.
+"""
+
+from __future__ import annotations
+
+import ast
+import asyncio
+import json
+import pathlib
+import re
+import textwrap
+
+import asyncpg
+import pytest
+
+import app.routers
+
+ROUTERS_DIR = pathlib.Path(app.routers.__file__).parent
+QUERY_METHODS = {"fetch", "fetchrow", "fetchval", "execute", "cursor"}
+LARGE_TABLES = {"posts", "comments", "votes"}
+# Partitions of a large table (votes_p00 ... votes_p15) count as that table
+PARTITION_SUFFIX = re.compile(r"_p\d+$")
+
+# Calls to stored functions, with the sample IDs (see `_sample_ids`) they take.
+STORED_FUNCTION_CALLS = {
+    "get_comment_tree": (
+        "SELECT * FROM get_comment_tree($1)",
+        ["post_id"],
+    ),
+    "get_comment_tree_with_cursor": (
+        "SELECT * FROM get_comment_tree($1, 2, 10, $2, $3)",
+        ["post_id", "comment_created_at", "comment_id"],
+    ),
+    "get_reply_tree": (
+        "SELECT * FROM get_reply_tree($1, $2)",
+        ["post_id", "comment_id"],
+    ),
+    "cast_vote_on_post": (
+        "SELECT cast_vote('plan_tester', 'Post', $1, 1)",
+        ["post_id"],
+    ),
+    "cast_vote_on_comment": (
+        "SELECT cast_vote('plan_tester', 'Comment', $2, -1, $1)",
+        ["post_id", "comment_id"],
+    ),
+    "cast_vote_sharded": (
+        "SELECT cast_vote('plan_tester', 'Post', $1, 1)"
+        " FROM set_config('votes.score_shards', '8', TRUE)",
+        ["post_id"],
+    ),
+    "fold_vote_score_shards": ("SELECT fold_vote_score_shards()", []),
+}
+
+
+def _router_statements() -> list:
+    params = []
+    for path in sorted(ROUTERS_DIR.glob("*.py")):
+        for node in ast.walk(ast.parse(path.read_text())):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in QUERY_METHODS
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)
+            ):
+                statement = textwrap.dedent(node.args[0].value).strip()
+                params.append(pytest.param(statement, id=f"{path.stem}:{node.lineno}"))
+    return params
+
+
+def _relations(plan: dict, node_type: str | None = None) -> list[str]:
+    """Relations read anywhere in this plan tree (by nodes of `node_type`, if given)."""
+    found = []
+    if "Relation Name" in plan and node_type in {None, plan["Node Type"]}:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_relations(child, node_type))
+    return found
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    """Names of large tables read by a Seq Scan anywhere in this plan tree."""
+    tables = (PARTITION_SUFFIX.sub("", r) for r in _relations(plan, "Seq Scan"))
+    return [table for table in tables if table in LARGE_TABLES]
+
+
+async def _explain_generic(database_url: str, statement: str) -> dict:
+    conn = await asyncpg.connect(database_url)
+    try:
+        result = await conn.fetchval(f"EXPLAIN (FORMAT JSON, GENERIC_PLAN) {statement}")
+    finally:
+        await conn.close()
+    return json.loads(result)[0]
+
+
+async def _sample_ids(conn: asyncpg.Connection) -> dict:
+    row = await conn.fetchrow(
+        """
+        SELECT c.post_id, c.id AS comment_id, c.created_at AS comment_created_at
+        FROM comments c
+        WHERE c.depth = 0
+        LIMIT 1
+        """
+    )
+    return dict(row)
+
+
+async def _explain_nested(database_url: str, statement: str, arg_names: list[str]):
+    conn = await asyncpg.connect(database_url)
+    messages: list[str] = []
+    conn.add_log_listener(lambda _conn, msg: messages.append(msg.message))
+    try:
+        sample = await _sample_ids(conn)
+        await conn.execute("LOAD 'auto_explain'")
+        await conn.execute(
+            """
+            SET auto_explain.log_min_duration = 0;
+            SET auto_explain.log_nested_statements = on;
+            SET auto_explain.log_format = 'json';
+            SET client_min_messages = 'log';
+            """
+        )
+        tr = conn.transaction()
+        await tr.start()
+        try:
+            await conn.fetch(statement, *(sample[name] for name in arg_names))
+        finally:
+            # Never keep writes (e.g. from cast_vote) in the seeded data
+            await tr.rollback()
+    finally:
+        await conn.close()
+    return [
+        json.loads(message.split("plan:", 1)[1])
+        for message in messages
+        if "plan:" in message
+    ]
+
+
+@pytest.mark.parametrize("statement", _router_statements())
+def test_router_statement_avoids_seq_scans(database_url: str, statement: str):
+    plan = asyncio.run(_explain_generic(database_url, statement))
+
+    assert not _seq_scans(plan["Plan"]), json.dumps(plan, indent=2)
+
+
+@pytest.mark.parametrize("name", STORED_FUNCTION_CALLS)
+def test_stored_function_avoids_seq_scans(database_url: str, name: str):
+    statement, arg_names = STORED_FUNCTION_CALLS[name]
+    plans = asyncio.run(_explain_nested(database_url, statement, arg_names))
+
+    # The call itself is always logged, so an empty list means auto_explain is missing
+    assert plans
+    for plan in plans:
+        assert not _seq_scans(plan["Plan"]), json.dumps(plan, indent=2)
+
+
+@pytest.mark.parametrize("name", ["cast_vote_on_post", "cast_vote_on_comment"])
+def test_vote_writes_touch_one_votes_partition(database_url: str, name: str):
+    statement, arg_names = STORED_FUNCTION_CALLS[name]
+    plans = asyncio.run(_explain_nested(database_url, statement, arg_names))
+
+    for plan in plans:
+        partitions = {r for r in _relations(plan["Plan"]) if r.startswith("votes_p")}
+        assert len(partitions) <= 1, json.dumps(plan, indent=2)
@@ -0,0 +1,91 @@
+"""`GET /search` against the real `search_vector` columns."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import asyncpg
+
+from app.routers import search as search_router
+
+# Words that never occur in the seeded data, so only these tests' rows match
+TITLE_WORD = "zygomorphic"
+BODY_WORD = "xerophytic"
+
+
+async def _search(database_url: str, **params) -> list[dict]:
+    """Searches every page, with rows of our own inserted for the duration."""
+    conn = await asyncpg.connect(database_url)
+    pool = await asyncpg.create_pool(database_url, min_size=1, max_size=1)
+    post_ids = [
+        await conn.fetchval(
+            """
+            INSERT INTO posts (title, body, author)
+            VALUES ($1, $2, 'searcher') RETURNING id
+            """,
+            f"{TITLE_WORD} {n}" if n == 0 else f"Post {n}",
+            f"All about {BODY_WORD} plants, part {n}",
+        )
+        for n in range(3)
+    ]
+    try:
+        await conn.execute(
+            """
+            INSERT INTO comments (post_id, author, body)
+            VALUES ($1, 'commenter', $2)
+            """,
+            post_ids[1],
+            f"I grow {BODY_WORD} plants too",
+        )
+
+        items, cursor = [], None
+        while True:
+            resp = await search_router.search(pool, cursor=cursor, **params)
+            page = json.loads(resp.body)
+            items.extend(page["items"])
+            if not (cursor := page["next_cursor"]):
+                return items
+    finally:
+        await conn.execute("DELETE FROM posts WHERE id = ANY($1)", post_ids)
+        await pool.close()
+        await conn.close()
+
+
+def test_search_ranks_title_matches_first(database_url: str):
+    items = asyncio.run(
+        _search(
+            database_url,
+            q=f"{TITLE_WORD} or {BODY_WORD}",
+            object_type=None,
+            author=None,
+        )
+    )
+
+    assert len(items) == 4
+    assert TITLE_WORD in items[0]["title"]
+    assert items == sorted(items, key=lambda item: item["rank"], reverse=True)
+    assert all("<mark>" in item["snippet"] for item in items)
+
+
+def test_search_filters(database_url: str):
+    comments = asyncio.run(
+        _search(database_url, q=BODY_WORD, object_type="Comment", author=None)
+    )
+    by_author = asyncio.run(
+        _search(database_url, q=BODY_WORD, object_type=None, author="commenter")
+    )
+
+    assert [item["object_type"] for item in comments] == ["Comment"]
+    assert comments[0]["title"] is None
+    assert [item["id"] for item in by_author] == [comments[0]["id"]]
+
+
+def test_search_pages_without_gaps(database_url: str, monkeypatch):
+    monkeypatch.setattr(search_router, "PAGE_SIZE", 1)
+
+    items = asyncio.run(
+        _search(database_url, q=BODY_WORD, object_type=None, author=None)
+    )
+
+    assert len({item["id"] for item in items}) == len(items) == 4
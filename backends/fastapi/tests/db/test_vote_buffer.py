@@ -0,0 +1,54 @@
+"""A write-behind flush applies its votes, and each object's score, once."""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+
+from app.config import Settings
+from app.vote_buffer import VoteBuffer
+
+
+def test_flush_writes_votes_and_net_scores(database_url: str):
+    async def run() -> None:
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        post_id = await pool.fetchval(
+            "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+        )
+        gone_id = await pool.fetchval(
+            "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+        )
+        try:
+            await pool.execute(
+                """
+                INSERT INTO votes (voter, object_id, object_type, vote_value)
+                VALUES ('retracted', $1, 'Post', 1), ('flipped', $1, 'Post', 1)
+                """,
+                post_id,
+            )
+            settings = Settings(db_connection_url=database_url, votes_write_behind=True)
+            buffer = VoteBuffer(settings, pool)
+            for n in range(20):
+                await buffer.add(post_id, "Post", f"burst_{n}", 1)
+            await buffer.add(post_id, "Post", "retracted", 0)
+            await buffer.add(post_id, "Post", "flipped", -1)
+            await buffer.add(gone_id, "Post", "late", 1)
+            await pool.execute("DELETE FROM posts WHERE id = $1", gone_id)
+
+            await buffer.close()
+
+            score = await pool.fetchval(
+                "SELECT vote_score FROM posts WHERE id = $1", post_id
+            )
+            votes = await pool.fetchval(
+                "SELECT count(*) FROM votes WHERE object_id = ANY($1::uuid[])",
+                [post_id, gone_id],
+            )
+            assert (score, votes) == (19, 21)
+            assert (len(buffer), buffer.flushed) == (0, 23)
+        finally:
+            await pool.execute("DELETE FROM posts WHERE id = $1", post_id)
+            await pool.close()
+
+    asyncio.run(run())
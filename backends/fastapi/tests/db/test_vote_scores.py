@@ -0,0 +1,138 @@
+"""`vote_score` follows every vote write, and reconcile_vote_scores() repairs drift."""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+
+
+async def _vote(
+    conn: asyncpg.Connection, voter: str, object_type: str, object_id, value
+):
+    return await conn.fetchval(
+        "SELECT cast_vote($1, $2, $3, $4)", voter, object_type, object_id, value
+    )
+
+
+async def _score(conn: asyncpg.Connection, post_id) -> tuple[int, int]:
+    """The Post's (vote_score, xmin), to tell whether its row was written."""
+    row = await conn.fetchrow(
+        "SELECT vote_score, xmin::TEXT::BIGINT AS xmin FROM posts WHERE id = $1",
+        post_id,
+    )
+    return row["vote_score"], row["xmin"]
+
+
+async def _with_post(database_url: str, check) -> None:
+    conn = await asyncpg.connect(database_url)
+    post_id = await conn.fetchval(
+        "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+    )
+    try:
+        await check(conn, post_id)
+    finally:
+        await conn.execute("DELETE FROM posts WHERE id = $1", post_id)
+        await conn.execute("DELETE FROM votes WHERE object_id = $1", post_id)
+        await conn.close()
+
+
+def test_insert_flip_and_retract(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        # The author's auto-upvote
+        assert (await _score(conn, post_id))[0] == 1
+
+        assert await _vote(conn, "alice", "Post", post_id, 1) == 2  # noqa: PLR2004
+        # A flip moves the score by 2
+        assert await _vote(conn, "alice", "Post", post_id, -1) == 0
+        assert await _vote(conn, "alice", "Post", post_id, 0) == 1
+
+        assert (await _score(conn, post_id))[0] == 1
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_comment_votes_score_the_comment(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        comment_id = await conn.fetchval(
+            """
+            INSERT INTO comments (post_id, author, body)
+            VALUES ($1, 'a', 'b') RETURNING id
+            """,
+            post_id,
+        )
+
+        assert await _vote(conn, "alice", "Comment", comment_id, -1) == 0
+        assert await _vote(conn, "alice", "Comment", comment_id, 1) == 2  # noqa: PLR2004
+        # The Post's own score is untouched
+        assert (await _score(conn, post_id))[0] == 1
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_repeated_vote_is_a_no_op(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await _vote(conn, "alice", "Post", post_id, 1)
+        before = await _score(conn, post_id)
+
+        assert await _vote(conn, "alice", "Post", post_id, 1) == before[0]
+        # The Post's row is not even rewritten
+        assert await _score(conn, post_id) == before
+
+        await _vote(conn, "alice", "Post", post_id, 0)
+        retracted = await _score(conn, post_id)
+        await _vote(conn, "alice", "Post", post_id, 0)
+
+        assert await _score(conn, post_id) == retracted
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_one_statement_applies_the_net_change_once(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await conn.execute(
+            """
+            INSERT INTO votes (voter, object_id, object_type, vote_value)
+            SELECT 'voter_' || n, $1, 'Post', CASE WHEN n % 3 = 0 THEN -1 ELSE 1 END
+            FROM generate_series(1, 9) AS n
+            """,
+            post_id,
+        )
+
+        # 1 (author) + 6 - 3
+        assert (await _score(conn, post_id))[0] == 4  # noqa: PLR2004
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_vote_on_deleted_object(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await conn.execute("DELETE FROM posts WHERE id = $1", post_id)
+
+        assert await _vote(conn, "alice", "Post", post_id, 1) is None
+        assert not await conn.fetchval(
+            "SELECT count(*) FROM votes WHERE object_id = $1 AND voter = 'alice'",
+            post_id,
+        )
+        # A vote written around cast_vote has no score to update, and is no error
+        await conn.execute(
+            """
+            INSERT INTO votes (voter, object_id, object_type, vote_value)
+            VALUES ('bob', $1, 'Post', 1)
+            """,
+            post_id,
+        )
+
+    asyncio.run(_with_post(database_url, check))
+
+
+def test_reconcile_repairs_drift(database_url: str):
+    async def check(conn: asyncpg.Connection, post_id) -> None:
+        await _vote(conn, "alice", "Post", post_id, 1)
+        expected = (await _score(conn, post_id))[0]
+        await conn.execute("UPDATE posts SET vote_score = 42 WHERE id = $1", post_id)
+
+        assert await conn.fetchval("SELECT reconcile_vote_scores()") >= 1
+        assert (await _score(conn, post_id))[0] == expected
+
+    asyncio.run(_with_post(database_url, check))
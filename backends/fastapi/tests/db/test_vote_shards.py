@@ -0,0 +1,65 @@
+"""Sharded vote counters add up to the same scores, before and after folding."""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+
+SHARDS = 4
+
+
+async def _score(conn: asyncpg.Connection, post_id) -> tuple[int, int]:
+    """The Post's (folded vote_score, vote_score with pending counters)."""
+    row = await conn.fetchrow(
+        """
+        SELECT vote_score, vote_score + pending_vote_delta('Post', id) AS total
+        FROM posts WHERE id = $1
+        """,
+        post_id,
+    )
+    return row["vote_score"], row["total"]
+
+
+def test_votes_spread_over_shards_and_fold_into_vote_score(database_url: str):
+    async def run() -> None:
+        conns = [
+            await asyncpg.connect(
+                database_url, server_settings={"votes.score_shards": str(SHARDS)}
+            )
+            for _ in range(SHARDS)
+        ]
+        conn = conns[0]
+        # The author's auto-upvote is the first pending delta
+        post_id = await conn.fetchval(
+            "INSERT INTO posts (title, body, author) VALUES ('t', 'b', 'a') RETURNING id"
+        )
+        try:
+            await asyncio.gather(
+                *(
+                    c.fetchval(
+                        "SELECT cast_vote($1, 'Post', $2, 1)", f"voter_{n}", post_id
+                    )
+                    for n, c in enumerate(conns)
+                )
+            )
+            score = await conn.fetchval(
+                "SELECT cast_vote('voter_0', 'Post', $1, -1)", post_id
+            )
+
+            assert score == SHARDS - 1
+            assert await _score(conn, post_id) == (0, SHARDS - 1)
+            # Pending counters are left out of the recomputed vote_score
+            await conn.fetchval("SELECT reconcile_vote_scores()")
+            assert await _score(conn, post_id) == (0, SHARDS - 1)
+
+            while await conn.fetchval("SELECT fold_vote_score_shards(2)") == 2:  # noqa: PLR2004
+                pass
+
+            assert await _score(conn, post_id) == (SHARDS - 1, SHARDS - 1)
+        finally:
+            await conn.execute("DELETE FROM posts WHERE id = $1", post_id)
+            for c in conns:
+                await c.close()
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+"""`votes` is hash-partitioned, and indexed by voter in every partition."""
+
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+
+VOTE_PARTITIONS = 16
+
+
+async def _fetchrow(database_url: str, query: str) -> asyncpg.Record:
+    conn = await asyncpg.connect(database_url)
+    try:
+        return await conn.fetchrow(query)
+    finally:
+        await conn.close()
+
+
+def test_votes_is_partitioned_by_object_id(database_url: str):
+    row = asyncio.run(
+        _fetchrow(
+            database_url,
+            """
+            SELECT
+                pg_get_partkeydef('votes'::regclass) AS key,
+                (SELECT count(*) FROM pg_inherits
+                 WHERE inhparent = 'votes'::regclass) AS partitions
+            """,
+        )
+    )
+
+    assert (row["key"], row["partitions"]) == ("HASH (object_id)", VOTE_PARTITIONS)
+
+
+def test_voter_index_is_valid_on_every_partition(database_url: str):
+    row = asyncio.run(
+        _fetchrow(
+            database_url,
+            """
+            SELECT
+                i.indisvalid AS valid,
+                (SELECT count(*) FROM pg_inherits
+                 WHERE inhparent = i.indexrelid) AS partitions
+            FROM pg_index i
+            WHERE i.indexrelid = 'votes_voter_object_idx'::regclass
+            """,
+        )
+    )
+
+    assert (row["valid"], row["partitions"]) == (True, VOTE_PARTITIONS)
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import typing
+
+import asyncpg
+import httpx
+import uuid7
+from fastapi import status
+from freezegun import freeze_time
+
+from app.cache import POST_KEY
+
+if typing.TYPE_CHECKING:
+    from unittest.mock import AsyncMock, MagicMock
+
+    from fastapi.testclient import TestClient
+
+    from app.cache import ResponseCache
+    from app.singleflight import SingleFlight
+
+
+@freeze_time("2025-02-24")
+def _make_comment_row(**kwargs) -> dict:
+    now = datetime.datetime.now(datetime.UTC)
+    row = {
+        "id": uuid7.create(),
+        "post_id": uuid7.create(),
+        "parent_comment_id": None,
+        "author": "testuser",
+        "body": "Test comment",
+        "created_at": now,
+        "updated_at": now,
+        "vote_score": 1,
+    }
+    row.update(kwargs)
+    return row
+
+
+def _make_created_row(**kwargs) -> dict:
+    """The row `create_comment`'s statement returns when it inserts the comment."""
+    return {"post_found": True, **_make_comment_row(**kwargs)}
+
+
+# === POST /posts/{post_id}/comments ===
+
+
+def test_create_comment(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Creating a comment is a single INSERT, with no separate existence check."""
+    post_id = uuid7.create()
+    row = _make_created_row(post_id=post_id, author="alice", body="Hello")
+    mock_conn.fetchrow.return_value = row
+    mock_conn.fetchval.return_value = 1
+
+    resp = test_client.post(
+        f"/posts/{post_id}/comments", json={"author": "alice", "body": "Hello"}
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert resp.json()["id"] == str(row["id"])
+    query, *args = mock_conn.fetchrow.call_args.args
+    assert "INSERT" in query.upper()
+    assert args == [post_id, None, "alice", "Hello"]
+    # Only the score is read back
+    query, comment_id = mock_conn.fetchval.call_args.args
+    assert "pending_vote_delta" in query
+    assert comment_id == row["id"]
+
+
+def test_create_comment_counts_auto_upvote(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """The author's auto-upvote, applied by triggers after RETURNING, is reported."""
+    mock_conn.fetchrow.return_value = _make_created_row(vote_score=0)
+    mock_conn.fetchval.return_value = 1
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments", json={"author": "alice", "body": "Hi"}
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert resp.json()["vote_score"] == 1
+
+
+def test_create_comment_post_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """A foreign key violation on the Post maps to a 404."""
+    mock_conn.fetchrow.side_effect = asyncpg.ForeignKeyViolationError.new(
+        {"C": "23503", "M": "fk violation", "n": "comments_post_id_fkey"}
+    )
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments", json={"author": "alice", "body": "Hi"}
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Post not found"
+
+
+def test_create_reply_post_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """A reply to a missing Post is a missing Post, not a missing parent."""
+    mock_conn.fetchrow.return_value = {"post_found": False, "id": None}
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments",
+        json={
+            "author": "alice",
+            "body": "Hi",
+            "parent_comment_id": str(uuid7.create()),
+        },
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Post not found"
+    mock_conn.fetchval.assert_not_awaited()
+
+
+def test_create_reply_parent_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Nothing is inserted if the parent comment is not part of the same Post."""
+    mock_conn.fetchrow.return_value = {"post_found": True, "id": None}
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments",
+        json={
+            "author": "alice",
+            "body": "Hi",
+            "parent_comment_id": str(uuid7.create()),
+        },
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Parent comment not found"
+
+
+def test_create_comment_invalidates_cached_post(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    """The Post's comment_count changed, so its cached response is dropped."""
+    post_id = uuid7.create()
+    cache.set((POST_KEY, post_id), b"stale")
+    mock_conn.fetchrow.return_value = _make_created_row(post_id=post_id)
+    mock_conn.fetchval.return_value = 1
+
+    resp = test_client.post(
+        f"/posts/{post_id}/comments", json={"author": "alice", "body": "Hello"}
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert cache.get((POST_KEY, post_id)) is None
+
+
+def test_create_comment_not_found_keeps_cached_post(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    post_id = uuid7.create()
+    cache.set((POST_KEY, post_id), b"cached")
+    mock_conn.fetchrow.return_value = {"post_found": True, "id": None}
+
+    resp = test_client.post(
+        f"/posts/{post_id}/comments",
+        json={"author": "alice", "body": "Hi", "parent_comment_id": str(post_id)},
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert cache.get((POST_KEY, post_id)) == b"cached"
+
+
+# === DELETE /posts/{post_id}/comments/{comment_id} ===
+
+
+def test_delete_comment_invalidates_cached_post(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    post_id = uuid7.create()
+    cache.set((POST_KEY, post_id), b"stale")
+    mock_conn.execute.return_value = "DELETE 1"
+
+    resp = test_client.delete(f"/posts/{post_id}/comments/{uuid7.create()}")
+
+    assert resp.status_code == status.HTTP_204_NO_CONTENT
+    assert cache.get((POST_KEY, post_id)) is None
+
+
+# === GET /posts/{post_id}/comments ===
+
+
+def test_list_comments_not_modified(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    post_id = uuid7.create()
+    mock_conn.fetch.return_value = [_make_comment_row(post_id=post_id, depth=0)]
+
+    first = test_client.get(f"/posts/{post_id}/comments")
+    second = test_client.get(
+        f"/posts/{post_id}/comments", headers={"If-None-Match": first.headers["etag"]}
+    )
+
+    assert first.status_code == status.HTTP_200_OK
+    assert first.headers["cache-control"] == "public, max-age=1"
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert second.content == b""
+
+
+def test_list_comments_etag_changes_with_tree(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    post_id = uuid7.create()
+    row = _make_comment_row(post_id=post_id, depth=0)
+    mock_conn.fetch.return_value = [row]
+    etag = test_client.get(f"/posts/{post_id}/comments").headers["etag"]
+
+    mock_conn.fetch.return_value = [{**row, "vote_score": 5}]
+    resp = test_client.get(
+        f"/posts/{post_id}/comments", headers={"If-None-Match": etag}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["etag"] != etag
+
+
+def test_list_comments_concurrent_requests_share_one_query(
+    test_client: TestClient,
+    mock_pool: MagicMock,
+    mock_conn: AsyncMock,
+    flights: SingleFlight,
+):
+    post_id = uuid7.create()
+    row = _make_comment_row(post_id=post_id, depth=0)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_fetch(*args):
+            await release.wait()
+            return [row]
+
+        mock_conn.fetch.side_effect = slow_fetch
+        transport = httpx.ASGITransport(app=test_client.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://t"
+        ) as client:
+            requests = [
+                asyncio.create_task(client.get(f"/posts/{post_id}/comments"))
+                for _ in range(20)
+            ]
+            while flights.collapsed < len(requests) - 1:
+                await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(run())
+
+    assert {resp.status_code for resp in responses} == {status.HTTP_200_OK}
+    assert len({resp.content for resp in responses}) == 1
+    assert mock_conn.fetch.await_count == 1
+    assert mock_pool.acquire.call_count == 1
+
+
+# === GET /posts/{post_id}/comments/{comment_id} ===
+
+
+def test_get_comment_not_modified(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    row = _make_comment_row(depth=0)
+    mock_conn.fetchrow.return_value = row
+    url = f"/posts/{row['post_id']}/comments/{row['id']}"
+
+    etag = test_client.get(url).headers["etag"]
+    resp = test_client.get(url, headers={"If-None-Match": etag})
+
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+# === GET /comments ===
+
+
+def test_get_comments_by_ids_in_request_order(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    first, second = _make_comment_row(depth=0), _make_comment_row(depth=1)
+    missing = uuid7.create()
+    mock_conn.fetch.return_value = [first, second]
+
+    resp = test_client.get(
+        "/comments", params={"ids": f"{missing},{second['id']},{first['id']}"}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    items = resp.json()["items"]
+    assert items[0] is None
+    assert [item["id"] for item in items[1:]] == [str(second["id"]), str(first["id"])]
+    assert items[1]["post_id"] == str(second["post_id"])
+    mock_conn.fetch.assert_awaited_once()
+
+
+def test_get_comments_by_ids_requires_ids(test_client: TestClient):
+    resp = test_client.get("/comments")
+
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
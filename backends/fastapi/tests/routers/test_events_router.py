@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import typing
+from unittest.mock import AsyncMock
+
+import uuid7
+from fastapi import status
+
+if typing.TYPE_CHECKING:
+    import pytest
+    from fastapi.testclient import TestClient
+
+    from app.events import EventBroker
+
+
+def test_stream_post_events(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    event_broker: EventBroker,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    post_id = uuid7.create()
+    mock_conn.fetchval.return_value = 1
+    monkeypatch.setattr(event_broker, "_listen", AsyncMock())
+    payload = json.dumps(
+        {
+            "type": "vote",
+            "post_id": str(post_id),
+            "object_type": "Post",
+            "object_id": str(post_id),
+            "vote_score": 2,
+        }
+    )
+    subscribe = event_broker.subscribe
+
+    async def subscribe_and_notify(post_id):
+        subscription = await subscribe(post_id)
+        event_broker.dispatch(payload)
+        # End the stream once the event has been read
+        get = subscription.get
+
+        async def get_then_close():
+            events = await get()
+            subscription.closed = True
+            return events
+
+        monkeypatch.setattr(subscription, "get", get_then_close)
+        return subscription
+
+    monkeypatch.setattr(event_broker, "subscribe", subscribe_and_notify)
+
+    resp = test_client.get(f"/posts/{post_id}/events")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert resp.headers["x-accel-buffering"] == "no"
+    assert f"event: vote\ndata: {payload}\n\n" in resp.text
+    # Unsubscribed once the stream ended
+    assert event_broker.subscriber_count == 0
+
+
+def test_stream_post_events_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    event_broker: EventBroker,
+):
+    mock_conn.fetchval.return_value = None
+
+    resp = test_client.get(f"/posts/{uuid7.create()}/events")
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert event_broker.subscriber_count == 0
+
+
+def test_stream_post_events_database_unavailable(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    event_broker: EventBroker,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    mock_conn.fetchval.return_value = 1
+    monkeypatch.setattr(
+        event_broker, "_listen", AsyncMock(side_effect=ConnectionRefusedError())
+    )
+
+    resp = test_client.get(f"/posts/{uuid7.create()}/events")
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
@@ -1,14 +1,185 @@
 from __future__ import annotations
 
+import asyncio
 import typing
+from unittest.mock import AsyncMock, MagicMock
 
+import pytest
 from fastapi import status
 
 if typing.TYPE_CHECKING:
     from fastapi.testclient import TestClient
 
+    from app.config import Settings
+
 
 def test_get_health_check(test_client: TestClient):
     resp = test_client.get("/health")
     assert resp.status_code == status.HTTP_200_OK
     assert resp.json() == {"message": "ok"}
+
+
+def test_get_cache_stats(test_client: TestClient):
+    resp = test_client.get("/health/cache")
+    assert resp.status_code == status.HTTP_200_OK
+    assert {"hits", "misses", "evictions", "size"} <= resp.json().keys()
+
+
+def test_get_metrics(test_client: TestClient, mock_pool):
+    mock_pool.get_size.return_value = 4
+    mock_pool.get_idle_size.return_value = 3
+    mock_pool.get_max_size.return_value = 10
+    test_client.get("/health")
+    test_client.get("/posts/not-a-uuid")
+
+    resp = test_client.get("/metrics")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    # Requests are labelled by route template, not raw path
+    assert 'http_requests_total{method="GET",route="/health",status="200"} 1' in body
+    assert (
+        'http_requests_total{method="GET",route="/posts/{post_id}",status="422"} 1'
+        in body
+    )
+    assert 'http_request_duration_seconds_count{method="GET",route="/health"} 1' in body
+    # The /metrics request itself is still in flight while rendering
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1' in body
+    assert "db_pool_size 4" in body
+    assert "db_pool_idle_connections 3" in body
+    assert "db_pool_max_size 10" in body
+
+
+@pytest.fixture
+def probe_conn(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """The readiness probe's own connection (separate from `mock_conn`)."""
+    conn = AsyncMock()
+    conn.is_closed = MagicMock(return_value=False)
+    conn.terminate = MagicMock()
+    monkeypatch.setattr("app.readiness.asyncpg.connect", AsyncMock(return_value=conn))
+    return conn
+
+
+@pytest.fixture
+def idle_pool(mock_pool: MagicMock) -> MagicMock:
+    mock_pool.get_size.return_value = 4
+    mock_pool.get_idle_size.return_value = 3
+    mock_pool.get_max_size.return_value = 10
+    mock_pool.waiting = 0
+    mock_pool.recent_acquire_seconds.return_value = 0.001
+    return mock_pool
+
+
+def test_get_liveness(test_client: TestClient, mock_pool: MagicMock):
+    resp = test_client.get("/health/live")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"status": "alive"}
+    mock_pool.acquire.assert_not_called()
+
+
+def test_get_readiness_ready(
+    test_client: TestClient, idle_pool: MagicMock, probe_conn: AsyncMock
+):
+    resp = test_client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()
+    assert data["ready"] is True
+    assert data["reasons"] == []
+    assert data["database"]["ok"] is True
+    assert data["pool"] == {
+        "size": 4,
+        "in_use": 1,
+        "max_size": 10,
+        "utilization": 0.1,
+        "waiting": 0,
+        "acquire_p95_ms": 1.0,
+    }
+    # The ping uses the probe's own connection, never the request pool
+    probe_conn.fetchval.assert_awaited_once_with("SELECT 1")
+    idle_pool.acquire.assert_not_called()
+
+
+def test_get_readiness_database_down(
+    test_client: TestClient, idle_pool: MagicMock, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(
+        "app.readiness.asyncpg.connect",
+        AsyncMock(side_effect=ConnectionRefusedError()),
+    )
+
+    resp = test_client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    report = resp.json()["detail"]
+    assert report["ready"] is False
+    assert report["database"] == {"ok": False, "error": "ConnectionRefusedError"}
+    assert report["reasons"] == ["database unreachable"]
+
+
+def test_get_readiness_ping_timeout(
+    test_client: TestClient,
+    idle_pool: MagicMock,
+    probe_conn: AsyncMock,
+    settings: Settings,
+):
+    settings.readiness_db_timeout_seconds = 0.01
+
+    async def hang(*args):
+        await asyncio.sleep(1)
+
+    probe_conn.fetchval.side_effect = hang
+
+    resp = test_client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.json()["detail"]["database"] == {"ok": False, "error": "TimeoutError"}
+    # A connection stuck mid-query is dropped, and reopened by the next check
+    probe_conn.terminate.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    ("pool_state", "reason"),
+    [
+        ({"get_idle_size": 0, "get_size": 10}, None),
+        ({"waiting": 21}, "too many requests waiting for a connection"),
+        ({"recent_acquire_seconds": 0.5}, "pool acquire latency above threshold"),
+    ],
+)
+def test_get_readiness_pool_saturation(
+    test_client: TestClient,
+    idle_pool: MagicMock,
+    probe_conn: AsyncMock,
+    pool_state: dict,
+    reason: str | None,
+):
+    for name, value in pool_state.items():
+        if name == "waiting":
+            idle_pool.waiting = value
+        else:
+            getattr(idle_pool, name).return_value = value
+
+    resp = test_client.get("/health/ready")
+
+    if reason is None:
+        # A fully busy pool is normal under load, and not a reason to drain
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.json()["pool"]["utilization"] == 1.0
+    else:
+        assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert resp.json()["detail"]["reasons"] == [reason]
+
+
+def test_get_readiness_utilization_threshold(
+    test_client: TestClient,
+    idle_pool: MagicMock,
+    probe_conn: AsyncMock,
+    settings: Settings,
+):
+    settings.readiness_max_pool_utilization = 0.05
+
+    resp = test_client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.json()["detail"]["reasons"] == ["pool utilization above threshold"]
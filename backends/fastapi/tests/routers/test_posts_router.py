@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import copy
 import datetime
+import json
+import time
 import typing
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from uuid import UUID
 
 import pytest
@@ -11,9 +13,21 @@ import uuid7
 from fastapi import status
 from freezegun import freeze_time
 
+from app.cursors import (
+    decode_cursor,
+    decode_ranked_cursor,
+    encode_cursor,
+    encode_ranked_cursor,
+)
+from app.db import READ_PRIMARY_COOKIE, ReplicaSet, get_read_pool
+from app.models import MAX_BATCH_IDS
+from app.routers import posts as posts_router
+
 if typing.TYPE_CHECKING:
     from fastapi.testclient import TestClient
 
+    from app.cache import ResponseCache
+
 
 @freeze_time("2025-02-24")
 def _make_post_row(**kwargs) -> dict:
@@ -26,6 +40,8 @@ def _make_post_row(**kwargs) -> dict:
         "created_at": now,
         "updated_at": now,
         "vote_score": 0,
+        "comment_count": 0,
+        "last_comment_at": None,
     }
     row.update(kwargs)
     return row
@@ -72,7 +88,7 @@ def test_list_posts_full_page_sets_next_cursor(
 ):
     """/posts endpoint returns a page of posts.
 
-    A `next_cursor` ID matching the ID of the last post is available.
+    A `next_cursor` encoding the sort key of the last post is available.
     """
     rows = [_make_post_row() for _ in range(25)]
     mock_conn.fetch.return_value = rows
@@ -82,21 +98,29 @@ def test_list_posts_full_page_sets_next_cursor(
     assert resp.status_code == status.HTTP_200_OK
     data = resp.json()
     assert len(data["items"]) == 25
-    assert data["next_cursor"] == str(rows[-1]["id"])
+    assert decode_cursor(data["next_cursor"]) == (
+        rows[-1]["created_at"],
+        rows[-1]["id"],
+    )
 
 
 def test_list_posts_with_cursor(
     test_client: TestClient,
     mock_conn: AsyncMock,
 ):
-    cursor_id = uuid7.create()
+    cursor_row = _make_post_row()
+    cursor = encode_cursor(cursor_row["created_at"], cursor_row["id"])
     mock_conn.fetch.return_value = [_make_post_row()]
 
-    resp = test_client.get("/posts", params={"cursor": str(cursor_id)})
+    resp = test_client.get("/posts", params={"cursor": cursor})
 
     assert resp.status_code == status.HTTP_200_OK
-    # Cursor UUID is passed as first query parameter in the cursor-based query
-    assert mock_conn.fetch.call_args.args[1] == cursor_id
+    # The cursor's sort key is passed straight into the keyset query,
+    # so the row it came from is never looked up (and may no longer exist).
+    assert mock_conn.fetch.call_args.args[1:3] == (
+        cursor_row["created_at"],
+        cursor_row["id"],
+    )
     # NOTE we are not actually querying the data,
     # and the logic for returning data based on query resides in the database,
     # not this backend.
@@ -104,6 +128,230 @@ def test_list_posts_with_cursor(
     # there is no need to assert the response here.
 
 
+def test_list_posts_not_modified(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    mock_conn.fetch.return_value = [_make_post_row()]
+
+    etag = test_client.get("/posts").headers["etag"]
+    resp = test_client.get("/posts", headers={"If-None-Match": etag})
+
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.content == b""
+
+
+def test_list_posts_invalid_cursor(test_client: TestClient):
+    resp = test_client.get("/posts", params={"cursor": "not-a-cursor"})
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize(
+    ("sort", "order_by"),
+    [
+        ("old", "ORDER BY created_at ASC, id ASC"),
+        ("new", "ORDER BY created_at DESC, id DESC"),
+        ("hot", "ORDER BY hot_rank DESC, id DESC"),
+        ("top", "ORDER BY vote_score DESC, id DESC"),
+    ],
+)
+def test_list_posts_sort(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    sort: str,
+    order_by: str,
+):
+    mock_conn.fetch.return_value = [_make_post_row()]
+
+    resp = test_client.get("/posts", params={"sort": sort})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert order_by in mock_conn.fetch.call_args.args[0]
+
+
+def test_list_posts_invalid_sort(test_client: TestClient):
+    resp = test_client.get("/posts", params={"sort": "best"})
+
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_list_posts_new_with_cursor(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    rows = [_make_post_row() for _ in range(25)]
+    mock_conn.fetch.return_value = rows
+
+    first = test_client.get("/posts", params={"sort": "new"}).json()
+    resp = test_client.get(
+        "/posts", params={"sort": "new", "cursor": first["next_cursor"]}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert "(created_at, id) < ($1, $2)" in mock_conn.fetch.call_args.args[0]
+    assert mock_conn.fetch.call_args.args[1:3] == (
+        rows[-1]["created_at"],
+        rows[-1]["id"],
+    )
+
+
+@pytest.mark.parametrize("sort", ["hot", "top"])
+def test_list_posts_ranked_full_page_sets_next_cursor(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    sort: str,
+):
+    rows = [_make_post_row(vote_score=100 - i) for i in range(25)]
+    mock_conn.fetch.return_value = rows
+
+    resp = test_client.get("/posts", params={"sort": sort})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert decode_ranked_cursor(resp.json()["next_cursor"], sort) == (
+        rows[-1]["vote_score"],
+        rows[-1]["created_at"],
+        rows[-1]["id"],
+    )
+
+
+def test_list_posts_hot_with_cursor(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    cursor_row = _make_post_row(vote_score=-3)
+    cursor = encode_ranked_cursor(
+        "hot", cursor_row["vote_score"], cursor_row["created_at"], cursor_row["id"]
+    )
+    mock_conn.fetch.return_value = [_make_post_row()]
+
+    resp = test_client.get("/posts", params={"sort": "hot", "cursor": cursor})
+
+    assert resp.status_code == status.HTTP_200_OK
+    # The rank is recomputed from the cursor rather than looked up
+    assert "post_hot_rank($1, $2)" in mock_conn.fetch.call_args.args[0]
+    assert mock_conn.fetch.call_args.args[1:4] == (
+        cursor_row["vote_score"],
+        cursor_row["created_at"],
+        cursor_row["id"],
+    )
+
+
+def test_list_posts_top_with_cursor(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    cursor_row = _make_post_row(vote_score=7)
+    cursor = encode_ranked_cursor(
+        "top", cursor_row["vote_score"], cursor_row["created_at"], cursor_row["id"]
+    )
+    mock_conn.fetch.return_value = [_make_post_row()]
+
+    resp = test_client.get("/posts", params={"sort": "top", "cursor": cursor})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert mock_conn.fetch.call_args.args[1:3] == (
+        cursor_row["vote_score"],
+        cursor_row["id"],
+    )
+
+
+@pytest.mark.parametrize(
+    ("sort", "cursor_feed"),
+    [("hot", "top"), ("top", "hot"), ("old", "hot"), ("hot", None)],
+)
+def test_list_posts_cursor_from_other_sort(
+    test_client: TestClient,
+    sort: str,
+    cursor_feed: str | None,
+):
+    row = _make_post_row()
+    if cursor_feed is None:
+        cursor = encode_cursor(row["created_at"], row["id"])
+    else:
+        cursor = encode_ranked_cursor(
+            cursor_feed, row["vote_score"], row["created_at"], row["id"]
+        )
+
+    resp = test_client.get("/posts", params={"sort": sort, "cursor": cursor})
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json()["detail"] == "Invalid cursor"
+
+
+def test_list_posts_pages_cached_per_sort(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    mock_conn.fetch.return_value = [_make_post_row()]
+
+    test_client.get("/posts", params={"sort": "hot"})
+    test_client.get("/posts", params={"sort": "top"})
+    test_client.get("/posts", params={"sort": "hot"})
+
+    assert mock_conn.fetch.await_count == 2
+
+
+def test_list_posts_by_ids_in_request_order(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    first, second = _make_post_row(), _make_post_row()
+    missing = uuid7.create()
+    # Rows come back in whatever order Postgres finds them
+    mock_conn.fetch.return_value = [first, second]
+
+    resp = test_client.get(
+        "/posts", params={"ids": f"{second['id']},{missing},{first['id']}"}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    items = resp.json()["items"]
+    assert [item and item["id"] for item in items] == [
+        str(second["id"]),
+        None,
+        str(first["id"]),
+    ]
+    assert "next_cursor" not in resp.json()
+    assert "etag" in resp.headers
+    mock_conn.fetch.assert_awaited_once()
+    assert "ANY($1::uuid[])" in mock_conn.fetch.await_args.args[0]
+
+
+def test_list_posts_by_repeated_ids(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    row = _make_post_row()
+    mock_conn.fetch.return_value = [row]
+
+    resp = test_client.get("/posts", params=[("ids", str(row["id"]))] * 2)
+
+    assert [item["id"] for item in resp.json()["items"]] == [str(row["id"])] * 2
+
+
+@pytest.mark.parametrize(
+    "ids",
+    [
+        pytest.param("not-a-uuid", id="malformed"),
+        pytest.param(
+            ",".join(str(uuid7.create()) for _ in range(MAX_BATCH_IDS + 1)),
+            id="too-many",
+        ),
+    ],
+)
+def test_list_posts_by_ids_invalid(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    ids: str,
+):
+    resp = test_client.get("/posts", params={"ids": ids})
+
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    mock_conn.fetch.assert_not_awaited()
+
+
 # === POST /posts ===
 
 
@@ -133,6 +381,7 @@ def test_create_post(
         return copied
 
     mock_conn.fetchrow.side_effect = _side_effect
+    mock_conn.fetchval.return_value = 1
 
     resp = test_client.post(
         "/posts",
@@ -151,6 +400,26 @@ def test_create_post(
     assert data["author"] == "alice"
 
 
+def test_create_post_counts_auto_upvote(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """The author's auto-upvote, applied by triggers after RETURNING, is reported."""
+    row = _make_post_row(vote_score=0)
+    mock_conn.fetchrow.return_value = row
+    mock_conn.fetchval.return_value = 1
+
+    resp = test_client.post(
+        "/posts", json={"title": "t", "body": "b", "author": "alice"}
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert resp.json()["vote_score"] == 1
+    query, post_id = mock_conn.fetchval.call_args.args
+    assert "pending_vote_delta('Post', id)" in query
+    assert post_id == row["id"]
+
+
 def test_create_post_without_title(
     test_client: TestClient,
     mock_conn: AsyncMock,
@@ -218,6 +487,134 @@ def test_get_post(
     assert resp.json()["id"] == str(post_id)
 
 
+def test_get_post_served_from_cache(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Repeated reads of the same Post only reach the database once."""
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+
+    first = test_client.get(f"/posts/{row['id']}")
+    second = test_client.get(f"/posts/{row['id']}")
+
+    assert first.status_code == second.status_code == status.HTTP_200_OK
+    assert first.json() == second.json()
+    assert mock_conn.fetchrow.await_count == 1
+
+
+def test_get_post_skips_cache_after_a_write(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """A client in its read-your-writes window always reads the database."""
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+    test_client.get(f"/posts/{row['id']}")
+
+    test_client.cookies[READ_PRIMARY_COOKIE] = str(time.time() + 5)
+    resp = test_client.get(f"/posts/{row['id']}")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert mock_conn.fetchrow.await_count == 2
+
+
+def test_replica_reads_are_not_cached(
+    test_client: TestClient,
+    mock_pool: MagicMock,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    """A lagging replica's result could outlive the write that invalidated it."""
+    replicas = ReplicaSet(mock_pool, [mock_pool], retry_seconds=5)
+    test_client.app.dependency_overrides[get_read_pool] = lambda: replicas
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+    mock_conn.fetch.return_value = [row]
+
+    for _ in range(2):
+        test_client.get(f"/posts/{row['id']}")
+        test_client.get("/posts")
+
+    assert mock_conn.fetchrow.await_count == mock_conn.fetch.await_count == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_get_post_not_modified(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """A client revalidating with the current ETag gets an empty 304."""
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+
+    first = test_client.get(f"/posts/{row['id']}")
+    etag = first.headers["etag"]
+    second = test_client.get(f"/posts/{row['id']}", headers={"If-None-Match": etag})
+
+    assert first.headers["cache-control"] == "public, max-age=1"
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_get_post_etag_changes_with_votes(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+    etag = test_client.get(f"/posts/{row['id']}").headers["etag"]
+
+    cache.clear()
+    mock_conn.fetchrow.return_value = {**row, "vote_score": 2}
+    resp = test_client.get(f"/posts/{row['id']}", headers={"If-None-Match": etag})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["etag"] != etag
+    assert resp.json()["vote_score"] == 2
+
+
+def test_get_post_etag_changes_with_comments(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    cache: ResponseCache,
+):
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+    etag = test_client.get(f"/posts/{row['id']}").headers["etag"]
+
+    cache.clear()
+    mock_conn.fetchrow.return_value = {
+        **row,
+        "comment_count": 1,
+        "last_comment_at": datetime.datetime.now(datetime.UTC),
+    }
+    resp = test_client.get(f"/posts/{row['id']}", headers={"If-None-Match": etag})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["comment_count"] == 1
+
+
+def test_update_post_invalidates_cache(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """After a PATCH, the next read goes back to the database."""
+    row = _make_post_row()
+    mock_conn.fetchrow.return_value = row
+    test_client.get(f"/posts/{row['id']}")
+
+    updated = {**row, "body": "Updated body"}
+    mock_conn.fetchrow.return_value = updated
+    test_client.patch(f"/posts/{row['id']}", json={"body": "Updated body"})
+    resp = test_client.get(f"/posts/{row['id']}")
+
+    assert resp.json()["body"] == "Updated body"
+    assert mock_conn.fetchrow.await_count == 3
+
+
 def test_get_post_not_found(test_client: TestClient, mock_conn: AsyncMock):
     """Returns 404 if nothing was returned from the database."""
     mock_conn.fetchrow.return_value = None
@@ -245,6 +642,93 @@ def test_get_post_invalid_uuid(
     assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
 
 
+# === GET /posts/{post_id}/export ===
+
+
+class _Cursor:
+    """Stands in for an asyncpg cursor, recording the `prefetch` it was opened with."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.prefetch = None
+
+    def __call__(self, query: str, *args, prefetch: int | None = None):
+        self.prefetch = prefetch
+        return self
+
+    async def __aiter__(self):
+        for row in self.rows:
+            yield row
+
+
+def _make_comment_row(post_id: UUID, depth: int, **kwargs) -> dict:
+    row = _make_post_row(post_id=post_id, parent_comment_id=None, depth=depth)
+    for key in ("title", "comment_count", "last_comment_at"):
+        del row[key]
+    row.update(kwargs)
+    return row
+
+
+def test_export_post(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(posts_router, "EXPORT_BATCH_SIZE", 2)
+    post = _make_post_row()
+    top = _make_comment_row(post["id"], 0)
+    comments = [
+        top,
+        _make_comment_row(post["id"], 1, parent_comment_id=top["id"]),
+        _make_comment_row(post["id"], 0),
+    ]
+    mock_conn.fetchrow.return_value = post
+    mock_conn.cursor = _Cursor(comments)
+
+    resp = test_client.get(f"/posts/{post['id']}/export")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["type"] for line in lines] == ["post", "comment", "comment", "comment"]
+    assert lines[0]["id"] == str(post["id"])
+    # In the order the cursor returned them (tree order, by path)
+    assert [line["id"] for line in lines[1:]] == [str(c["id"]) for c in comments]
+    assert lines[2]["parent_comment_id"] == str(top["id"])
+    assert mock_conn.cursor.prefetch == 2
+    # One consistent snapshot of the thread
+    mock_conn.transaction.assert_called_once_with(
+        isolation="repeatable_read", readonly=True
+    )
+
+
+def test_export_post_without_comments(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    post = _make_post_row()
+    mock_conn.fetchrow.return_value = post
+    mock_conn.cursor = _Cursor([])
+
+    resp = test_client.get(f"/posts/{post['id']}/export")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert [json.loads(line)["type"] for line in resp.text.splitlines()] == ["post"]
+
+
+def test_export_post_not_found(
+    test_client: TestClient, mock_pool: MagicMock, mock_conn: AsyncMock
+):
+    mock_conn.fetchrow.return_value = None
+
+    resp = test_client.get(f"/posts/{uuid7.create()}/export")
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Post not found"
+    # The connection is released before the 404 goes out
+    mock_pool.acquire.return_value.__aexit__.assert_awaited_once()
+
+
 # === PATCH /posts/{post_id} ===
 
 
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import datetime
+import typing
+
+import pytest
+import uuid7
+from fastapi import status
+
+from app.cursors import decode_search_cursor, encode_cursor, encode_search_cursor
+from app.routers.search import MAX_QUERY_LENGTH, PAGE_SIZE
+
+if typing.TYPE_CHECKING:
+    from unittest.mock import AsyncMock
+
+    from fastapi.testclient import TestClient
+
+
+def _make_result_row(**kwargs) -> dict:
+    post_id = uuid7.create()
+    row = {
+        "object_type": "Post",
+        "id": post_id,
+        "post_id": post_id,
+        "title": "Test Title",
+        "author": "testuser",
+        "created_at": datetime.datetime(2025, 2, 24, tzinfo=datetime.UTC),
+        "rank": 0.0607927,
+        "snippet": "a <mark>test</mark> body",
+    }
+    row.update(kwargs)
+    return row
+
+
+def test_search(test_client: TestClient, mock_conn: AsyncMock):
+    row = _make_result_row()
+    mock_conn.fetch.return_value = [row]
+
+    resp = test_client.get("/search", params={"q": "test"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()
+    assert data["items"][0]["id"] == str(row["id"])
+    assert data["items"][0]["snippet"] == row["snippet"]
+    assert data["next_cursor"] is None
+    # query, object_type, author, cursor rank, cursor id, page size
+    assert mock_conn.fetch.call_args.args[1:] == (
+        "test",
+        None,
+        None,
+        None,
+        None,
+        PAGE_SIZE,
+    )
+
+
+def test_search_filters(test_client: TestClient, mock_conn: AsyncMock):
+    mock_conn.fetch.return_value = []
+
+    resp = test_client.get(
+        "/search",
+        params={"q": "test", "object_type": "Comment", "author": "alice"},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert mock_conn.fetch.call_args.args[2:4] == ("Comment", "alice")
+
+
+def test_search_full_page_sets_next_cursor(
+    test_client: TestClient, mock_conn: AsyncMock
+):
+    rows = [_make_result_row(rank=1.0 / (n + 1)) for n in range(PAGE_SIZE)]
+    mock_conn.fetch.return_value = rows
+
+    resp = test_client.get("/search", params={"q": "test"})
+
+    rank, item_id = decode_search_cursor(resp.json()["next_cursor"])
+    assert item_id == rows[-1]["id"]
+    # float4 precision, which is what the database ranks with
+    assert rank == pytest.approx(rows[-1]["rank"], rel=1e-6)
+
+
+def test_search_with_cursor(test_client: TestClient, mock_conn: AsyncMock):
+    item_id = uuid7.create()
+    mock_conn.fetch.return_value = []
+
+    resp = test_client.get(
+        "/search",
+        params={"q": "test", "cursor": encode_search_cursor(0.5, item_id)},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert mock_conn.fetch.call_args.args[4:6] == (0.5, item_id)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"q": ""},
+        {"q": "x" * (MAX_QUERY_LENGTH + 1)},
+        {"q": "test", "object_type": "Vote"},
+    ],
+)
+def test_search_invalid_params(test_client: TestClient, params: dict):
+    resp = test_client.get("/search", params=params)
+
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_search_invalid_cursor(test_client: TestClient):
+    cursor = encode_cursor(datetime.datetime.now(datetime.UTC), uuid7.create())
+
+    resp = test_client.get("/search", params={"q": "test", "cursor": cursor})
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import typing
+
+import uuid7
+from fastapi import status
+
+from app.cursors import decode_vote_cursor, encode_search_cursor, encode_vote_cursor
+from app.routers.users import PAGE_SIZE
+
+if typing.TYPE_CHECKING:
+    from unittest.mock import AsyncMock
+
+    from fastapi.testclient import TestClient
+
+
+def _make_vote_row(**kwargs) -> dict:
+    row = {"object_type": "Post", "object_id": uuid7.create(), "value": 1}
+    row.update(kwargs)
+    return row
+
+
+def test_list_user_votes(test_client: TestClient, mock_conn: AsyncMock):
+    rows = [_make_vote_row(), _make_vote_row(object_type="Comment", value=-1)]
+    mock_conn.fetch.return_value = rows
+
+    resp = test_client.get("/users/alice/votes")
+
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()
+    assert data["items"] == [
+        {"object_type": "Post", "object_id": str(rows[0]["object_id"]), "value": 1},
+        {
+            "object_type": "Comment",
+            "object_id": str(rows[1]["object_id"]),
+            "value": -1,
+        },
+    ]
+    assert data["next_cursor"] is None
+    assert mock_conn.fetch.call_args.args[1:] == ("alice", PAGE_SIZE)
+
+
+def test_list_user_votes_full_page_sets_next_cursor(
+    test_client: TestClient, mock_conn: AsyncMock
+):
+    rows = [_make_vote_row() for _ in range(PAGE_SIZE)]
+    mock_conn.fetch.return_value = rows
+
+    resp = test_client.get("/users/alice/votes")
+
+    assert decode_vote_cursor(resp.json()["next_cursor"]) == (
+        rows[-1]["object_id"],
+        "Post",
+    )
+
+
+def test_list_user_votes_with_cursor(test_client: TestClient, mock_conn: AsyncMock):
+    object_id = uuid7.create()
+    mock_conn.fetch.return_value = []
+
+    resp = test_client.get(
+        "/users/alice/votes",
+        params={"cursor": encode_vote_cursor(object_id, "Comment")},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"items": [], "next_cursor": None}
+    assert mock_conn.fetch.call_args.args[1:] == (
+        "alice",
+        object_id,
+        "Comment",
+        PAGE_SIZE,
+    )
+
+
+def test_list_user_votes_invalid_cursor(test_client: TestClient):
+    cursor = encode_search_cursor(0.5, uuid7.create())
+
+    resp = test_client.get("/users/alice/votes", params={"cursor": cursor})
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json()["detail"] == "Invalid cursor"
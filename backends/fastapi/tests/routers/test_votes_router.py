@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import typing
+
+import uuid7
+from fastapi import status
+
+if typing.TYPE_CHECKING:
+    from unittest.mock import AsyncMock
+
+    from fastapi.testclient import TestClient
+
+    from app.vote_buffer import VoteBuffer
+
+
+# === POST /posts/{post_id}/vote ===
+
+
+def test_vote_on_post(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Voting on a Post is a single `cast_vote` call returning the new score."""
+    post_id = uuid7.create()
+    mock_conn.fetchval.return_value = 2
+
+    resp = test_client.post(
+        f"/posts/{post_id}/vote", json={"username": "alice", "value": 1}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "object_id": str(post_id),
+        "object_type": "Post",
+        "vote_score": 2,
+    }
+    query, *args = mock_conn.fetchval.call_args.args
+    assert "cast_vote" in query
+    assert args == ["alice", "Post", post_id, 1, None]
+    assert mock_conn.fetchval.await_count == 1
+
+
+def test_vote_on_post_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """`cast_vote` returns NULL when the Post does not exist."""
+    mock_conn.fetchval.return_value = None
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/vote", json={"username": "alice", "value": 1}
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Post not found"
+
+
+def test_vote_on_post_write_behind(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    vote_buffer: VoteBuffer,
+):
+    """With write-behind on, the vote is buffered and the last written score returned."""
+    vote_buffer.enabled = True
+    post_id = uuid7.create()
+    mock_conn.fetchval.return_value = 7
+
+    resp = test_client.post(
+        f"/posts/{post_id}/vote", json={"username": "alice", "value": -1}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["vote_score"] == 7
+    assert "cast_vote" not in mock_conn.fetchval.call_args.args[0]
+    mock_conn.execute.assert_not_awaited()
+    assert vote_buffer._pending == {(post_id, "Post", "alice"): -1}
+
+
+def test_vote_on_comment_write_behind_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    vote_buffer: VoteBuffer,
+):
+    vote_buffer.enabled = True
+    mock_conn.fetchval.return_value = None
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments/{uuid7.create()}/vote",
+        json={"username": "alice", "value": 1},
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Comment not found"
+    assert len(vote_buffer) == 0
+
+
+def test_vote_write_behind_full_buffer_unavailable(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+    vote_buffer: VoteBuffer,
+):
+    """A full buffer that cannot be flushed to make room rejects the vote with 503."""
+    vote_buffer.enabled = True
+    vote_buffer.settings.votes_buffer_max_entries = 1
+    vote_buffer._pending[(uuid7.create(), "Post", "bob")] = 1
+    mock_conn.fetchval.return_value = 7
+    mock_conn.execute.side_effect = OSError("connection refused")
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/vote", json={"username": "alice", "value": 1}
+    )
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert len(vote_buffer) == 1
+
+
+def test_vote_invalid_value(test_client: TestClient):
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/vote", json={"username": "alice", "value": 2}
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+# === POST /posts/{post_id}/comments/{comment_id}/vote ===
+
+
+def test_vote_on_comment(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Voting on a Comment also passes the Post ID, so the comment must belong to it."""
+    post_id = uuid7.create()
+    comment_id = uuid7.create()
+    mock_conn.fetchval.return_value = 0
+
+    resp = test_client.post(
+        f"/posts/{post_id}/comments/{comment_id}/vote",
+        json={"username": "alice", "value": -1},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["vote_score"] == 0
+    _, *args = mock_conn.fetchval.call_args.args
+    assert args == ["alice", "Comment", comment_id, -1, post_id]
+
+
+def test_vote_on_comment_not_found(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    mock_conn.fetchval.return_value = None
+
+    resp = test_client.post(
+        f"/posts/{uuid7.create()}/comments/{uuid7.create()}/vote",
+        json={"username": "alice", "value": 0},
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Comment not found"
+
+
+# === POST /votes/batch ===
+
+
+def test_vote_batch(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """A batch of votes is applied in one statement and returns each object's score."""
+    post_id = uuid7.create()
+    comment_id = uuid7.create()
+    mock_conn.fetch.side_effect = [
+        # No missing targets
+        [],
+        # New scores, in request order
+        [
+            {"object_type": "Post", "object_id": post_id, "vote_score": 3},
+            {"object_type": "Comment", "object_id": comment_id, "vote_score": -1},
+        ],
+    ]
+
+    resp = test_client.post(
+        "/votes/batch",
+        json={
+            "votes": [
+                {
+                    "object_type": "Post",
+                    "object_id": str(post_id),
+                    "username": "alice",
+                    "value": 1,
+                },
+                {
+                    "object_type": "Comment",
+                    "object_id": str(comment_id),
+                    "username": "alice",
+                    "value": -1,
+                },
+                {
+                    "object_type": "Post",
+                    "object_id": str(post_id),
+                    "username": "bob",
+                    "value": 1,
+                },
+            ]
+        },
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["items"] == [
+        {"object_type": "Post", "object_id": str(post_id), "vote_score": 3},
+        {"object_type": "Comment", "object_id": str(comment_id), "vote_score": -1},
+    ]
+    # Validation and score lookup each receive the distinct targets only
+    validate_args = mock_conn.fetch.call_args_list[0].args
+    assert validate_args[1] == ["Post", "Comment"]
+    assert validate_args[2] == [post_id, comment_id]
+    # All writes go through a single statement
+    assert mock_conn.execute.await_count == 1
+
+
+def test_vote_batch_last_write_wins(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """Repeated votes by the same user on the same object collapse to the last one."""
+    post_id = uuid7.create()
+    mock_conn.fetch.side_effect = [
+        [],
+        [{"object_type": "Post", "object_id": post_id, "vote_score": 0}],
+    ]
+
+    resp = test_client.post(
+        "/votes/batch",
+        json={
+            "votes": [
+                {
+                    "object_type": "Post",
+                    "object_id": str(post_id),
+                    "username": "alice",
+                    "value": value,
+                }
+                for value in (1, -1, 0)
+            ]
+        },
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    _, object_types, object_ids, voters, values = mock_conn.execute.call_args.args
+    assert object_types == ["Post"]
+    assert object_ids == [post_id]
+    assert voters == ["alice"]
+    assert values == [0]
+
+
+def test_vote_batch_missing_target(
+    test_client: TestClient,
+    mock_conn: AsyncMock,
+):
+    """If any target does not exist, the batch 404s and nothing is written."""
+    post_id = uuid7.create()
+    mock_conn.fetch.return_value = [{"object_type": "Post", "object_id": post_id}]
+
+    resp = test_client.post(
+        "/votes/batch",
+        json={
+            "votes": [
+                {
+                    "object_type": "Post",
+                    "object_id": str(post_id),
+                    "username": "alice",
+                    "value": 1,
+                }
+            ]
+        },
+    )
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == [
+        {"object_type": "Post", "object_id": str(post_id), "msg": "Post not found"}
+    ]
+    mock_conn.execute.assert_not_awaited()
+
+
+def test_vote_batch_empty(test_client: TestClient):
+    """An empty batch is a validation error."""
+    resp = test_client.post("/votes/batch", json={"votes": []})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_vote_batch_invalid_object_type(test_client: TestClient):
+    """Only Posts and Comments can be voted on."""
+    resp = test_client.post(
+        "/votes/batch",
+        json={
+            "votes": [
+                {
+                    "object_type": "User",
+                    "object_id": str(uuid7.create()),
+                    "username": "alice",
+                    "value": 1,
+                }
+            ]
+        },
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
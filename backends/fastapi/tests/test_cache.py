@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import pytest
+import uuid7
+
+from app import cache as cache_module
+from app.cache import POST_KEY, POST_PAGE_KEY, ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """A controllable stand-in for `time.monotonic`; set `clock[0]` to move time."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_set_counts_hits_and_misses():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+
+    assert cache.get(("a",)) is None
+    cache.set(("a",), 1)
+    assert cache.get(("a",)) == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_lru_eviction():
+    """The least recently *used* entry is evicted first, not the oldest stored."""
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    # Touch "a" so "b" becomes least recently used
+    cache.get(("a",))
+    cache.set(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry(clock: list[float]):
+    cache = ResponseCache(max_entries=10, ttl_seconds=5)
+    cache.set(("a",), 1)
+
+    clock[0] += 4.9
+    assert cache.get(("a",)) == 1
+
+    clock[0] += 0.2
+    assert cache.get(("a",)) is None
+    assert cache.expirations == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_disabled_cache_never_stores():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, enabled=False)
+    cache.set(("a",), 1)
+
+    assert cache.get(("a",)) is None
+    assert cache.stats()["size"] == 0
+    # Lookups are not counted as misses when caching is off
+    assert cache.misses == 0
+
+
+def test_invalidate_post_drops_post_and_all_pages():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    p1, p2 = uuid7.create(), uuid7.create()
+    cache.set((POST_KEY, p1), "post 1")
+    cache.set((POST_KEY, p2), "post 2")
+    cache.set((POST_PAGE_KEY, None), "first page")
+    cache.set((POST_PAGE_KEY, "cursor"), "second page")
+
+    cache.invalidate_post(p1)
+
+    assert cache.get((POST_KEY, p1)) is None
+    assert cache.get((POST_PAGE_KEY, None)) is None
+    assert cache.get((POST_PAGE_KEY, "cursor")) is None
+    assert cache.get((POST_KEY, p2)) == "post 2"
+
+
+def test_set_skipped_after_concurrent_invalidation():
+    """A value read before a write landed is not cached once the write invalidates."""
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    post_id = uuid7.create()
+    generation = cache.generation
+
+    cache.invalidate_post(post_id)
+    cache.set((POST_KEY, post_id), "stale", generation)
+
+    assert cache.get((POST_KEY, post_id)) is None
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import base64
+import datetime
+import struct
+
+import pytest
+import uuid7
+from fastapi import HTTPException
+
+from app.cursors import (
+    decode_cursor,
+    decode_ranked_cursor,
+    decode_search_cursor,
+    decode_vote_cursor,
+    encode_cursor,
+    encode_ranked_cursor,
+    encode_search_cursor,
+    encode_vote_cursor,
+)
+
+
+def test_round_trip():
+    created_at = datetime.datetime(2025, 2, 24, 12, 30, 1, 123456, tzinfo=datetime.UTC)
+    item_id = uuid7.create()
+
+    cursor = encode_cursor(created_at, item_id)
+
+    assert decode_cursor(cursor) == (created_at, item_id)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime.datetime.now(datetime.UTC), uuid7.create())
+    assert cursor.replace("-", "").replace("_", "").isalnum()
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not-a-cursor",
+        # A bare UUID, as older versions of the API returned
+        str(uuid7.create()),
+        # Well-formed, but from an unknown future version
+        base64.urlsafe_b64encode(b"\x02" + b"\x00" * 24).decode().rstrip("="),
+    ],
+)
+def test_invalid_cursor(cursor: str):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("vote_score", [-(2**31), -1, 0, 42, 2**31 - 1])
+@pytest.mark.parametrize("feed", ["hot", "top"])
+def test_ranked_round_trip(feed: str, vote_score: int):
+    created_at = datetime.datetime(2025, 2, 24, 12, 30, 1, 123456, tzinfo=datetime.UTC)
+    item_id = uuid7.create()
+
+    cursor = encode_ranked_cursor(feed, vote_score, created_at, item_id)
+
+    assert decode_ranked_cursor(cursor, feed) == (vote_score, created_at, item_id)
+
+
+def test_ranked_cursor_is_bound_to_its_feed():
+    now = datetime.datetime.now(datetime.UTC)
+    cursor = encode_ranked_cursor("hot", 1, now, uuid7.create())
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_ranked_cursor(cursor, "top")
+    assert exc_info.value.status_code == 400
+
+
+def test_cursor_versions_are_not_interchangeable():
+    now = datetime.datetime.now(datetime.UTC)
+    item_id = uuid7.create()
+
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_ranked_cursor("hot", 1, now, item_id))
+    with pytest.raises(HTTPException):
+        decode_ranked_cursor(encode_cursor(now, item_id), "hot")
+
+
+@pytest.mark.parametrize("rank", [0.0, 1e-20, 0.0607927, 1.0, 123.5])
+def test_search_round_trip(rank: float):
+    # Ranks are float4 in the database; those round-trip exactly
+    rank = struct.unpack(">f", struct.pack(">f", rank))[0]
+    item_id = uuid7.create()
+
+    assert decode_search_cursor(encode_search_cursor(rank, item_id)) == (rank, item_id)
+
+
+def test_search_cursor_rejects_other_versions():
+    with pytest.raises(HTTPException):
+        decode_search_cursor(
+            encode_cursor(datetime.datetime.now(datetime.UTC), uuid7.create())
+        )
+
+
+@pytest.mark.parametrize("object_type", ["Post", "Comment"])
+def test_vote_round_trip(object_type: str):
+    object_id = uuid7.create()
+
+    cursor = encode_vote_cursor(object_id, object_type)
+
+    assert decode_vote_cursor(cursor) == (object_id, object_type)
+
+
+def test_vote_cursor_rejects_other_versions_and_types():
+    with pytest.raises(HTTPException):
+        decode_vote_cursor(encode_search_cursor(0.5, uuid7.create()))
+    unknown_type = struct.pack(">B16sB", 4, uuid7.create().bytes, 9)
+    with pytest.raises(HTTPException):
+        decode_vote_cursor(base64.urlsafe_b64encode(unknown_type).decode("ascii"))
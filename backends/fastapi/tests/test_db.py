@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import db
+from app.cache import get_cache
+from app.db import READ_PRIMARY_COOKIE, ReplicaSet, get_pool, get_read_pool
+from app.main import get_app
+from app.singleflight import get_singleflight
+
+
+def _pool(name: str, error: Exception | None = None) -> MagicMock:
+    """A pool whose `acquire()` yields `name` as the connection, or raises `error`."""
+    ctx = AsyncMock()
+    if error is not None:
+        ctx.__aenter__.side_effect = error
+    else:
+        ctx.__aenter__.return_value = name
+    pool = MagicMock()
+    pool.acquire.return_value = ctx
+    return pool
+
+
+async def _acquire(pool) -> str:
+    async with pool.acquire() as conn:
+        return conn
+
+
+def _request(cookies: dict[str, str] | None = None) -> Request:
+    header = "; ".join(f"{k}={v}" for k, v in (cookies or {}).items())
+    headers = [(b"cookie", header.encode())] if header else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_replicas_are_used_round_robin():
+    replicas = ReplicaSet(_pool("primary"), [_pool("a"), _pool("b")], retry_seconds=5)
+
+    conns = [asyncio.run(_acquire(replicas)) for _ in range(4)]
+
+    assert conns == ["a", "b", "a", "b"]
+
+
+def test_replica_down_falls_back_and_is_skipped():
+    down = _pool("a", error=ConnectionRefusedError())
+    replicas = ReplicaSet(_pool("primary"), [down, _pool("b")], retry_seconds=5)
+
+    conns = [asyncio.run(_acquire(replicas)) for _ in range(3)]
+
+    assert conns == ["b", "b", "b"]
+    # Skipped until its retry time passes, instead of being tried on every request
+    assert down.acquire.call_count == 1
+
+
+def test_all_replicas_down_falls_back_to_primary():
+    replicas = ReplicaSet(
+        _pool("primary"), [_pool("a", error=OSError())], retry_seconds=5
+    )
+
+    assert asyncio.run(_acquire(replicas)) == "primary"
+
+
+def test_replica_is_retried_after_retry_seconds(monkeypatch: pytest.MonkeyPatch):
+    now = [1000.0]
+    monkeypatch.setattr(db.time, "monotonic", lambda: now[0])
+    flaky = _pool("a", error=OSError())
+    replicas = ReplicaSet(_pool("primary"), [flaky], retry_seconds=5)
+    assert asyncio.run(_acquire(replicas)) == "primary"
+
+    flaky.acquire.return_value = _pool("a").acquire.return_value
+    now[0] += 6
+
+    assert asyncio.run(_acquire(replicas)) == "a"
+
+
+def test_query_errors_are_not_masked_by_fallback():
+    replicas = ReplicaSet(
+        _pool("primary"), [_pool("a", error=ValueError("bug"))], retry_seconds=5
+    )
+
+    with pytest.raises(ValueError, match="bug"):
+        asyncio.run(_acquire(replicas))
+
+
+@pytest.fixture
+def read_pool(monkeypatch: pytest.MonkeyPatch) -> ReplicaSet:
+    replicas = ReplicaSet(_pool("primary"), [_pool("a")], retry_seconds=5)
+    monkeypatch.setattr(db, "_read_pool", replicas)
+    return replicas
+
+
+def test_get_read_pool_without_replicas_is_primary(monkeypatch: pytest.MonkeyPatch):
+    primary = _pool("primary")
+    monkeypatch.setattr(db, "_read_pool", ReplicaSet(primary, [], retry_seconds=5))
+
+    assert get_read_pool(_request()) is primary
+
+
+def test_get_read_pool_read_your_writes(settings, read_pool: ReplicaSet):
+    settings.db_read_your_writes_seconds = 5
+    fresh = {READ_PRIMARY_COOKIE: str(time.time() + 5)}
+    expired = {READ_PRIMARY_COOKIE: str(time.time() - 1)}
+
+    assert get_read_pool(_request()) is read_pool
+    assert get_read_pool(_request(fresh)) is read_pool.primary
+    assert get_read_pool(_request(expired)) is read_pool
+    assert get_read_pool(_request({READ_PRIMARY_COOKIE: "junk"})) is read_pool
+
+    settings.db_read_your_writes_seconds = 0
+    assert get_read_pool(_request(fresh)) is read_pool
+
+
+def test_writes_set_read_primary_cookie(settings, mock_pool, mock_conn, cache, flights):
+    settings.db_replica_urls = ["postgresql://replica/testdb"]
+    settings.db_read_your_writes_seconds = 5
+    app = get_app()
+    app.dependency_overrides[get_pool] = lambda: mock_pool
+    app.dependency_overrides[get_read_pool] = lambda: mock_pool
+    app.dependency_overrides[get_cache] = lambda: cache
+    app.dependency_overrides[get_singleflight] = lambda: flights
+    client = TestClient(app)
+    mock_conn.execute.return_value = "DELETE 1"
+    mock_conn.fetch.return_value = []
+
+    assert READ_PRIMARY_COOKIE not in client.get("/posts").cookies
+    resp = client.delete("/posts/0194e7a9-2f7a-7000-8000-000000000000")
+
+    assert resp.status_code == 204
+    assert float(resp.cookies[READ_PRIMARY_COOKIE]) > time.time()
+    assert "Max-Age=5" in resp.headers["set-cookie"]
+
+
+@pytest.mark.parametrize(
+    ("budget", "workers", "expected"),
+    [
+        (None, 4, 10),  # no budget: db_max_connections, whatever the workers
+        (40, 1, 38),
+        (40, 4, 8),
+        (41, 4, 8),
+        (12, 4, 1),
+    ],
+)
+def test_worker_pool_max_size_splits_the_budget(settings, budget, workers, expected):
+    settings.db_connection_budget = budget
+    settings.web_workers = workers
+
+    assert db.worker_pool_max_size(settings) == expected
+    if budget is not None:
+        total = workers * (expected + db.RESERVED_CONNECTIONS)
+        assert total <= budget
+
+
+def test_worker_pool_max_size_rejects_a_budget_too_small(settings):
+    settings.db_connection_budget = 8
+    settings.web_workers = 4
+
+    with pytest.raises(ValueError, match="too small for 4 workers"):
+        db.worker_pool_max_size(settings)
+
+
+def test_init_pool_sizes_pools_from_the_budget(settings, monkeypatch):
+    settings.db_connection_budget = 20
+    settings.web_workers = 2
+    settings.db_min_connections = 10
+    settings.db_replica_urls = ["postgresql://replica/testdb"]
+    create_pool = AsyncMock()
+    monkeypatch.setattr(db.asyncpg, "create_pool", create_pool)
+
+    asyncio.run(db.init_pool())
+
+    primary, replica = (call.kwargs for call in create_pool.await_args_list)
+    assert (primary["min_size"], primary["max_size"]) == (8, 8)
+    assert (replica["min_size"], replica["max_size"]) == (0, 8)
+
+
+@pytest.mark.parametrize(("shards", "expected"), [(1, None), (16, "16")])
+def test_init_pool_shards_votes_on_the_primary(settings, monkeypatch, shards, expected):
+    settings.votes_score_shards = shards
+    settings.db_replica_urls = ["postgresql://replica/testdb"]
+    create_pool = AsyncMock()
+    monkeypatch.setattr(db.asyncpg, "create_pool", create_pool)
+
+    asyncio.run(db.init_pool())
+
+    primary, replica = (call.kwargs for call in create_pool.await_args_list)
+    assert (primary["server_settings"] or {}).get("votes.score_shards") == expected
+    assert "server_settings" not in replica
+
+
+def test_close_pool_terminates_connections_that_are_never_released(
+    settings, monkeypatch
+):
+    settings.shutdown_grace_seconds = 0
+
+    async def never_closes():
+        await asyncio.Event().wait()
+
+    primary, replica = MagicMock(), MagicMock()
+    primary.close = never_closes
+    replica.close = AsyncMock()
+    monkeypatch.setattr(db, "_pool", primary)
+    monkeypatch.setattr(db, "_read_pool", ReplicaSet(primary, [replica], 5))
+
+    asyncio.run(db.close_pool())
+
+    replica.close.assert_awaited_once()
+    replica.terminate.assert_not_called()
+    primary.terminate.assert_called_once()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+import uuid7
+
+from app.config import Settings
+from app.events import RESET_EVENT, EventBroker, Subscription
+from app.routers.events import _stream
+
+
+def _vote(post_id, object_id, vote_score: int) -> str:
+    return json.dumps(
+        {
+            "type": "vote",
+            "post_id": str(post_id),
+            "object_type": "Post",
+            "object_id": str(object_id),
+            "vote_score": vote_score,
+        }
+    )
+
+
+def _comment(post_id, comment_id) -> str:
+    return json.dumps(
+        {"type": "comment", "post_id": str(post_id), "comment_id": str(comment_id)}
+    )
+
+
+@pytest.fixture
+def broker(settings: Settings, monkeypatch: pytest.MonkeyPatch) -> EventBroker:
+    broker = EventBroker(settings)
+    # No database: subscribers only receive what the tests dispatch
+    monkeypatch.setattr(broker, "_listen", AsyncMock())
+    return broker
+
+
+def test_events_fan_out_to_subscribers_of_the_post(broker: EventBroker):
+    post_id, other_id = uuid7.create(), uuid7.create()
+    subs = [asyncio.run(broker.subscribe(post_id)) for _ in range(3)]
+    other = asyncio.run(broker.subscribe(other_id))
+    payload = _comment(post_id, uuid7.create())
+
+    broker.dispatch(payload)
+
+    for sub in subs:
+        assert asyncio.run(sub.get()) == [("comment", payload)]
+    assert not other._pending
+
+
+def test_vote_bursts_are_coalesced(broker: EventBroker):
+    post_id, comment_id = uuid7.create(), uuid7.create()
+    sub = asyncio.run(broker.subscribe(post_id))
+    new_comment = _comment(post_id, comment_id)
+
+    broker.dispatch(_vote(post_id, post_id, 1))
+    broker.dispatch(new_comment)
+    for score in range(2, 50):
+        broker.dispatch(_vote(post_id, post_id, score))
+    broker.dispatch(_vote(post_id, comment_id, 7))
+
+    # One event per object, each with its latest score, in order of first arrival
+    assert asyncio.run(sub.get()) == [
+        ("vote", _vote(post_id, post_id, 49)),
+        ("comment", new_comment),
+        ("vote", _vote(post_id, comment_id, 7)),
+    ]
+
+
+def test_slow_subscriber_is_reset(settings: Settings):
+    sub = Subscription(uuid7.create(), max_pending=2)
+
+    for n in range(3):
+        sub.put(("comment", n), ("comment", "{}"))
+    sub.put(("comment", 4), ("comment", "{}"))
+
+    assert sub.closed
+    assert asyncio.run(sub.get()) == [RESET_EVENT]
+
+
+def test_unsubscribe(broker: EventBroker):
+    post_id = uuid7.create()
+    sub = asyncio.run(broker.subscribe(post_id))
+
+    broker.unsubscribe(sub)
+    broker.dispatch(_comment(post_id, uuid7.create()))
+
+    assert broker.subscriber_count == 0
+    assert not sub._pending
+
+
+def test_lost_connection_resets_every_subscriber(broker: EventBroker):
+    subs = [asyncio.run(broker.subscribe(uuid7.create())) for _ in range(2)]
+
+    broker._on_terminated(AsyncMock())
+
+    assert broker.subscriber_count == 0
+    for sub in subs:
+        assert sub.closed
+        assert asyncio.run(sub.get()) == [RESET_EVENT]
+
+
+def test_stream_sends_keepalives_until_events_arrive():
+    sub = Subscription(uuid7.create(), max_pending=10)
+
+    async def run() -> list[bytes]:
+        asyncio.get_running_loop().call_later(
+            0.05, sub.put, "a", ("comment", '{"n": 1}')
+        )
+        chunks = []
+        async for chunk in _stream(sub, keepalive_seconds=0.01):
+            chunks.append(chunk)
+            if chunk.startswith(b"event:"):
+                break
+        return chunks
+
+    chunks = asyncio.run(run())
+
+    assert chunks[0].startswith(b"retry: ")
+    assert b": keepalive\n\n" in chunks
+    assert chunks[-1] == b'event: comment\ndata: {"n": 1}\n\n'
+
+
+def test_stream_ends_after_reset():
+    sub = Subscription(uuid7.create(), max_pending=10)
+    sub.put("a", ("comment", "{}"))
+    sub.reset()
+
+    async def run() -> list[bytes]:
+        return [chunk async for chunk in _stream(sub, keepalive_seconds=1)]
+
+    assert asyncio.run(run())[1:] == [b"event: reset\ndata: {}\n\n"]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from app.db import InstrumentedPool
+from app.metrics import Counter, Histogram, Metrics
+
+
+def _logged_query(query: str, elapsed: float, exception: Exception | None = None):
+    return SimpleNamespace(query=query, elapsed=elapsed, exception=exception)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.1, "/a")  # bounds are inclusive (`le`)
+    histogram.observe(5, "/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.15',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("things_total", "Things.", ("name",))
+    counter.inc('say "hi"\\\n')
+
+    assert counter.render()[-1] == r'things_total{name="say \"hi\"\\\n"} 1'
+
+
+def test_observe_query_normalizes_statements_and_counts_errors():
+    metrics = Metrics()
+    metrics.observe_query(_logged_query("SELECT *\n    FROM posts\n", 0.002))
+    metrics.observe_query(
+        _logged_query("SELECT *\n    FROM posts\n", 0.003, exception=ValueError())
+    )
+
+    rendered = metrics.render()
+    assert (
+        'db_query_duration_seconds_count{statement="SELECT * FROM posts"} 2' in rendered
+    )
+    assert 'db_query_errors_total{statement="SELECT * FROM posts"} 1' in rendered
+
+
+def test_statement_labels_are_bounded(monkeypatch):
+    monkeypatch.setattr("app.metrics.MAX_STATEMENT_LABELS", 2)
+    metrics = Metrics()
+    for n in range(5):
+        metrics.observe_query(_logged_query(f"SELECT {n}", 0.001))
+
+    assert 'db_query_duration_seconds_count{statement="other"} 3' in metrics.render()
+
+
+def test_instrumented_pool_records_acquire_wait():
+    metrics = Metrics()
+    conn = object()
+    ctx = AsyncMock()
+    ctx.__aenter__.return_value = conn
+    pool = MagicMock()
+    pool.acquire.return_value = ctx
+    instrumented = InstrumentedPool(pool, metrics.pool_acquire)
+
+    async def acquire():
+        async with instrumented.acquire() as acquired:
+            return acquired
+
+    assert asyncio.run(acquire()) is conn
+    assert "db_pool_acquire_seconds_count 1" in metrics.render()
+    ctx.__aexit__.assert_awaited_once()
+    # Everything else goes straight to the wrapped pool
+    assert instrumented.get_size is pool.get_size
+
+
+def test_instrumented_pool_tracks_waiters_and_recent_waits():
+    gate = asyncio.Event()
+
+    async def slow_acquire():
+        await gate.wait()
+
+    ctx = AsyncMock()
+    ctx.__aenter__.side_effect = slow_acquire
+    pool = MagicMock()
+    pool.acquire.return_value = ctx
+    instrumented = InstrumentedPool(pool)
+
+    async def run():
+        async def acquire():
+            async with instrumented.acquire():
+                pass
+
+        tasks = [asyncio.create_task(acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiting = instrumented.waiting
+        gate.set()
+        await asyncio.gather(*tasks)
+        return waiting
+
+    assert asyncio.run(run()) == 3
+    assert instrumented.waiting == 0
+    assert 0 < instrumented.recent_acquire_seconds(window_seconds=60) < 1
+    assert instrumented.recent_acquire_seconds(window_seconds=-1) == 0.0
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import datetime
+import importlib
+import json
+
+import pytest
+import uuid7
+
+from app.main import get_app
+from app.models import CommentResponse, CommentTreeResponse
+from app.responses import _etag_matches, body_etag, dump_json, version_etag
+
+# asyncpg has no public way to build a Record without a database; this private
+# constructor is the only one, and may go away in any release.
+_create_record = getattr(
+    importlib.import_module("asyncpg.protocol.protocol"), "_create_record", None
+)
+
+
+def _make_comment_record(**kwargs):
+    now = datetime.datetime(2025, 2, 24, 12, 0, 0, 123456, tzinfo=datetime.UTC)
+    values = {
+        "id": uuid7.create(),
+        "post_id": uuid7.create(),
+        "parent_comment_id": None,
+        "author": "testuser",
+        "body": "Test comment",
+        "created_at": now,
+        "updated_at": now,
+        "vote_score": 1,
+        "depth": 0,
+    }
+    values.update(kwargs)
+    if _create_record is None:
+        pytest.skip("this asyncpg cannot build Records without a database")
+    return _create_record(
+        {key: i for i, key in enumerate(values)}, tuple(values.values())
+    )
+
+
+def test_dump_json_matches_response_model():
+    """Serializing Records directly produces the same JSON as the pydantic models."""
+    rows = [
+        _make_comment_record(),
+        _make_comment_record(parent_comment_id=uuid7.create()),
+    ]
+
+    fast = dump_json({"items": rows, "next_cursor": None})
+    slow = CommentTreeResponse(
+        items=[CommentResponse(**dict(r)) for r in rows], next_cursor=None
+    ).model_dump_json()
+
+    assert json.loads(fast) == json.loads(slow)
+
+
+def test_dump_json_serializes_records_anywhere():
+    record = _make_comment_record()
+    expected = json.loads(dump_json(record))
+
+    assert expected["id"] == str(record["id"])
+    # Records in tuples are left to the serializer's fallback
+    assert json.loads(dump_json({"pair": (record, [record])})) == {
+        "pair": [expected, [expected]]
+    }
+
+
+def test_dump_json_rejects_unknown_types():
+    with pytest.raises(ValueError, match="not JSON serializable"):
+        dump_json({"value": object()})
+
+
+@pytest.mark.parametrize(
+    ("path", "schema_names"),
+    [
+        ("/posts", ["PostListResponse", "PostBatchResponse"]),
+        ("/posts/{post_id}/comments", ["CommentTreeResponse"]),
+        ("/posts/{post_id}/comments/{comment_id}/replies", ["CommentTreeResponse"]),
+        ("/comments", ["CommentBatchResponse"]),
+    ],
+)
+def test_openapi_still_documents_response_models(path: str, schema_names: list[str]):
+    """Fast-path endpoints keep their response models in the OpenAPI schema."""
+    schema = get_app().openapi()
+    content = schema["paths"][path]["get"]["responses"]["200"]["content"]
+    documented = content["application/json"]["schema"]
+    refs = [{"$ref": f"#/components/schemas/{name}"} for name in schema_names]
+    assert documented.get("anyOf", [documented]) == refs
+
+
+def test_body_etag_is_strong_and_tracks_content():
+    etag = body_etag(b'{"a": 1}')
+
+    assert etag.startswith('"')
+    assert etag.endswith('"')
+    assert etag == body_etag(b'{"a": 1}')
+    assert etag != body_etag(b'{"a": 2}')
+
+
+def test_version_etag_tracks_edits_and_votes():
+    updated_at = datetime.datetime(2025, 2, 24, 12, 0, 0, 123456, tzinfo=datetime.UTC)
+    later = updated_at + datetime.timedelta(microseconds=1)
+
+    etags = {
+        version_etag(updated_at, 1),
+        version_etag(updated_at, 2),
+        version_etag(later, 1),
+    }
+
+    assert len(etags) == 3
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "matches"),
+    [
+        (None, False),
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('"xyz"', False),
+        ("*", True),
+        ("abc", False),
+    ],
+)
+def test_etag_matches(if_none_match: str | None, matches: bool):
+    assert _etag_matches(if_none_match, '"abc"') is matches
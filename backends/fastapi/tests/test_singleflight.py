@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import uuid7
+
+from app.metrics import Metrics
+from app.singleflight import SingleFlight
+
+
+class _Query:
+    """A read that blocks until released, counting how often it runs."""
+
+    def __init__(self, result=None, error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_query():
+    metrics = Metrics()
+    flights = SingleFlight(metrics=metrics)
+
+    async def run():
+        query = _Query(result=(b"{}", '"etag"'))
+        tasks = [asyncio.create_task(flights.do(("post", 1), query)) for _ in range(50)]
+        other = asyncio.create_task(flights.do(("post", 2), query))
+        await asyncio.sleep(0)
+        assert flights.in_flight() == 2
+        query.release.set()
+        results = await asyncio.gather(*tasks, other)
+        return query.calls, results
+
+    calls, results = asyncio.run(run())
+
+    assert calls == 2
+    assert all(result == (b"{}", '"etag"') for result in results)
+    assert (flights.leaders, flights.collapsed) == (2, 49)
+    assert flights.in_flight() == 0
+    rendered = metrics.render()
+    assert 'singleflight_leaders_total{key="post"} 2' in rendered
+    assert 'singleflight_collapsed_total{key="post"} 49' in rendered
+
+
+def test_results_are_not_kept_after_the_call():
+    flights = SingleFlight()
+
+    async def run():
+        query = _Query(result=1)
+        query.release.set()
+        await flights.do(("post", 1), query)
+        await flights.do(("post", 1), query)
+        return query.calls
+
+    assert asyncio.run(run()) == 2
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+
+    async def run():
+        query = _Query(error=ValueError("boom"))
+        tasks = [asyncio.create_task(flights.do(("post", 1), query)) for _ in range(3)]
+        await asyncio.sleep(0)
+        query.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return query.calls, results
+
+    calls, results = asyncio.run(run())
+
+    assert calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight()
+
+    async def run():
+        query = _Query(result="rows")
+        leader = asyncio.create_task(flights.do(("post", 1), query))
+        follower = asyncio.create_task(flights.do(("post", 1), query))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        query.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "rows"
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+
+    async def run():
+        query = _Query(result=1)
+        query.release.set()
+        await asyncio.gather(*(flights.do(("post", 1), query) for _ in range(3)))
+        return query.calls
+
+    assert asyncio.run(run()) == 3
+    assert flights.collapsed == 0
+
+
+def test_call_after_forget_starts_a_new_one():
+    """A read made after a write never joins a flight that began before it."""
+    flights = SingleFlight()
+
+    async def run():
+        before = _Query(result="before")
+        after = _Query(result="after")
+        early = asyncio.create_task(flights.do(("post", 1), before))
+        await asyncio.sleep(0)
+        flights.forget("post", 1)
+        late = asyncio.create_task(flights.do(("post", 1), after))
+        await asyncio.sleep(0)
+        # The old call finishing must not drop the new one
+        before.release.set()
+        assert await early == "before"
+        assert flights.in_flight() == 1
+        after.release.set()
+        return await late, before.calls, after.calls
+
+    assert asyncio.run(run()) == ("after", 1, 1)
+    assert (flights.leaders, flights.collapsed) == (2, 0)
+    assert flights.in_flight() == 0
+
+
+def test_forget_post_and_comments():
+    flights = SingleFlight()
+    post_id, other_id = uuid7.create(), uuid7.create()
+    keys = [
+        ("post", post_id, "pool"),
+        ("post", other_id, "pool"),
+        ("post_page", "new", None, "pool"),
+        ("post_batch", (other_id,), "pool"),
+        ("comment_tree", post_id, None, 3, 5, "pool"),
+        ("comment_tree", other_id, None, 3, 5, "pool"),
+        ("comment_batch", (10,), "pool"),
+    ]
+
+    async def run():
+        query = _Query()
+        tasks = [asyncio.create_task(flights.do(key, query)) for key in keys]
+        await asyncio.sleep(0)
+        flights.forget_post(post_id)
+        remaining = set(flights._calls)
+        flights.forget_comments(post_id)
+        left = set(flights._calls)
+        query.release.set()
+        await asyncio.gather(*tasks)
+        return remaining, left
+
+    remaining, left = asyncio.run(run())
+
+    assert remaining == {keys[1], *keys[4:]}
+    assert left == {keys[1], keys[5]}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import uuid7
+
+from app.cache import POST_KEY, ResponseCache
+from app.config import Settings
+from app.vote_buffer import VoteBuffer
+
+
+@pytest.fixture
+def buffer(settings: Settings, mock_pool: MagicMock, cache: ResponseCache):
+    settings.votes_write_behind = True
+    settings.votes_flush_interval_seconds = 60
+    settings.votes_flush_max_entries = 3
+    settings.votes_buffer_max_entries = 5
+    return VoteBuffer(settings, mock_pool, cache)
+
+
+def _written(mock_conn: AsyncMock, flush: int = 0) -> list[tuple]:
+    """The (object_type, object_id, voter, value) rows of one flush's statement."""
+    _, *columns = mock_conn.execute.await_args_list[flush].args
+    return list(zip(*columns, strict=True))
+
+
+def test_last_vote_wins(buffer: VoteBuffer, mock_conn: AsyncMock):
+    post_id = uuid7.create()
+
+    async def run():
+        await buffer.add(post_id, "Post", "alice", 1)
+        await buffer.add(post_id, "Post", "alice", -1)
+        await buffer.add(post_id, "Post", "bob", 1)
+        await buffer.close()
+
+    asyncio.run(run())
+
+    assert mock_conn.execute.await_count == 1
+    assert _written(mock_conn) == [
+        ("Post", post_id, "alice", -1),
+        ("Post", post_id, "bob", 1),
+    ]
+    assert buffer.flushed == 2
+    assert len(buffer) == 0
+
+
+def test_flushes_at_max_entries(buffer: VoteBuffer, mock_conn: AsyncMock):
+    async def run():
+        for voter in ("a", "b", "c"):
+            await buffer.add(uuid7.create(), "Comment", voter, 1)
+        # The periodic flush wakes up without waiting out its interval
+        await asyncio.sleep(0.01)
+        written = mock_conn.execute.await_count
+        await buffer.close()
+        return written
+
+    assert asyncio.run(run()) == 1
+
+
+def test_flushes_every_interval(buffer: VoteBuffer, mock_conn: AsyncMock):
+    buffer.settings.votes_flush_interval_seconds = 0.01
+
+    async def run():
+        await buffer.add(uuid7.create(), "Post", "alice", 1)
+        await asyncio.sleep(0.05)
+        written = mock_conn.execute.await_count
+        await buffer.close()
+        return written
+
+    assert asyncio.run(run()) == 1
+
+
+def test_full_buffer_flushes_before_taking_more(
+    buffer: VoteBuffer, mock_conn: AsyncMock
+):
+    buffer.settings.votes_flush_max_entries = 100
+
+    async def run():
+        for n in range(6):
+            await buffer.add(uuid7.create(), "Post", f"voter{n}", 1)
+        return len(buffer)
+
+    assert asyncio.run(run()) == 1
+    assert len(_written(mock_conn)) == 5
+
+
+def test_failed_flush_keeps_votes_behind_newer_ones(
+    buffer: VoteBuffer, mock_conn: AsyncMock
+):
+    post_id = uuid7.create()
+    mock_conn.execute.side_effect = [OSError("down"), "INSERT 0 1"]
+
+    async def run():
+        await buffer.add(post_id, "Post", "alice", 1)
+        await buffer.add(post_id, "Post", "bob", 1)
+        with pytest.raises(OSError):
+            await buffer.flush()
+        await buffer.add(post_id, "Post", "alice", 0)
+        await buffer.flush()
+
+    asyncio.run(run())
+
+    assert buffer.flush_errors == 1
+    assert _written(mock_conn, flush=1) == [
+        ("Post", post_id, "alice", 0),
+        ("Post", post_id, "bob", 1),
+    ]
+
+
+def test_unexpected_flush_errors_do_not_stop_the_flusher(
+    buffer: VoteBuffer, mock_conn: AsyncMock
+):
+    buffer.settings.votes_flush_interval_seconds = 0.01
+    mock_conn.execute.side_effect = [ValueError("bug"), "INSERT 0 1"]
+
+    async def run():
+        await buffer.add(uuid7.create(), "Post", "alice", 1)
+        await asyncio.sleep(0.05)
+        await buffer.close()
+
+    asyncio.run(run())
+
+    assert buffer.flush_errors == 1
+    assert buffer.flushed == 1
+
+
+def test_flush_invalidates_cached_posts(
+    buffer: VoteBuffer, mock_conn: AsyncMock, cache: ResponseCache
+):
+    post_id = uuid7.create()
+    cache.set((POST_KEY, post_id), (b"{}", '"etag"'))
+
+    async def run():
+        await buffer.add(post_id, "Post", "alice", 1)
+        assert cache.get((POST_KEY, post_id)) is not None
+        await buffer.flush()
+
+    asyncio.run(run())
+
+    assert cache.get((POST_KEY, post_id)) is None
+
+
+def test_close_without_votes_writes_nothing(buffer: VoteBuffer, mock_conn: AsyncMock):
+    asyncio.run(buffer.close())
+
+    mock_conn.execute.assert_not_awaited()
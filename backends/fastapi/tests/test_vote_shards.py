@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import Settings
+from app.vote_shards import VoteShardFolder
+
+
+@pytest.fixture
+def folder(settings: Settings, mock_pool: MagicMock) -> VoteShardFolder:
+    settings.votes_score_shards = 8
+    settings.votes_fold_interval_seconds = 0.01
+    settings.votes_fold_batch_size = 100
+    return VoteShardFolder(settings, mock_pool)
+
+
+def test_fold_repeats_until_a_batch_is_short(
+    folder: VoteShardFolder, mock_conn: AsyncMock
+):
+    mock_conn.fetchval.side_effect = [100, 100, 7]
+
+    assert asyncio.run(folder.fold()) == 207
+    assert mock_conn.fetchval.await_count == 3
+    assert mock_conn.fetchval.await_args.args[1] == 100
+    assert folder.folded == 207
+
+
+def test_folds_periodically_and_at_close(folder: VoteShardFolder, mock_conn: AsyncMock):
+    mock_conn.fetchval.return_value = 0
+
+    async def run():
+        folder.start()
+        await asyncio.sleep(0.05)
+        periodic = mock_conn.fetchval.await_count
+        await folder.close()
+        return periodic
+
+    periodic = asyncio.run(run())
+
+    assert periodic >= 1
+    assert mock_conn.fetchval.await_count == periodic + 1
+
+
+def test_fold_errors_do_not_stop_the_loop(
+    folder: VoteShardFolder, mock_conn: AsyncMock
+):
+    mock_conn.fetchval.side_effect = [OSError("connection reset"), 0, 0, 0, 0, 0]
+
+    async def run():
+        folder.start()
+        await asyncio.sleep(0.05)
+        await folder.close()
+
+    asyncio.run(run())
+
+    assert mock_conn.fetchval.await_count >= 2  # noqa: PLR2004
+
+
+def test_disabled_never_folds(settings: Settings, mock_pool: MagicMock):
+    folder = VoteShardFolder(settings, mock_pool)
+
+    async def run():
+        folder.start()
+        await folder.close()
+
+    asyncio.run(run())
+
+    assert not folder.enabled
+    mock_pool.acquire.assert_not_called()
@@ -0,0 +1,31 @@
+--
+-- Migration 0001: indexes for every hot query path.
+--
+-- Without these, only primary keys and the votes unique constraint are indexed,
+-- so list pages, comment trees and cascade deletes degrade to sequential scans.
+--
+-- Indexes are built CONCURRENTLY so this can run against a live database without
+-- blocking writes. That cannot happen inside a transaction block:
+-- apply this file through migrate.sh (or plain `psql -f`), one statement at a time.
+-- If a concurrent build fails it leaves an INVALID index behind;
+-- drop that index before re-running this migration.
+--
+
+-- list_posts: keyset pagination in (created_at, id) order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_created_at_id_idx
+    ON posts (created_at, id);
+
+-- get_comment_tree / get_reply_tree: pages of siblings at one level
+-- (top comments of a post, or direct replies within a comment's subtree)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS comments_post_id_depth_path_idx
+    ON comments (post_id, depth, path);
+
+-- get_comment_tree / get_reply_tree: one range scan over a subtree;
+-- also serves the ON DELETE CASCADE from posts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS comments_post_id_path_idx
+    ON comments (post_id, path);
+
+-- ON DELETE CASCADE from a parent comment to its replies,
+-- and direct-reply lookups in (created_at, id) order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS comments_parent_comment_id_created_at_id_idx
+    ON comments (parent_comment_id, created_at, id);
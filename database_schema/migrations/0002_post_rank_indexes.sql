@@ -0,0 +1,19 @@
+--
+-- Migration 0002: indexes for the ranked post feeds.
+--
+-- `GET /posts?sort=hot` and `?sort=top` page through these in descending order,
+-- each page a single backward range scan from the previous page's sort key,
+-- so their cost does not grow with the number of posts.
+-- (`sort=new` reads posts_created_at_id_idx from 0001 backwards.)
+--
+-- Like every migration, apply through migrate.sh: CONCURRENTLY cannot run
+-- inside a transaction block.
+--
+
+-- list_posts?sort=hot: keyset pagination in (hot_rank, id) order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_hot_rank_id_idx
+    ON posts (hot_rank, id);
+
+-- list_posts?sort=top: keyset pagination in (vote_score, id) order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_vote_score_id_idx
+    ON posts (vote_score, id);
@@ -0,0 +1,16 @@
+--
+-- Migration 0003: full-text search indexes.
+--
+-- `GET /search` matches `search_vector @@ websearch_to_tsquery('english', ...)`
+-- on posts and comments; these GIN indexes find the matching rows directly,
+-- so a search reads only its matches however large the corpus grows.
+--
+-- Like every migration, apply through migrate.sh: CONCURRENTLY cannot run
+-- inside a transaction block.
+--
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_search_vector_idx
+    ON posts USING GIN (search_vector);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS comments_search_vector_idx
+    ON comments USING GIN (search_vector);
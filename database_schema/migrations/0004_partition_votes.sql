@@ -0,0 +1,58 @@
+--
+-- Migration 0004: hash-partition `votes` by `object_id`.
+--
+-- Databases created before schema.sql partitioned `votes` have it as one table.
+-- This moves its rows into the partitioned table that schema.sql now creates,
+-- then drops the old one. It does nothing where `votes` is already partitioned.
+--
+-- The move is one transaction, holding an exclusive lock on `votes` for as long
+-- as it takes to copy every row: votes wait (reads of scores do not), so run it
+-- in a quiet period.
+-- Scores are not recomputed: the copy fires no vote triggers.
+--
+
+DO $$
+BEGIN
+    IF (SELECT c.relkind FROM pg_class c WHERE c.oid = 'votes'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE votes RENAME TO votes_unpartitioned;
+    -- Frees its index name for the new table's constraint; the copy needs no index
+    ALTER TABLE votes_unpartitioned
+        DROP CONSTRAINT IF EXISTS votes_object_id_object_type_voter_key;
+
+    CREATE TABLE votes (
+        voter VARCHAR(100) NOT NULL,
+        object_id UUID NOT NULL,
+        object_type VARCHAR(20) NOT NULL REFERENCES object_types (name),
+        vote_value SMALLINT NOT NULL DEFAULT 1 CHECK (vote_value IN (1, -1)),
+        UNIQUE (object_id, object_type, voter)
+    ) PARTITION BY HASH (object_id);
+    PERFORM create_vote_partitions();
+
+    INSERT INTO votes (voter, object_id, object_type, vote_value)
+    SELECT voter, object_id, object_type, vote_value
+    FROM votes_unpartitioned;
+    DROP TABLE votes_unpartitioned;
+
+    -- The score triggers went with the old table; as defined in schema.sql
+    CREATE TRIGGER trg_score_inserted_votes
+        AFTER INSERT ON votes
+        REFERENCING NEW TABLE AS new_votes
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_vote_score();
+    CREATE TRIGGER trg_score_updated_votes
+        AFTER UPDATE ON votes
+        REFERENCING OLD TABLE AS old_votes NEW TABLE AS new_votes
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_vote_score();
+    CREATE TRIGGER trg_score_deleted_votes
+        AFTER DELETE ON votes
+        REFERENCING OLD TABLE AS old_votes
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_vote_score();
+END;
+$$;
+
+ANALYZE votes;
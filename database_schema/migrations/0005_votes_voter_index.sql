@@ -0,0 +1,82 @@
+--
+-- Migration 0005: index votes by voter.
+--
+-- `GET /users/{username}/votes` pages through one voter's votes in
+-- (object_id, object_type) order, newest objects first (ids are UUIDv7). This index
+-- serves each page as a keyset seek, and covers `vote_value`, so it is read with
+-- index-only scans. `votes` is partitioned by object_id, so a voter's votes are
+-- spread over every partition: a page merges one short index range per partition.
+--
+-- CONCURRENTLY cannot build an index on a partitioned table, so the parent index is
+-- created ON ONLY `votes` (invalid, and unused, until every partition has one),
+-- then each partition's is built CONCURRENTLY and attached. The parent index is
+-- valid once the last one is attached. If a build fails, drop the INVALID partition
+-- index it leaves behind before re-running this migration.
+--
+
+CREATE INDEX IF NOT EXISTS votes_voter_object_idx
+    ON ONLY votes (voter, object_id, object_type) INCLUDE (vote_value);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p00_voter_object_idx
+    ON votes_p00 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p00_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p01_voter_object_idx
+    ON votes_p01 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p01_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p02_voter_object_idx
+    ON votes_p02 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p02_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p03_voter_object_idx
+    ON votes_p03 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p03_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p04_voter_object_idx
+    ON votes_p04 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p04_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p05_voter_object_idx
+    ON votes_p05 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p05_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p06_voter_object_idx
+    ON votes_p06 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p06_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p07_voter_object_idx
+    ON votes_p07 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p07_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p08_voter_object_idx
+    ON votes_p08 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p08_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p09_voter_object_idx
+    ON votes_p09 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p09_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p10_voter_object_idx
+    ON votes_p10 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p10_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p11_voter_object_idx
+    ON votes_p11 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p11_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p12_voter_object_idx
+    ON votes_p12 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p12_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p13_voter_object_idx
+    ON votes_p13 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p13_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p14_voter_object_idx
+    ON votes_p14 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p14_voter_object_idx;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS votes_p15_voter_object_idx
+    ON votes_p15 (voter, object_id, object_type) INCLUDE (vote_value);
+ALTER INDEX votes_voter_object_idx ATTACH PARTITION votes_p15_voter_object_idx;
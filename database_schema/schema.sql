@@ -1,6 +1,18 @@
 --
 -- Backend data schema
 --
+-- Tables, triggers and stored functions live here, and this file is safe to re-run.
+-- Secondary indexes are added by the tracked migrations in `migrations/`,
+-- applied after this file with `migrate.sh` (see SPEC.md).
+--
+
+--
+-- Applied migrations, recorded by migrate.sh
+--
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(200) PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
 
 --
 -- Post instances
@@ -16,7 +28,7 @@ CREATE TABLE IF NOT EXISTS posts (
         updated_at TIMESTAMP
     WITH
         TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-        vote_score INTEGER NOT NULL DEFAULT 1
+        vote_score INTEGER NOT NULL DEFAULT 0
 );
 
 --
@@ -30,9 +42,121 @@ CREATE TABLE IF NOT EXISTS comments (
     body TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    vote_score INTEGER NOT NULL DEFAULT 1
+    vote_score INTEGER NOT NULL DEFAULT 0,
+    -- Materialized hierarchy, maintained by trg_set_comment_path (see below)
+    depth INTEGER NOT NULL,
+    path BYTEA NOT NULL
 );
 
+--
+-- Comment hierarchy
+-- Each comment stores its `depth` (0 for a top comment) and a materialized `path`:
+-- the path of its parent followed by one fixed-width, 24-byte segment of its own.
+-- A segment is the comment's `created_at` (microseconds since the epoch, as a big-endian
+-- BIGINT) followed by the 16 bytes of its `id`, so that ordering by `path` yields a
+-- depth-first walk of the tree with siblings in (created_at, id) order.
+-- Every descendant of a comment has a path that starts with the comment's own path,
+-- so a whole subtree is one contiguous range of the (post_id, path) index
+-- (see migrations/0001_hot_query_indexes.sql).
+--
+-- NOTE: btree index entries are limited to roughly 2.7kB,
+-- which caps reply chains at about 100 levels deep.
+--
+CREATE OR REPLACE FUNCTION comment_path_segment(
+    p_created_at TIMESTAMP WITH TIME ZONE,
+    p_id UUID
+)
+RETURNS BYTEA AS $$
+    SELECT int8send((EXTRACT(EPOCH FROM p_created_at) * 1000000)::BIGINT)
+        || uuid_send(p_id)
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Backfill databases created before the hierarchy columns existed.
+-- Recomputes `depth` and `path` of every comment from the parent links;
+-- returns the number of comments updated.
+CREATE OR REPLACE FUNCTION backfill_comment_paths()
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    WITH RECURSIVE tree AS (
+        SELECT c.id, 0 AS depth, comment_path_segment(c.created_at, c.id) AS path
+        FROM comments c
+        WHERE c.parent_comment_id IS NULL
+
+        UNION ALL
+
+        SELECT c.id, t.depth + 1, t.path || comment_path_segment(c.created_at, c.id)
+        FROM tree t
+        JOIN comments c ON c.parent_comment_id = t.id
+    )
+    UPDATE comments c
+    SET depth = t.depth, path = t.path
+    FROM tree t
+    WHERE c.id = t.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS depth INTEGER;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS path BYTEA;
+SELECT backfill_comment_paths()
+WHERE EXISTS (SELECT 1 FROM comments WHERE path IS NULL);
+ALTER TABLE comments ALTER COLUMN depth SET NOT NULL;
+ALTER TABLE comments ALTER COLUMN path SET NOT NULL;
+
+--
+-- Trigger function: set `depth` and `path` on a new comment from its parent,
+-- and announce the comment on the `post_events` channel (see "Live events" below).
+--
+CREATE OR REPLACE FUNCTION set_comment_path()
+RETURNS TRIGGER AS $$
+DECLARE
+    parent_path BYTEA;
+    parent_depth INTEGER;
+BEGIN
+    NEW.created_at := COALESCE(NEW.created_at, CURRENT_TIMESTAMP);
+
+    IF NEW.parent_comment_id IS NULL THEN
+        NEW.depth := 0;
+        NEW.path := comment_path_segment(NEW.created_at, NEW.id);
+    ELSE
+        SELECT c.path, c.depth INTO parent_path, parent_depth
+        FROM comments c
+        WHERE c.id = NEW.parent_comment_id;
+
+        IF NOT FOUND THEN
+            -- Report this the same way the foreign key would have
+            RAISE EXCEPTION 'Parent comment % does not exist', NEW.parent_comment_id
+                USING
+                    ERRCODE = 'foreign_key_violation',
+                    CONSTRAINT = 'comments_parent_comment_id_fkey';
+        END IF;
+
+        NEW.depth := parent_depth + 1;
+        NEW.path := parent_path || comment_path_segment(NEW.created_at, NEW.id);
+    END IF;
+
+    -- Only delivered if the insert commits
+    PERFORM pg_notify('post_events', json_build_object(
+        'type', 'comment',
+        'post_id', NEW.post_id,
+        'comment_id', NEW.id,
+        'parent_comment_id', NEW.parent_comment_id,
+        'author', NEW.author,
+        'depth', NEW.depth,
+        'created_at', NEW.created_at
+    )::TEXT);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_set_comment_path
+    BEFORE INSERT ON comments
+    FOR EACH ROW
+    EXECUTE FUNCTION set_comment_path();
+
 --
 -- Object types
 -- This is a polymorphic system in which some items may relate to one of many types of objects.
@@ -56,55 +180,487 @@ ON CONFLICT (name) DO NOTHING;
 -- Votes may apply to either Posts or Comments.
 -- `vote_value` must be either 1 or -1 so that they can be summed up properly.
 --
+-- Votes are the largest table, so they are hash-partitioned by `object_id` into
+-- 16 partitions, `votes_p00` to `votes_p15`, each vacuumed and indexed on its own.
+-- Every write of a vote names its object, so it only touches that object's
+-- partition; lookups by voter (migrations/0005_votes_voter_index.sql) read an index
+-- range in every partition.
+-- Databases created before votes were partitioned are converted by
+-- migrations/0004_partition_votes.sql.
+--
 CREATE TABLE IF NOT EXISTS votes (
     voter VARCHAR(100) NOT NULL,
     object_id UUID NOT NULL,
     object_type VARCHAR(20) NOT NULL REFERENCES object_types (name),
     vote_value SMALLINT NOT NULL DEFAULT 1 CHECK (vote_value IN (1, -1)),
     UNIQUE (object_id, object_type, voter)
+) PARTITION BY HASH (object_id);
+
+CREATE OR REPLACE FUNCTION create_vote_partitions()
+RETURNS VOID AS $$
+BEGIN
+    -- A votes table from before partitioning is left to migration 0004
+    IF (SELECT c.relkind FROM pg_class c WHERE c.oid = 'votes'::regclass) <> 'p' THEN
+        RETURN;
+    END IF;
+    FOR part IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF votes'
+            ' FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            'votes_p' || lpad(part::TEXT, 2, '0'),
+            part
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_vote_partitions();
+
+--
+-- Scores start at 0 and are only ever moved by vote deltas (see below).
+-- Older databases were created with a default of 1, which would now double-count
+-- the author's auto-upvote.
+--
+ALTER TABLE posts ALTER COLUMN vote_score SET DEFAULT 0;
+ALTER TABLE comments ALTER COLUMN vote_score SET DEFAULT 0;
+
+--
+-- Post ranking for the "hot" feed.
+-- A post's hot rank is the order of magnitude of its score, plus one point for every
+-- 12.5 hours between its creation and a fixed reference time:
+--   sign(score) * log10(max(|score|, 1)) + (created_at epoch - 1134028003) / 45000
+-- so a post needs 10x the score of a post 12.5 hours newer to rank alongside it.
+-- Aging is built into the creation term, so ranks never need recomputing as time
+-- passes: only a score change moves a post. `posts.hot_rank` is therefore a stored
+-- generated column, updated in the same row write as every vote_score change
+-- (the delta trigger, reconcile_vote_scores(), bulk loads).
+--
+CREATE OR REPLACE FUNCTION post_hot_rank(
+    p_vote_score INTEGER,
+    p_created_at TIMESTAMP WITH TIME ZONE
+)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT SIGN(p_vote_score)::DOUBLE PRECISION
+            * LOG(GREATEST(ABS(p_vote_score), 1)::DOUBLE PRECISION)
+        + (EXTRACT(EPOCH FROM p_created_at)::DOUBLE PRECISION - 1134028003) / 45000
+$$ LANGUAGE sql IMMUTABLE;
+
+-- NOTE: adding this column rewrites `posts` on databases created before it existed
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS hot_rank DOUBLE PRECISION
+    GENERATED ALWAYS AS (post_hot_rank(vote_score, created_at)) STORED;
+
+--
+-- Full-text search
+-- `search_vector` holds the lexemes of a post's title (weighted A, so title
+-- matches rank above body matches) and body, or of a comment's body, parsed
+-- with the `english` configuration. As stored generated columns they are kept
+-- up to date by every insert and edit, and GIN indexes on them
+-- (migrations/0003_search_indexes.sql) find matches without reading every row.
+-- Queries must use the same configuration to match:
+--   WHERE search_vector @@ websearch_to_tsquery('english', 'some words')
+--
+-- NOTE: adding these columns rewrites `posts` and `comments` on databases
+-- created before they existed
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A')
+        || setweight(to_tsvector('english', body), 'B')
+    ) STORED;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', body)) STORED;
+
+--
+-- Live events
+-- Vote score changes and new comments are announced with NOTIFY on the
+-- `post_events` channel, as a JSON object with a `type` and the `post_id` of the
+-- thread it belongs to, so that each backend process needs a single LISTEN
+-- connection to stream every Post's events to its clients.
+-- Notifications are sent on commit only, and never for bulk loads with triggers
+-- disabled or for reconcile_vote_scores().
+--
+
+--
+-- Sharded vote counters (optional)
+-- Every score change of an object updates its one row, so concurrent votes on a
+-- popular Post queue up for that row's lock. Sessions that set `votes.score_shards`
+-- to N > 1 instead add each change to one of N counter rows of the object in
+-- `vote_score_shards`, picked by backend process, so that N connections voting on
+-- the same object at once rarely wait for each other:
+--   SET votes.score_shards = 16;  -- or ALTER DATABASE ... SET, or per connection
+-- An object's score is then its `vote_score` plus its pending shard deltas
+-- (`pending_vote_delta()`), until fold_vote_score_shards() moves them into
+-- `vote_score`. Run it every second or so while sharding is on; single-object reads
+-- add the pending deltas, while lists ordered by score (and `hot_rank`) only see
+-- folded scores.
+--
+CREATE TABLE IF NOT EXISTS vote_score_shards (
+    object_id UUID NOT NULL,
+    object_type VARCHAR(20) NOT NULL,
+    shard SMALLINT NOT NULL,
+    delta INTEGER NOT NULL,
+    PRIMARY KEY (object_id, object_type, shard)
 );
 
+CREATE OR REPLACE FUNCTION pending_vote_delta(
+    p_object_type VARCHAR(20),
+    p_object_id UUID
+)
+RETURNS INTEGER AS $$
+    SELECT COALESCE(SUM(s.delta), 0)::INTEGER
+    FROM vote_score_shards s
+    WHERE s.object_id = p_object_id
+        AND s.object_type = p_object_type
+$$ LANGUAGE sql STABLE;
+
 --
--- Trigger function: recalculate vote_score on the affected object
--- whenever a vote is inserted.
--- Looks up the target table from object_types, then sets vote_score
--- to the sum of all vote_value entries for that object.
+-- Stored function: apply a vote delta to the `vote_score` of a single object.
+-- Looks up the target table from object_types, then adds `p_delta`
+-- (the net change of one or more votes) to the current score in place, or with
+-- `votes.score_shards` set, to one of the object's counter rows (see above),
+-- and announces the new score on the `post_events` channel.
+-- Cost is a single primary key update, regardless of how many votes the object has.
 --
-CREATE OR REPLACE FUNCTION update_vote_score()
-RETURNS TRIGGER AS $$
+CREATE OR REPLACE FUNCTION apply_vote_delta(
+    p_object_type VARCHAR(20),
+    p_object_id UUID,
+    p_delta INTEGER
+)
+RETURNS VOID AS $$
 DECLARE
     target_table TEXT;
+    shards INTEGER;
+    new_score INTEGER;
+    thread_id UUID;
 BEGIN
+    IF p_delta = 0 THEN
+        RETURN;
+    END IF;
+
     SELECT ot.table_name INTO target_table
     FROM object_types ot
-    WHERE ot.name = NEW.object_type;
+    WHERE ot.name = p_object_type;
 
     IF target_table IS NULL THEN
-        RAISE EXCEPTION 'Unknown object_type: %', NEW.object_type;
+        RAISE EXCEPTION 'Unknown object_type: %', p_object_type;
     END IF;
 
-    EXECUTE format(
-        'UPDATE %I SET vote_score = (
-            SELECT COALESCE(SUM(vote_value), 0)
-            FROM votes
-            WHERE object_id = $1 AND object_type = $2
-        ) WHERE id = $1',
-        target_table
-    ) USING NEW.object_id, NEW.object_type;
+    shards := COALESCE(
+        NULLIF(current_setting('votes.score_shards', TRUE), '')::INTEGER, 1
+    );
+    IF shards > 1 THEN
+        INSERT INTO vote_score_shards AS s (object_id, object_type, shard, delta)
+        VALUES (p_object_id, p_object_type, pg_backend_pid() % shards, p_delta)
+        ON CONFLICT (object_id, object_type, shard)
+        DO UPDATE SET delta = s.delta + EXCLUDED.delta;
 
-    RETURN NEW;
+        EXECUTE format(
+            'SELECT vote_score + pending_vote_delta($1, id), %I FROM %I WHERE id = $2',
+            CASE target_table WHEN 'comments' THEN 'post_id' ELSE 'id' END,
+            target_table
+        ) USING p_object_type, p_object_id INTO new_score, thread_id;
+    ELSE
+        EXECUTE format(
+            'UPDATE %I SET vote_score = vote_score + $1 WHERE id = $2'
+            ' RETURNING vote_score, %I',
+            target_table,
+            -- The Post whose event stream the object belongs to
+            CASE target_table WHEN 'comments' THEN 'post_id' ELSE 'id' END
+        ) USING p_delta, p_object_id INTO new_score, thread_id;
+    END IF;
+
+    IF thread_id IS NOT NULL THEN
+        PERFORM pg_notify('post_events', json_build_object(
+            'type', 'vote',
+            'post_id', thread_id,
+            'object_type', p_object_type,
+            'object_id', p_object_id,
+            'vote_score', new_score
+        )::TEXT);
+    END IF;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE OR REPLACE TRIGGER trg_update_vote_score
+--
+-- Stored function: apply the net vote deltas of many votes, once per object.
+-- Deltas for the same object are summed, and objects are updated in one order
+-- (by type, then id), so that concurrent statements take their row locks in the
+-- same order rather than deadlocking.
+--
+CREATE OR REPLACE FUNCTION apply_vote_deltas(
+    p_object_types VARCHAR(20)[],
+    p_object_ids UUID[],
+    p_deltas INTEGER[]
+)
+RETURNS VOID AS $$
+DECLARE
+    change RECORD;
+BEGIN
+    FOR change IN
+        SELECT t.object_type, t.object_id, SUM(t.delta)::INTEGER AS delta
+        FROM unnest(p_object_types, p_object_ids, p_deltas)
+            AS t(object_type, object_id, delta)
+        GROUP BY t.object_type, t.object_id
+        ORDER BY t.object_type, t.object_id
+    LOOP
+        PERFORM apply_vote_delta(change.object_type, change.object_id, change.delta);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+--
+-- Trigger function: keep vote_score in sync with the votes table.
+-- Fires once per INSERT, UPDATE or DELETE statement on votes and applies only
+-- the change, summed per object over every row the statement touched:
+--   inserted votes: +vote_value
+--   updated votes:  new vote_value - old vote_value (+/-2 for a flip)
+--   deleted votes:  -vote_value
+-- so a statement writing many votes on one object (a vote batch, or a flush of
+-- the backend's write-behind buffer) updates that object's row once.
+-- A vote moved to a different object counts against the old one and for the new.
+-- Each statement's transition tables hold only the rows it changed (an ON CONFLICT
+-- DO UPDATE fires both the INSERT and the UPDATE trigger, each with its own rows).
+--
+-- Replaced by the statement-level triggers below; dropped before their function is
+DROP TRIGGER IF EXISTS trg_update_vote_score ON votes;
+
+CREATE OR REPLACE FUNCTION update_vote_score()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Only the transition tables of the firing event exist
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_vote_deltas(
+            array_agg(object_type), array_agg(object_id), array_agg(vote_value::INTEGER)
+        )
+        FROM new_votes;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_vote_deltas(
+            array_agg(object_type), array_agg(object_id), array_agg(-vote_value::INTEGER)
+        )
+        FROM old_votes;
+    ELSE
+        PERFORM apply_vote_deltas(
+            array_agg(c.object_type), array_agg(c.object_id), array_agg(c.delta)
+        )
+        FROM (
+            SELECT object_type, object_id, vote_value::INTEGER AS delta FROM new_votes
+            UNION ALL
+            SELECT object_type, object_id, -vote_value::INTEGER FROM old_votes
+        ) c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_score_inserted_votes
     AFTER INSERT ON votes
-    FOR EACH ROW
+    REFERENCING NEW TABLE AS new_votes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_vote_score();
+
+CREATE OR REPLACE TRIGGER trg_score_updated_votes
+    AFTER UPDATE ON votes
+    REFERENCING OLD TABLE AS old_votes NEW TABLE AS new_votes
+    FOR EACH STATEMENT
     EXECUTE FUNCTION update_vote_score();
 
+CREATE OR REPLACE TRIGGER trg_score_deleted_votes
+    AFTER DELETE ON votes
+    REFERENCING OLD TABLE AS old_votes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_vote_score();
+
+--
+-- Stored function: recompute every vote_score from the votes table in bulk.
+-- Scores are normally maintained incrementally by the trg_score_*_votes triggers;
+-- run this to repair drift (e.g. from data written before the trigger
+-- handled UPDATE and DELETE, or loaded with triggers disabled).
+-- Deltas still pending in vote_score_shards are left out of `vote_score`, as
+-- they will be added to it when folded.
+-- Returns the number of rows whose score was corrected.
+--
+CREATE OR REPLACE FUNCTION reconcile_vote_scores()
+RETURNS BIGINT AS $$
+DECLARE
+    fixed_posts BIGINT;
+    fixed_comments BIGINT;
+BEGIN
+    WITH pending AS (
+        SELECT object_id, SUM(delta)::INTEGER AS delta
+        FROM vote_score_shards
+        WHERE object_type = 'Post'
+        GROUP BY object_id
+    )
+    UPDATE posts p
+    SET vote_score = t.total
+    FROM (
+        SELECT
+            p2.id,
+            (COALESCE(SUM(v.vote_value), 0) - COALESCE(MAX(pd.delta), 0))::INTEGER
+                AS total
+        FROM posts p2
+        LEFT JOIN votes v ON v.object_id = p2.id AND v.object_type = 'Post'
+        LEFT JOIN pending pd ON pd.object_id = p2.id
+        GROUP BY p2.id
+    ) t
+    WHERE p.id = t.id
+        AND p.vote_score <> t.total;
+    GET DIAGNOSTICS fixed_posts = ROW_COUNT;
+
+    WITH pending AS (
+        SELECT object_id, SUM(delta)::INTEGER AS delta
+        FROM vote_score_shards
+        WHERE object_type = 'Comment'
+        GROUP BY object_id
+    )
+    UPDATE comments c
+    SET vote_score = t.total
+    FROM (
+        SELECT
+            c2.id,
+            (COALESCE(SUM(v.vote_value), 0) - COALESCE(MAX(pd.delta), 0))::INTEGER
+                AS total
+        FROM comments c2
+        LEFT JOIN votes v ON v.object_id = c2.id AND v.object_type = 'Comment'
+        LEFT JOIN pending pd ON pd.object_id = c2.id
+        GROUP BY c2.id
+    ) t
+    WHERE c.id = t.id
+        AND c.vote_score <> t.total;
+    GET DIAGNOSTICS fixed_comments = ROW_COUNT;
+
+    RETURN fixed_posts + fixed_comments;
+END;
+$$ LANGUAGE plpgsql;
+
+--
+-- Stored function: fold pending shard deltas into `vote_score`.
+-- Moves up to `p_batch_size` counter rows out of vote_score_shards, and adds
+-- their sum to each object's `vote_score`: one row update per object, in one
+-- order (by type, then id) like apply_vote_deltas(). An object's score, as read
+-- with pending_vote_delta(), stays the same throughout, so nothing is announced.
+-- Counter rows being written by a vote are skipped, rather than waited for, and
+-- left for the next call. Counters of deleted objects are dropped.
+-- Returns the number of counter rows folded: call it again until that is less
+-- than `p_batch_size`. Each call is a short transaction of its own, and
+-- concurrent calls (e.g. from several backend processes) fold disjoint rows.
+--
+CREATE OR REPLACE FUNCTION fold_vote_score_shards(p_batch_size INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+    types VARCHAR(20)[];
+    ids UUID[];
+    deltas INTEGER[];
+    folded INTEGER;
+    change RECORD;
+BEGIN
+    WITH picked AS (
+        SELECT s.object_id, s.object_type, s.shard
+        FROM vote_score_shards s
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM vote_score_shards s
+        USING picked
+        WHERE s.object_id = picked.object_id
+            AND s.object_type = picked.object_type
+            AND s.shard = picked.shard
+        RETURNING s.object_type, s.object_id, s.delta
+    )
+    SELECT
+        array_agg(t.object_type ORDER BY t.object_type, t.object_id),
+        array_agg(t.object_id ORDER BY t.object_type, t.object_id),
+        array_agg(t.delta ORDER BY t.object_type, t.object_id),
+        COALESCE(SUM(t.shards), 0)::INTEGER
+    INTO types, ids, deltas, folded
+    FROM (
+        SELECT object_type, object_id, SUM(delta)::INTEGER AS delta, COUNT(*) AS shards
+        FROM moved
+        GROUP BY object_type, object_id
+    ) t;
+
+    FOR change IN
+        SELECT t.object_type, t.object_id, t.delta
+        FROM unnest(types, ids, deltas) AS t(object_type, object_id, delta)
+        WHERE t.delta <> 0
+    LOOP
+        IF change.object_type = 'Post' THEN
+            UPDATE posts SET vote_score = vote_score + change.delta
+            WHERE id = change.object_id;
+        ELSE
+            UPDATE comments SET vote_score = vote_score + change.delta
+            WHERE id = change.object_id;
+        END IF;
+    END LOOP;
+
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+--
+-- Stored function: cast (or retract) a single user's vote on a Post or Comment.
+-- Validates the target, applies the vote, and returns the object's new vote_score,
+-- all in one round trip:
+--   - A `p_vote_value` of 0 deletes the user's vote, if any.
+--   - Otherwise, the vote is inserted, or updated if the user already voted.
+-- For Comments, pass `p_post_id` to also require that the comment belongs to that Post.
+-- Returns NULL if the target does not exist; the backend should interpret this as 404.
+--
+CREATE OR REPLACE FUNCTION cast_vote(
+    p_voter VARCHAR(100),
+    p_object_type VARCHAR(20),
+    p_object_id UUID,
+    p_vote_value INTEGER,
+    p_post_id UUID DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    new_score INTEGER;
+BEGIN
+    IF p_object_type = 'Post' THEN
+        PERFORM 1 FROM posts p WHERE p.id = p_object_id;
+    ELSIF p_object_type = 'Comment' THEN
+        PERFORM 1 FROM comments c
+        WHERE c.id = p_object_id
+            AND (p_post_id IS NULL OR c.post_id = p_post_id);
+    ELSE
+        RAISE EXCEPTION 'Unknown object_type: %', p_object_type;
+    END IF;
+
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF p_vote_value = 0 THEN
+        DELETE FROM votes v
+        WHERE v.voter = p_voter
+            AND v.object_id = p_object_id
+            AND v.object_type = p_object_type;
+    ELSE
+        INSERT INTO votes (voter, object_id, object_type, vote_value)
+        VALUES (p_voter, p_object_id, p_object_type, p_vote_value)
+        ON CONFLICT (object_id, object_type, voter)
+        DO UPDATE SET vote_value = EXCLUDED.vote_value
+        WHERE votes.vote_value <> EXCLUDED.vote_value;
+    END IF;
+
+    -- trg_score_*_votes have already applied the delta by this point
+    IF p_object_type = 'Post' THEN
+        SELECT p.vote_score + pending_vote_delta('Post', p.id) INTO new_score
+        FROM posts p WHERE p.id = p_object_id;
+    ELSE
+        SELECT c.vote_score + pending_vote_delta('Comment', c.id) INTO new_score
+        FROM comments c WHERE c.id = p_object_id;
+    END IF;
+
+    RETURN new_score;
+END;
+$$ LANGUAGE plpgsql;
+
 --
 -- Trigger function: auto-upvote a Post on creation.
 -- Inserts a vote from the post's author, which in turn fires
--- trg_update_vote_score to set vote_score to 1.
+-- trg_score_inserted_votes to move vote_score from 0 to 1.
 --
 CREATE OR REPLACE FUNCTION auto_upvote_post()
 RETURNS TRIGGER AS $$
@@ -123,7 +679,7 @@ CREATE OR REPLACE TRIGGER trg_auto_upvote_post
 --
 -- Trigger function: auto-upvote a Comment on creation.
 -- Inserts a vote from the comment's author, which in turn fires
--- trg_update_vote_score to set vote_score to 1.
+-- trg_score_inserted_votes to move vote_score from 0 to 1.
 --
 CREATE OR REPLACE FUNCTION auto_upvote_comment()
 RETURNS TRIGGER AS $$
@@ -139,18 +695,207 @@ CREATE OR REPLACE TRIGGER trg_auto_upvote_comment
     FOR EACH ROW
     EXECUTE FUNCTION auto_upvote_comment();
 
+--
+-- Comment counts
+-- `posts.comment_count` is a denormalized count of the post's comments, at every
+-- depth, and `posts.last_comment_at` the `created_at` of its newest comment
+-- (deleting that comment does not move it back, until reconciled).
+-- They are maintained by statement-level triggers, so a statement touching many
+-- comments (a bulk insert, or the cascade deleting a whole subtree or post)
+-- updates each post once, by the net change.
+--
+-- NOTE: existing posts start at 0 when these columns are added:
+-- run `CALL reconcile_comment_counts();` once after upgrading.
+--
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS last_comment_at TIMESTAMP WITH TIME ZONE;
+
+CREATE OR REPLACE FUNCTION count_inserted_comments()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE posts p
+    SET comment_count = p.comment_count + n.added,
+        last_comment_at = GREATEST(p.last_comment_at, n.newest)
+    FROM (
+        SELECT post_id, COUNT(*)::INTEGER AS added, MAX(created_at) AS newest
+        FROM inserted_comments
+        GROUP BY post_id
+    ) n
+    WHERE p.id = n.post_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_count_inserted_comments
+    AFTER INSERT ON comments
+    REFERENCING NEW TABLE AS inserted_comments
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_inserted_comments();
+
+CREATE OR REPLACE FUNCTION count_deleted_comments()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- When the post itself is being deleted, it is already gone and nothing matches
+    UPDATE posts p
+    SET comment_count = p.comment_count - n.removed
+    FROM (
+        SELECT post_id, COUNT(*)::INTEGER AS removed
+        FROM deleted_comments
+        GROUP BY post_id
+    ) n
+    WHERE p.id = n.post_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_count_deleted_comments
+    AFTER DELETE ON comments
+    REFERENCING OLD TABLE AS deleted_comments
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_deleted_comments();
+
+--
+-- Stored procedure: recompute comment_count and last_comment_at of every post,
+-- `p_batch_size` posts at a time in id order, committing after each batch so
+-- that no lock is held for long. Returns the number of posts corrected.
+-- Each batch locks its posts before counting, so a comment written concurrently
+-- is either counted here or applied by its trigger afterwards, never lost.
+-- CALL it outside of a transaction block:
+--   CALL reconcile_comment_counts();
+--
+CREATE OR REPLACE PROCEDURE reconcile_comment_counts(
+    p_batch_size INTEGER DEFAULT 500,
+    INOUT fixed BIGINT DEFAULT 0
+)
+AS $$
+DECLARE
+    batch_ids UUID[];
+    batch_fixed BIGINT;
+    last_id UUID;
+BEGIN
+    fixed := 0;
+    LOOP
+        SELECT array_agg(b.id ORDER BY b.id) INTO batch_ids
+        FROM (
+            SELECT p.id
+            FROM posts p
+            WHERE last_id IS NULL OR p.id > last_id
+            ORDER BY p.id
+            LIMIT p_batch_size
+            FOR UPDATE
+        ) b;
+        EXIT WHEN batch_ids IS NULL;
+
+        UPDATE posts p
+        SET comment_count = t.total, last_comment_at = t.newest
+        FROM (
+            SELECT b.id, COUNT(c.id)::INTEGER AS total, MAX(c.created_at) AS newest
+            FROM unnest(batch_ids) AS b(id)
+            LEFT JOIN comments c ON c.post_id = b.id
+            GROUP BY b.id
+        ) t
+        WHERE p.id = t.id
+            AND (
+                p.comment_count <> t.total
+                OR p.last_comment_at IS DISTINCT FROM t.newest
+            );
+        GET DIAGNOSTICS batch_fixed = ROW_COUNT;
+
+        fixed := fixed + batch_fixed;
+        last_id := batch_ids[array_length(batch_ids, 1)];
+        COMMIT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+--
+-- Stored function: read a page of sibling comments and their replies.
+-- Reads the first `p_page_size` comments at depth `p_root_depth` whose `path` falls
+-- strictly between `p_after_path` and `p_before_path`, then, level by level, the first
+-- `p_page_size` direct replies (in (created_at, id) order) of every comment read so far,
+-- down to `p_max_depth` levels below `p_base_depth`.
+-- The `depth` of each result is relative to `p_base_depth`.
+--
+-- Every level is one LIMITed seek per parent on (post_id, depth, path), within the
+-- parent's own path range, so the work is bounded by the rows returned
+-- rather than by the size of the subtrees underneath them.
+--
+DROP FUNCTION IF EXISTS scan_comment_subtree(UUID, BYTEA, BYTEA, INTEGER, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION scan_comment_subtree(
+    p_post_id UUID,
+    p_after_path BYTEA,
+    p_before_path BYTEA,
+    p_root_depth INTEGER,
+    p_base_depth INTEGER,
+    p_max_depth INTEGER,
+    p_page_size INTEGER
+)
+RETURNS TABLE (
+    id UUID,
+    post_id UUID,
+    parent_comment_id UUID,
+    author VARCHAR(100),
+    body TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    vote_score INTEGER,
+    depth INTEGER
+) AS $$
+    WITH RECURSIVE tree AS (
+        (
+            SELECT c.id, c.post_id, c.parent_comment_id, c.author, c.body,
+                c.created_at, c.updated_at, c.vote_score, c.depth, c.path
+            FROM comments c
+            WHERE c.post_id = p_post_id
+                AND c.depth = p_root_depth
+                AND c.path > p_after_path
+                AND c.path < p_before_path
+            ORDER BY c.path
+            LIMIT p_page_size
+        )
+
+        UNION ALL
+
+        SELECT r.*
+        FROM tree t
+        CROSS JOIN LATERAL (
+            -- Children's paths are the parent's path plus one segment,
+            -- and segments never start with 0xFF
+            SELECT c.id, c.post_id, c.parent_comment_id, c.author, c.body,
+                c.created_at, c.updated_at, c.vote_score, c.depth, c.path
+            FROM comments c
+            WHERE c.post_id = t.post_id
+                AND c.depth = t.depth + 1
+                AND c.path > t.path
+                AND c.path < t.path || '\xff'::BYTEA
+            ORDER BY c.path
+            LIMIT p_page_size
+        ) r
+        WHERE t.depth < p_base_depth + p_max_depth
+    )
+    SELECT t.id, t.post_id, t.parent_comment_id, t.author, t.body,
+        t.created_at, t.updated_at, t.vote_score, t.depth - p_base_depth
+    FROM tree t;
+$$ LANGUAGE sql STABLE;
+
 --
 -- Stored function: get the comment tree for a Post.
 -- Returns top-level comments with recursive replies up to `p_max_depth` levels.
 -- Uses keyset/cursor-based pagination on top-level comments:
---   pass `p_cursor_id` (the id of the last top-level comment from the previous page)
---   or NULL for the first page.
+--   pass `p_cursor_created_at` and `p_cursor_id` (the sort key of the last top-level
+--   comment from the previous page), or NULLs for the first page.
+--   The cursor comment itself does not need to exist any more.
 -- Replies within each parent are not cursor-paginated; use get_reply_tree for that.
 --
+-- The page of top comments, and then each comment's page of direct replies,
+-- is one seek on (post_id, depth, path) (see scan_comment_subtree).
+--
+DROP FUNCTION IF EXISTS get_comment_tree(UUID, INTEGER, INTEGER, UUID);
 CREATE OR REPLACE FUNCTION get_comment_tree(
     p_post_id UUID,
     p_max_depth INTEGER DEFAULT 2,
     p_page_size INTEGER DEFAULT 10,
+    p_cursor_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
     p_cursor_id UUID DEFAULT NULL
 )
 RETURNS TABLE (
@@ -164,61 +909,48 @@ RETURNS TABLE (
     vote_score INTEGER,
     depth INTEGER
 ) AS $$
+DECLARE
+    cursor_path BYTEA;
 BEGIN
-    RETURN QUERY
-    WITH RECURSIVE
-        top_comments AS (
-            SELECT c.*, 0 AS depth
-            FROM comments c
-            WHERE c.post_id = p_post_id
-                AND c.parent_comment_id IS NULL
-                AND (
-                    p_cursor_id IS NULL
-                    OR (c.created_at, c.id) > (
-                        (SELECT cc.created_at FROM comments cc WHERE cc.id = p_cursor_id),
-                        p_cursor_id
-                    )
-                )
-            ORDER BY c.created_at ASC, c.id ASC
-            LIMIT p_page_size
-        ),
-        comment_tree AS (
-            SELECT tc.id, tc.post_id, tc.parent_comment_id, tc.author, tc.body,
-                tc.created_at, tc.updated_at, tc.vote_score, tc.depth
-            FROM top_comments tc
-
-            UNION ALL
+    -- A top comment's path is a single segment, so the cursor maps straight onto it
+    IF p_cursor_id IS NOT NULL THEN
+        cursor_path := comment_path_segment(p_cursor_created_at, p_cursor_id);
+    END IF;
 
-            SELECT c.id, c.post_id, c.parent_comment_id, c.author, c.body,
-                c.created_at, c.updated_at, c.vote_score, ct.depth + 1
-            FROM comment_tree ct
-            JOIN LATERAL (
-                SELECT *
-                FROM comments
-                WHERE comments.parent_comment_id = ct.id
-                ORDER BY comments.created_at ASC, comments.id ASC
-                LIMIT p_page_size
-            ) c ON TRUE
-            WHERE ct.depth < p_max_depth
-        )
-    SELECT * FROM comment_tree
-    ORDER BY comment_tree.depth, comment_tree.created_at ASC, comment_tree.id ASC;
+    RETURN QUERY
+    SELECT s.*
+    FROM scan_comment_subtree(
+        p_post_id,
+        COALESCE(cursor_path, '\x'::BYTEA),
+        '\xff'::BYTEA,
+        0,
+        0,
+        p_max_depth,
+        p_page_size
+    ) s
+    ORDER BY s.depth, s.created_at ASC, s.id ASC;
 END;
-$$ LANGUAGE plpgsql;
+$$ LANGUAGE plpgsql STABLE;
 
 --
 -- Stored function: get the reply tree for a single Comment.
 -- Returns replies to the given comment recursively up to `p_max_depth` levels.
 -- The target comment itself is NOT included in results.
 -- Uses keyset/cursor-based pagination on direct replies:
---   pass `p_cursor_id` (the id of the last direct reply from the previous page)
---   or NULL for the first page.
+--   pass `p_cursor_created_at` and `p_cursor_id` (the sort key of the last direct reply
+--   from the previous page), or NULLs for the first page.
+--   The cursor comment itself does not need to exist any more.
 --
+-- The page of direct replies is one seek on (post_id, depth, path) within the
+-- target's subtree, and so is each of their pages of replies (see scan_comment_subtree).
+--
+DROP FUNCTION IF EXISTS get_reply_tree(UUID, UUID, INTEGER, INTEGER, UUID);
 CREATE OR REPLACE FUNCTION get_reply_tree(
     p_post_id UUID,
     p_comment_id UUID,
     p_max_depth INTEGER DEFAULT 2,
     p_page_size INTEGER DEFAULT 10,
+    p_cursor_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
     p_cursor_id UUID DEFAULT NULL
 )
 RETURNS TABLE (
@@ -232,54 +964,41 @@ RETURNS TABLE (
     vote_score INTEGER,
     depth INTEGER
 ) AS $$
+DECLARE
+    target_path BYTEA;
+    target_depth INTEGER;
+    cursor_path BYTEA;
 BEGIN
     -- Verify the target comment exists and belongs to the given post
-    IF NOT EXISTS (
-        SELECT 1 FROM comments c
-        WHERE c.id = p_comment_id AND c.post_id = p_post_id
-    ) THEN
+    SELECT c.path, c.depth INTO target_path, target_depth
+    FROM comments c
+    WHERE c.id = p_comment_id AND c.post_id = p_post_id;
+
+    IF NOT FOUND THEN
         -- Return empty result set; the backend should interpret this as 404
         RETURN;
     END IF;
 
-    RETURN QUERY
-    WITH RECURSIVE
-        direct_replies AS (
-            SELECT c.*, 1 AS depth
-            FROM comments c
-            WHERE c.parent_comment_id = p_comment_id
-                AND (
-                    p_cursor_id IS NULL
-                    OR (c.created_at, c.id) > (
-                        (SELECT cc.created_at FROM comments cc WHERE cc.id = p_cursor_id),
-                        p_cursor_id
-                    )
-                )
-            ORDER BY c.created_at ASC, c.id ASC
-            LIMIT p_page_size
-        ),
-        comment_tree AS (
-            SELECT dr.id, dr.post_id, dr.parent_comment_id, dr.author, dr.body,
-                dr.created_at, dr.updated_at, dr.vote_score, dr.depth
-            FROM direct_replies dr
-
-            UNION ALL
+    -- Direct replies' paths are the target's path plus one segment
+    IF p_cursor_id IS NOT NULL THEN
+        cursor_path := target_path
+            || comment_path_segment(p_cursor_created_at, p_cursor_id);
+    END IF;
 
-            SELECT c.id, c.post_id, c.parent_comment_id, c.author, c.body,
-                c.created_at, c.updated_at, c.vote_score, ct.depth + 1
-            FROM comment_tree ct
-            JOIN LATERAL (
-                SELECT *
-                FROM comments
-                WHERE comments.parent_comment_id = ct.id
-                ORDER BY comments.created_at ASC, comments.id ASC
-                LIMIT p_page_size
-            ) c ON TRUE
-            WHERE ct.depth < p_max_depth
-        )
-    SELECT * FROM comment_tree
-    ORDER BY comment_tree.depth, comment_tree.created_at ASC, comment_tree.id ASC;
+    -- Direct replies are always returned, even when `p_max_depth` is 0
+    RETURN QUERY
+    SELECT s.*
+    FROM scan_comment_subtree(
+        p_post_id,
+        COALESCE(cursor_path, target_path),
+        target_path || '\xff'::BYTEA,
+        target_depth + 1,
+        target_depth,
+        GREATEST(p_max_depth, 1),
+        p_page_size
+    ) s
+    ORDER BY s.depth, s.created_at ASC, s.id ASC;
 END;
-$$ LANGUAGE plpgsql;
+$$ LANGUAGE plpgsql STABLE;
 
 SELECT 'Schema load complete' AS run_status;